@@ -9,30 +9,77 @@ from flask_migrate import Migrate
 from flask_cors import CORS
 from dotenv import load_dotenv
 import os
+from app.utils.replica import RoutingSession, configure_replica
 
 """ Load environment variables from the .env file """
 load_dotenv()
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 
-def create_app():
+def create_app(config_object=None):
     """
     Function to create the Flask app.
+
+    Args:
+        config_object (str or object): The configuration to load; defaults to
+            the APP_SETTINGS environment variable, then config.DevelopmentConfig.
     """
 
     app = Flask(__name__)
     CORS(app)
 
-    app.config.from_object(os.environ.get('APP_SETTINGS', 'config.DevelopmentConfig'))
+    app.config.from_object(config_object or os.environ.get('APP_SETTINGS', 'config.DevelopmentConfig'))
+
+    from app.utils.json_provider import FastJSONProvider
+    app.json = FastJSONProvider(app)
+
+    from app.utils.metrics import configure_pool_metrics
+    configure_pool_metrics(app)
 
+    configure_replica(app)
     db.init_app(app)
     migrate.init_app(app, db)
 
-    from app.routes import user, family_tree, family_member
+    from app.utils.sqlite import init_sqlite
+    init_sqlite(app)
+
+    from app.utils.instrumentation import init_sql_instrumentation
+    init_sql_instrumentation(app)
+
+    from app.utils.metrics import init_metrics
+    init_metrics(app)
+
+    from app.routes import user, family_tree, family_member, metrics, job
     app.register_blueprint(user.user_bp)
     app.register_blueprint(family_tree.family_tree_bp)
     app.register_blueprint(family_member.family_member_bp)
+    app.register_blueprint(metrics.metrics_bp)
+    app.register_blueprint(job.job_bp)
+
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index():
+        """
+        Rebuild the family member name search index from the member table.
+        """
+        from app.models import FamilyMember
+        FamilyMember.rebuild_name_tokens()
+
+    @app.cli.command('rebuild-ancestry-closure')
+    def rebuild_ancestry_closure():
+        """
+        Rebuild the ancestry closure table from the parent links of every family member.
+        """
+        from app.models import FamilyMember
+        FamilyMember.rebuild_ancestry_closure()
+
+    @app.cli.command('purge-deleted-trees')
+    def purge_deleted_trees():
+        """
+        Purge the family trees that were deleted but not purged, e.g. when a purge job was lost.
+        """
+        from app.models import FamilyTree
+        FamilyTree.purge_deleted_trees()
 
     return app
 
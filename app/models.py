@@ -1,7 +1,65 @@
 """ app/models.py """
-from datetime import datetime
+from datetime import datetime, timezone
+from sqlalchemy import and_, bindparam, case, event, func, inspect, or_, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import with_loader_criteria
 from werkzeug.security import generate_password_hash, check_password_hash
 from app import db
+from app.utils.closure import refresh_closure, remove_from_closure
+from app.utils.events import publish_tree_event
+from app.utils.kinship import get_kinship_index, invalidate_kinship_index
+from app.utils.replica import primary_reads, replica_reads
+from app.utils.search import TOKEN_LENGTH, escape_like, member_fingerprint, name_token_rows, name_tokens
+from app.utils.serializers import MEMBER_FIELDS, member_columns
+
+""" Maximum number of values bound into a single IN lookup """
+LOOKUP_CHUNK_SIZE = 1000
+
+""" Columns of a family member that a partial update may change """
+MEMBER_PATCH_FIELDS = ('name', 'gender', 'date_of_birth', 'biography', 'picture_url', 'father_id', 'mother_id')
+
+""" Number of family members handled per transaction when purging a family tree """
+PURGE_BATCH_SIZE = 1000
+
+
+def utc_now():
+    """
+    Get the current UTC time as a naive datetime, as stored in DateTime columns.
+
+    Returns:
+        datetime: The current UTC time without tzinfo.
+    """
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class DuplicateMemberError(ValueError):
+    """
+    Raised when a write would give a family tree two members with the same
+    name, gender and date of birth.
+    """
+
+
+class TreeNotFoundError(LookupError):
+    """
+    Raised when writing to a family tree that does not exist or is deleted.
+    """
+
+
+def duplicate_member_error(error):
+    """
+    Tell a violation of the member fingerprint index apart from other integrity errors.
+
+    Args:
+        error (IntegrityError): The error raised by the database.
+
+    Returns:
+        Exception: A DuplicateMemberError if the fingerprint index was violated, else the error itself.
+    """
+    if 'fingerprint' not in str(error.orig):
+        return error
+    duplicate = DuplicateMemberError('Member already exists in the family tree.')
+    duplicate.__cause__ = error
+    return duplicate
 
 class User(db.Model):
     """
@@ -103,14 +161,25 @@ class FamilyTree(db.Model):
         name (str): The name of the family tree.
         description (str): The description of the family tree.
         user_id (int): The ID of the user who owns the family tree.
+        version (int): Counter increased by every write to the tree or its members.
+        updated_at (DateTime): UTC time of the last write to the tree or its members.
+        deleted_at (DateTime): UTC time the tree was deleted; set while it waits to be purged.
         members (Relationship): One-to-many relationship with FamilyMember model.
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+    updated_at = db.Column(db.DateTime, nullable=False, default=utc_now,
+                           server_default=func.current_timestamp())
+    deleted_at = db.Column(db.DateTime)
     members = db.relationship('FamilyMember', backref='family_tree', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_family_tree_user_id_name', 'user_id', 'name'),
+    )
+
     @staticmethod
     def create_family_tree(name, description, user_id):
         """
@@ -133,6 +202,126 @@ class FamilyTree(db.Model):
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def get_version(tree_id, user_id):
+        """
+        Get the version of a family tree without loading it.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            user_id (int): The ID of the user who owns the family tree.
+
+        Returns:
+            Row: (version, updated_at) of the family tree, or None if not found.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            return db.session.query(FamilyTree.version, FamilyTree.updated_at).filter(
+                FamilyTree.id == tree_id,
+                FamilyTree.user_id == user_id
+            ).first()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def bump_version(tree_id):
+        """
+        Record a write to a family tree in the current transaction.
+
+        The version is the tree's change sequence: rows written afterwards in
+        the same transaction are stamped with it (see change_seq), so it must
+        be bumped before the writes. Pending ORM changes are therefore not
+        flushed first, and the row lock taken here orders concurrent writers.
+        A soft-deleted tree is not bumped, so no write lands in a tree once
+        its deletion has committed and its purge may have started.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+
+        Raises:
+            TreeNotFoundError: If the tree does not exist or is deleted.
+        """
+        table = FamilyTree.__table__
+        with db.session.no_autoflush:
+            result = db.session.execute(table.update().where(
+                table.c.id == tree_id,
+                table.c.deleted_at.is_(None)
+            ).values(
+                version=table.c.version + 1,
+                updated_at=utc_now(),
+            ))
+        if result.rowcount == 0:
+            raise TreeNotFoundError('Family tree not found')
+
+    @staticmethod
+    def change_seq(tree_id):
+        """
+        Get an SQL expression reading the version of a family tree, to stamp rows written after bump_version.
+
+        Args:
+            tree_id (int or ColumnElement): The ID of the family tree, or a column holding it.
+
+        Returns:
+            ScalarSelect: The version of the family tree.
+        """
+        table = FamilyTree.__table__
+        return select(table.c.version).where(table.c.id == tree_id).scalar_subquery()
+
+    @staticmethod
+    @replica_reads
+    def get_tree_summaries(user_id):
+        """
+        Summarize every family tree of a user in a single query.
+
+        Members and closure rows are aggregated per tree in two grouped
+        subqueries, restricted to the user's trees and joined to the tree
+        rows. The generation count is one more than the deepest line of
+        descent in the ancestry closure, read from its (tree_id, depth) index.
+
+        Args:
+            user_id (int): The ID of the user who owns the family trees.
+
+        Returns:
+            list: Rows with id, name, description, member_count, generations,
+                earliest_birth, latest_birth and updated_at, ordered by tree ID.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            tree_ids = select(FamilyTree.id).where(FamilyTree.user_id == user_id)
+            members = select(
+                FamilyMember.tree_id,
+                func.count().label('member_count'),
+                func.min(FamilyMember.date_of_birth).label('earliest_birth'),
+                func.max(FamilyMember.date_of_birth).label('latest_birth'),
+            ).where(FamilyMember.tree_id.in_(tree_ids)).group_by(FamilyMember.tree_id).subquery()
+            depths = select(
+                AncestryClosure.tree_id,
+                func.max(AncestryClosure.depth).label('max_depth'),
+            ).where(AncestryClosure.tree_id.in_(tree_ids)).group_by(AncestryClosure.tree_id).subquery()
+
+            return db.session.execute(
+                select(
+                    FamilyTree.id,
+                    FamilyTree.name,
+                    FamilyTree.description,
+                    func.coalesce(members.c.member_count, 0).label('member_count'),
+                    func.coalesce(depths.c.max_depth + 1, 0).label('generations'),
+                    members.c.earliest_birth,
+                    members.c.latest_birth,
+                    FamilyTree.updated_at,
+                )
+                .outerjoin(members, members.c.tree_id == FamilyTree.id)
+                .outerjoin(depths, depths.c.tree_id == FamilyTree.id)
+                .where(FamilyTree.user_id == user_id)
+                .order_by(FamilyTree.id)
+            ).all()
+        except Exception as e:
+            raise e
+
     def get_all_trees(self):
         """
         Get all family trees associated with the user.
@@ -157,33 +346,151 @@ class FamilyTree(db.Model):
             description (str): The new description of the family tree.
 
         Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
             Exception: If an error occurs during update.
         """
         try:
             self.name = name
             self.description = description
+            FamilyTree.bump_version(self.id)
 
             db.session.commit()
         except Exception as e:
             db.session.rollback()
             raise e
 
-    def delete_tree(self):
+    def delete_tree(self, progress=None):
         """
         Delete the family tree and its associated members.
 
+        The tree is hidden at once with soft_delete, then purged in short
+        transactions with purge_tree.
+
+        Args:
+            progress (callable): Called with (done, total) after every purge batch.
+
+        Raises:
+            Exception: If an error occurs during deletion.
+        """
+        tree_id = self.id
+        self.soft_delete()
+        FamilyTree.purge_tree(tree_id, progress)
+
+    def soft_delete(self):
+        """
+        Hide the family tree and its members from every query until they are purged.
+
         Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
             Exception: If an error occurs during deletion.
         """
         try:
-            FamilyMember.query.filter_by(tree_id=self.id).delete()
+            tree_id = self.id
+            self.deleted_at = utc_now()
+            FamilyTree.bump_version(tree_id)
+            db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'tree_deleted')
+        except Exception as e:
+            db.session.rollback()
+            raise e
 
-            db.session.delete(self)
+    @staticmethod
+    def purge_tree(tree_id, progress=None, batch_size=PURGE_BATCH_SIZE):
+        """
+        Delete a family tree and everything in it in bounded batches.
+
+        Members are walked in ID order, one transaction per batch. The first
+        pass removes the closure rows and name tokens of each batch and clears
+        the parent links pointing at it, so that the second pass can delete
+        the members without tripping the father_id/mother_id foreign keys.
+        The tombstones of the tree's deleted members follow, and the tree row
+        goes last.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            progress (callable): Called with (done, total) after every batch.
+            batch_size (int): The number of members per transaction.
+
+        Returns:
+            int: The number of members deleted.
+
+        Raises:
+            Exception: If an error occurs during deletion.
+        """
+        members = FamilyMember.__table__
+        closure = AncestryClosure.__table__
+        tokens = MemberNameToken.__table__
+        try:
+            total = db.session.execute(
+                select(func.count()).select_from(members).where(members.c.tree_id == tree_id)
+            ).scalar()
+            done = 0
+
+            for unlink in (True, False):
+                after_id = 0
+                while True:
+                    member_ids = list(db.session.execute(
+                        select(members.c.id).where(members.c.tree_id == tree_id, members.c.id > after_id)
+                        .order_by(members.c.id).limit(batch_size)
+                    ).scalars())
+                    if not member_ids:
+                        break
+
+                    if unlink:
+                        db.session.execute(closure.delete().where(closure.c.descendant_id.in_(member_ids)))
+                        db.session.execute(tokens.delete().where(tokens.c.member_id.in_(member_ids)))
+                        for parent_column in (members.c.father_id, members.c.mother_id):
+                            db.session.execute(
+                                members.update().where(parent_column.in_(member_ids)).values({parent_column.name: None})
+                            )
+                    else:
+                        db.session.execute(members.delete().where(members.c.id.in_(member_ids)))
+                    db.session.commit()
+
+                    after_id = member_ids[-1]
+                    done += len(member_ids)
+                    if progress:
+                        progress(done, 2 * total)
+
+            tombstones = MemberTombstone.__table__
+            while True:
+                tombstone_ids = list(db.session.execute(
+                    select(tombstones.c.id).where(tombstones.c.tree_id == tree_id).limit(batch_size)
+                ).scalars())
+                if not tombstone_ids:
+                    break
+                db.session.execute(tombstones.delete().where(tombstones.c.id.in_(tombstone_ids)))
+                db.session.commit()
+
+            table = FamilyTree.__table__
+            db.session.execute(table.delete().where(table.c.id == tree_id))
             db.session.commit()
+            invalidate_kinship_index(tree_id)
+            return total
         except Exception as e:
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def purge_deleted_trees(progress=None):
+        """
+        Purge every soft-deleted family tree, e.g. those left behind by an interrupted job.
+
+        Args:
+            progress (callable): Called with (done, total) after every purge batch.
+
+        Returns:
+            int: The number of family trees purged.
+        """
+        tree_ids = list(db.session.execute(
+            select(FamilyTree.id).where(FamilyTree.deleted_at.isnot(None)).order_by(FamilyTree.id),
+            execution_options={'include_deleted': True}
+        ).scalars())
+        for tree_id in tree_ids:
+            FamilyTree.purge_tree(tree_id, progress)
+        return len(tree_ids)
+
     def get_tree_members_count(self):
         """
         Get the count of members in the family tree.
@@ -213,6 +520,9 @@ class FamilyMember(db.Model):
         tree_id (int): The ID of the family tree to which the member belongs.
         father_id (int): The ID of the father of the family member.
         mother_id (int): The ID of the mother of the family member.
+        fingerprint (str): Digest of the normalized name, gender and date of birth, unique per tree.
+        updated_at (DateTime): UTC time of the last write to the member.
+        change_seq (int): Version of the tree at the last write to the member.
     """
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), nullable=False)
@@ -223,6 +533,19 @@ class FamilyMember(db.Model):
     tree_id = db.Column(db.Integer, db.ForeignKey('family_tree.id'), nullable=False)
     father_id = db.Column(db.Integer, db.ForeignKey('family_member.id'))
     mother_id = db.Column(db.Integer, db.ForeignKey('family_member.id'))
+    fingerprint = db.Column(db.String(64))
+    updated_at = db.Column(db.DateTime, nullable=False, default=utc_now, server_default=func.current_timestamp())
+    change_seq = db.Column(db.Integer, nullable=False, default=0, server_default='0')
+
+    __table_args__ = (
+        db.Index('ix_family_member_tree_id_id', 'tree_id', 'id'),
+        db.Index('ix_family_member_tree_id_name', 'tree_id', 'name', 'gender', 'date_of_birth'),
+        db.Index('ix_family_member_father_id', 'father_id'),
+        db.Index('ix_family_member_mother_id', 'mother_id'),
+        db.Index('uq_family_member_tree_id_fingerprint', 'tree_id', 'fingerprint', unique=True),
+        db.Index('ix_family_member_tree_id_change_seq', 'tree_id', 'change_seq', 'id'),
+        {'sqlite_autoincrement': True},
+    )
 
     def get_siblings(self):
         """
@@ -235,12 +558,9 @@ class FamilyMember(db.Model):
             Exception: If an error occurs during retrieval.
         """
         try:
-            siblings = FamilyMember.query.filter(
-                (FamilyMember.id != self.id) &
-                ((FamilyMember.father_id == self.father_id) |
-                 (FamilyMember.mother_id == self.mother_id))
-            ).all()
-            return siblings
+            version = db.session.query(FamilyTree.version).filter(FamilyTree.id == self.tree_id).scalar()
+            sibling_ids = get_kinship_index(self.tree_id, version).siblings(self.id)
+            return FamilyMember.get_members_by_ids(self.tree_id, sibling_ids)
         except Exception as e:
             raise e
 
@@ -255,9 +575,9 @@ class FamilyMember(db.Model):
             Exception: If an error occurs during retrieval.
         """
         try:
-            father = FamilyMember.query.get(self.father_id) if self.father_id else None
-            mother = FamilyMember.query.get(self.mother_id) if self.mother_id else None
-            return {'father': father, 'mother': mother}
+            parent_ids = [parent_id for parent_id in (self.father_id, self.mother_id) if parent_id]
+            parents = {parent.id: parent for parent in FamilyMember.get_members_by_ids(self.tree_id, parent_ids)}
+            return {'father': parents.get(self.father_id), 'mother': parents.get(self.mother_id)}
         except Exception as e:
             raise e
 
@@ -276,7 +596,12 @@ class FamilyMember(db.Model):
             father_id (int): The ID of the father of the family member.
             mother_id (int): The ID of the mother of the family member.
 
+        Returns:
+            FamilyMember: The new family member.
+
         Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
+            DuplicateMemberError: If the tree has a member with the same name, gender and date of birth.
             Exception: If an error occurs during addition.
         """
         try:
@@ -292,12 +617,172 @@ class FamilyMember(db.Model):
             )
 
             db.session.add(new_member)
+            FamilyTree.bump_version(tree_id)
+            db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'member_added', inspect(new_member).identity)
+            return new_member
+        except IntegrityError as e:
+            db.session.rollback()
+            raise duplicate_member_error(e)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @staticmethod
+    def add_members(tree_id, members):
+        """
+        Add many family members to the specified family tree in one transaction.
+
+        All members are written with a single multi-row insert. Their IDs are
+        read back by fingerprint, which is unique in the tree, and parent
+        links between members of the batch are then set
+        with a single executemany update, so the batch may reference its own
+        members in any order. The ancestry closure of the batch is then built
+        one generation at a time.
+
+        Args:
+            tree_id (int): The ID of the family tree to which the members belong.
+            members (list): Dicts with the member columns, date_of_birth as a date.
+                Optional 'father_index' and 'mother_index' keys give the position
+                of a parent within the batch and take precedence over 'father_id'
+                and 'mother_id'.
+
+        Returns:
+            list: The IDs of the new family members, in input order.
+
+        Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
+            DuplicateMemberError: If two members would share a name, gender and date of birth.
+            Exception: If an error occurs during addition.
+        """
+        try:
+            FamilyTree.bump_version(tree_id)
+            table = FamilyMember.__table__
+            changed = {'change_seq': FamilyTree.change_seq(tree_id), 'updated_at': utc_now()}
+            fingerprints = [
+                member_fingerprint(member['name'], member['gender'], member['date_of_birth'])
+                for member in members
+            ]
+            db.session.execute(table.insert().values(**changed), [
+                {
+                    'name': member['name'],
+                    'gender': member['gender'],
+                    'date_of_birth': member['date_of_birth'],
+                    'biography': member.get('biography'),
+                    'picture_url': member.get('picture_url'),
+                    'tree_id': tree_id,
+                    'father_id': member.get('father_id'),
+                    'mother_id': member.get('mother_id'),
+                    'fingerprint': fingerprint,
+                }
+                for member, fingerprint in zip(members, fingerprints)
+            ])
+
+            new_ids = {}
+            for start in range(0, len(fingerprints), LOOKUP_CHUNK_SIZE):
+                rows = db.session.query(FamilyMember.id, FamilyMember.fingerprint).filter(
+                    FamilyMember.tree_id == tree_id,
+                    FamilyMember.fingerprint.in_(fingerprints[start:start + LOOKUP_CHUNK_SIZE])
+                )
+                new_ids.update((row.fingerprint, row.id) for row in rows)
+
+            member_ids = [new_ids[fingerprint] for fingerprint in fingerprints]
+
+            token_rows = [
+                row
+                for member_id, member in zip(member_ids, members)
+                for row in name_token_rows(member_id, tree_id, member['name'])
+            ]
+            if token_rows:
+                db.session.execute(MemberNameToken.__table__.insert(), token_rows)
+
+            links = []
+            for member_id, member in zip(member_ids, members):
+                father_index = member.get('father_index')
+                mother_index = member.get('mother_index')
+                if father_index is None and mother_index is None:
+                    continue
+                links.append({
+                    'member_id': member_id,
+                    'linked_father_id': member_ids[father_index] if father_index is not None else member.get('father_id'),
+                    'linked_mother_id': member_ids[mother_index] if mother_index is not None else member.get('mother_id'),
+                })
+
+            if links:
+                db.session.execute(
+                    table.update().where(table.c.id == bindparam('member_id')).values(
+                        father_id=bindparam('linked_father_id'),
+                        mother_id=bindparam('linked_mother_id'),
+                    ),
+                    links
+                )
+
+            refresh_closure(db.session.connection(), member_ids)
+
+            db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'member_added', member_ids)
+            return member_ids
+        except IntegrityError as e:
+            db.session.rollback()
+            raise duplicate_member_error(e)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @staticmethod
+    def link_parents(tree_id, links):
+        """
+        Set the parents of many family members in one transaction.
+
+        A parent given as None leaves the member's current parent in place.
+        The ancestry closure of the linked members and of their descendants
+        is recomputed afterwards.
+
+        Args:
+            tree_id (int): The ID of the family tree the members belong to.
+            links (list): Dicts with 'member_id', 'father_id' and 'mother_id' keys.
+
+        Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
+            Exception: If an error occurs during update.
+        """
+        try:
+            FamilyTree.bump_version(tree_id)
+            table = FamilyMember.__table__
+            statement = table.update().where(
+                table.c.id == bindparam('member_id'),
+                table.c.tree_id == tree_id
+            ).values(
+                father_id=func.coalesce(bindparam('linked_father_id'), table.c.father_id),
+                mother_id=func.coalesce(bindparam('linked_mother_id'), table.c.mother_id),
+                change_seq=FamilyTree.change_seq(tree_id),
+                updated_at=utc_now(),
+            )
+
+            for start in range(0, len(links), LOOKUP_CHUNK_SIZE):
+                db.session.execute(statement, [
+                    {
+                        'member_id': link['member_id'],
+                        'linked_father_id': link['father_id'],
+                        'linked_mother_id': link['mother_id'],
+                    }
+                    for link in links[start:start + LOOKUP_CHUNK_SIZE]
+                ])
+
+            member_ids = [link['member_id'] for link in links]
+            refresh_closure(db.session.connection(), member_ids)
+
             db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'member_updated', member_ids)
         except Exception as e:
             db.session.rollback()
             raise e
 
     @staticmethod
+    @replica_reads
     def get_all_members_in_tree(tree_id):
         """
         Get all family members in the specified family tree.
@@ -317,6 +802,208 @@ class FamilyMember(db.Model):
             raise e
 
     @staticmethod
+    @replica_reads
+    def search_members(user_id, query, offset, limit):
+        """
+        Search the family members of all the user's family trees by name.
+
+        Queries of at least three characters are answered from the name token
+        index; shorter ones fall back to a substring scan. Results are ranked
+        exact match first, then name prefix, then word prefix, then any substring.
+
+        Args:
+            user_id (int): The ID of the user whose family trees are searched.
+            query (str): The text to find in member names.
+            offset (int): The number of ranked results to skip.
+            limit (int): The maximum number of results to return.
+
+        Returns:
+            list: List of (FamilyMember, relevance) tuples, most relevant first.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            query = ' '.join(query.split())
+            escaped = escape_like(query)
+            relevance = case(
+                (func.lower(FamilyMember.name) == query.lower(), 3),
+                (FamilyMember.name.ilike(f'{escaped}%', escape='\\'), 2),
+                (FamilyMember.name.ilike(f'% {escaped}%', escape='\\'), 1),
+                else_=0
+            )
+
+            results = db.session.query(FamilyMember, relevance).join(
+                FamilyTree, FamilyTree.id == FamilyMember.tree_id
+            ).filter(
+                FamilyTree.user_id == user_id,
+                FamilyMember.name.ilike(f'%{escaped}%', escape='\\')
+            )
+
+            tokens = name_tokens(query)
+            if tokens:
+                candidates = db.session.query(MemberNameToken.member_id).join(
+                    FamilyTree, FamilyTree.id == MemberNameToken.tree_id
+                ).filter(
+                    FamilyTree.user_id == user_id,
+                    MemberNameToken.token.in_(tokens)
+                ).group_by(MemberNameToken.member_id).having(
+                    func.count() == len(tokens)
+                ).subquery()
+                results = results.join(candidates, candidates.c.member_id == FamilyMember.id)
+
+            return results.order_by(
+                relevance.desc(), FamilyMember.name, FamilyMember.id
+            ).offset(offset).limit(limit).all()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def rebuild_name_tokens():
+        """
+        Rebuild the name token index of every family member.
+
+        Raises:
+            Exception: If an error occurs during the rebuild.
+        """
+        try:
+            MemberNameToken.query.delete()
+
+            last_id = 0
+            while True:
+                members = db.session.query(FamilyMember.id, FamilyMember.tree_id, FamilyMember.name).filter(
+                    FamilyMember.id > last_id
+                ).order_by(FamilyMember.id).limit(LOOKUP_CHUNK_SIZE).all()
+                if not members:
+                    break
+                last_id = members[-1].id
+
+                token_rows = [row for member in members for row in name_token_rows(*member)]
+                if token_rows:
+                    db.session.execute(MemberNameToken.__table__.insert(), token_rows)
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @staticmethod
+    def rebuild_ancestry_closure():
+        """
+        Rebuild the ancestry closure of every family tree.
+
+        Raises:
+            Exception: If an error occurs during the rebuild.
+        """
+        try:
+            AncestryClosure.query.delete()
+
+            for (tree_id,) in db.session.query(FamilyTree.id).order_by(FamilyTree.id).all():
+                member_ids = [member_id for (member_id,) in db.session.query(FamilyMember.id).filter_by(tree_id=tree_id)]
+                refresh_closure(db.session.connection(), member_ids)
+
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    @staticmethod
+    @replica_reads
+    def get_members_page(tree_id, after_id, limit, fields):
+        """
+        Get a page of family members in the specified family tree, ordered by ID.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            after_id (int): Only members with an ID greater than this are returned.
+            limit (int): The maximum number of members to return.
+            fields (list): Names of the columns to select, including 'id'.
+
+        Returns:
+            list: Rows of the selected columns, in the order of fields.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            return db.session.query(*member_columns(fields)).filter(
+                FamilyMember.tree_id == tree_id,
+                FamilyMember.id > after_id
+            ).order_by(FamilyMember.id).limit(limit).all()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    @replica_reads
+    def get_changes(tree_id, since, after_id, limit, fields):
+        """
+        Get the members written and deleted in a family tree after a position of its change feed.
+
+        Changes are ordered by (change_seq, member ID). Written members and
+        tombstones are read up to the limit each and merged.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            since (int): Only changes with a greater change_seq are returned...
+            after_id (int): ...or, if not None, with the same change_seq and a greater member ID.
+            limit (int): The maximum number of changes to return.
+            fields (list): Names of the member columns to select, including 'id' and 'change_seq'.
+
+        Returns:
+            list: Up to limit (change_seq, member ID, row) tuples in feed order; row is
+                None for a deleted member.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        def after_position(change_seq, member_id):
+            if after_id is None:
+                return change_seq > since
+            return or_(change_seq > since, and_(change_seq == since, member_id > after_id))
+
+        try:
+            members = db.session.query(*member_columns(fields)).filter(
+                FamilyMember.tree_id == tree_id,
+                after_position(FamilyMember.change_seq, FamilyMember.id)
+            ).order_by(FamilyMember.change_seq, FamilyMember.id).limit(limit).all()
+
+            tombstones = db.session.query(MemberTombstone.change_seq, MemberTombstone.member_id).filter(
+                MemberTombstone.tree_id == tree_id,
+                after_position(MemberTombstone.change_seq, MemberTombstone.member_id)
+            ).order_by(MemberTombstone.change_seq, MemberTombstone.member_id).limit(limit).all()
+
+            changes = [(row.change_seq, row.id, row) for row in members]
+            changes.extend((row.change_seq, row.member_id, None) for row in tombstones)
+            changes.sort(key=lambda change: change[:2])
+            return changes[:limit]
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    @replica_reads
+    def get_graph_rows(tree_id):
+        """
+        Get the graph columns of every family member in the specified family tree.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+
+        Returns:
+            list: Rows of (id, name, gender, date_of_birth, father_id, mother_id) ordered by ID.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            return db.session.query(
+                FamilyMember.id, FamilyMember.name, FamilyMember.gender,
+                FamilyMember.date_of_birth, FamilyMember.father_id, FamilyMember.mother_id
+            ).filter(FamilyMember.tree_id == tree_id).order_by(FamilyMember.id).all()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    @replica_reads
     def get_member_by_id(tree_id, member_id):
         """
         Get a family member by their ID and the ID of the family tree.
@@ -337,6 +1024,7 @@ class FamilyMember(db.Model):
             raise e
 
     @staticmethod
+    @replica_reads
     def get_members_by_name(tree_id, member_name):
         """
         Get family members by their name and the ID of the family tree.
@@ -356,6 +1044,136 @@ class FamilyMember(db.Model):
         except Exception as e:
             raise e
 
+    @staticmethod
+    @replica_reads
+    def get_members_by_ids(tree_id, member_ids, fields=None):
+        """
+        Get family members by their IDs and the ID of the family tree.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            member_ids (list): The IDs of the family members.
+            fields (list): Names of the columns to select, including 'id';
+                full FamilyMember objects are loaded if omitted.
+
+        Returns:
+            list: List of FamilyMember objects, or rows of the selected columns, ordered by ID.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            if not member_ids:
+                return []
+            query = db.session.query(*member_columns(fields)) if fields else FamilyMember.query
+            return query.filter(
+                FamilyMember.tree_id == tree_id,
+                FamilyMember.id.in_(member_ids)
+            ).order_by(FamilyMember.id).all()
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    @replica_reads
+    def get_ancestors(tree_id, member_id, depth, limit):
+        """
+        Get the ancestors of a family member from the ancestry closure.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            member_id (int): The ID of the family member.
+            depth (int): The maximum number of generations to walk up.
+            limit (int): The maximum number of ancestors to return.
+
+        Returns:
+            list: Rows of the member fields and a 'generation' column, ordered by generation.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            return FamilyMember._get_lineage(tree_id, member_id, depth, limit, ancestors=True)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    @replica_reads
+    def get_descendants(tree_id, member_id, depth, limit):
+        """
+        Get the descendants of a family member from the ancestry closure.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            member_id (int): The ID of the family member.
+            depth (int): The maximum number of generations to walk down.
+            limit (int): The maximum number of descendants to return.
+
+        Returns:
+            list: Rows of the member fields and a 'generation' column, ordered by generation.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            return FamilyMember._get_lineage(tree_id, member_id, depth, limit, ancestors=False)
+        except Exception as e:
+            raise e
+
+    @staticmethod
+    def _get_lineage(tree_id, member_id, depth, limit, ancestors):
+        """
+        Look up the ancestors or descendants of a family member in the ancestry closure.
+
+        Members reachable through several lines (pedigree collapse) are
+        returned once, at their nearest generation.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            member_id (int): The ID of the family member to start from.
+            depth (int): The maximum number of generations to include.
+            limit (int): The maximum number of members to return.
+            ancestors (bool): Return ancestors if True, else descendants.
+
+        Returns:
+            list: Rows of the member fields and a 'generation' column, ordered by generation.
+        """
+        if ancestors:
+            link = AncestryClosure.ancestor_id == FamilyMember.id
+            origin = AncestryClosure.descendant_id == member_id
+        else:
+            link = AncestryClosure.descendant_id == FamilyMember.id
+            origin = AncestryClosure.ancestor_id == member_id
+
+        return db.session.query(
+            *member_columns(MEMBER_FIELDS), AncestryClosure.depth.label('generation')
+        ).join(AncestryClosure, link).filter(
+            origin,
+            AncestryClosure.tree_id == tree_id,
+            AncestryClosure.depth.between(1, depth)
+        ).order_by(AncestryClosure.depth, FamilyMember.id).limit(limit).all()
+
+    @staticmethod
+    def is_ancestor(ancestor_id, descendant_id):
+        """
+        Check whether a family member is an ancestor of another, or the member itself.
+
+        Args:
+            ancestor_id (int): The ID of the possible ancestor.
+            descendant_id (int): The ID of the possible descendant.
+
+        Returns:
+            bool: True if descendant_id is ancestor_id or one of its descendants.
+
+        Raises:
+            Exception: If an error occurs during retrieval.
+        """
+        try:
+            return db.session.query(
+                AncestryClosure.query.filter_by(ancestor_id=ancestor_id, descendant_id=descendant_id).exists()
+            ).scalar()
+        except Exception as e:
+            raise e
+
     def update_member(self, name, gender, date_of_birth, biography, picture_url, father_id, mother_id):
         """
         Update the information of the family member.
@@ -370,9 +1188,17 @@ class FamilyMember(db.Model):
             mother_id (int): The new ID of the mother of the family member.
 
         Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
+            DuplicateMemberError: If another member of the tree has the same name, gender and date of birth.
+            ValueError: If a new parent is the member itself or one of its descendants.
             Exception: If an error occurs during update.
         """
         try:
+            for parent_id in (father_id, mother_id):
+                if parent_id and parent_id not in (self.father_id, self.mother_id) \
+                        and FamilyMember.is_ancestor(self.id, parent_id):
+                    raise ValueError('A family member cannot be their own ancestor.')
+
             self.name = name
             self.gender = gender
             self.date_of_birth = date_of_birth
@@ -380,8 +1206,57 @@ class FamilyMember(db.Model):
             self.picture_url = picture_url
             self.father_id = father_id
             self.mother_id = mother_id
+            tree_id, member_id = self.tree_id, self.id
+            FamilyTree.bump_version(tree_id)
+
+            db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'member_updated', [member_id])
+        except IntegrityError as e:
+            db.session.rollback()
+            raise duplicate_member_error(e)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+    def patch_member(self, changes):
+        """
+        Update only the given fields of the family member.
+
+        The ancestry check runs only for parents that actually change, so a
+        change of biography or picture costs the same on any tree size.
+
+        Args:
+            changes (dict): Field name -> new value, for fields in MEMBER_PATCH_FIELDS.
+
+        Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
+            DuplicateMemberError: If another member of the tree has the same name, gender and date of birth.
+            ValueError: If a field cannot be patched, or a new parent is the member itself or one of its descendants.
+            Exception: If an error occurs during update.
+        """
+        try:
+            unknown_fields = set(changes) - set(MEMBER_PATCH_FIELDS)
+            if unknown_fields:
+                raise ValueError(f"Cannot update {', '.join(sorted(unknown_fields))}.")
+
+            for parent_field in ('father_id', 'mother_id'):
+                parent_id = changes.get(parent_field)
+                if parent_id and parent_id != getattr(self, parent_field) \
+                        and FamilyMember.is_ancestor(self.id, parent_id):
+                    raise ValueError('A family member cannot be their own ancestor.')
+
+            for field, value in changes.items():
+                setattr(self, field, value)
+            tree_id, member_id = self.tree_id, self.id
+            FamilyTree.bump_version(tree_id)
 
             db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'member_updated', [member_id])
+        except IntegrityError as e:
+            db.session.rollback()
+            raise duplicate_member_error(e)
         except Exception as e:
             db.session.rollback()
             raise e
@@ -390,13 +1265,223 @@ class FamilyMember(db.Model):
         """
         Delete the family member.
 
+        The member's children are kept and lose the parent link to it, and a
+        tombstone records the deletion for the change feed.
+
         Raises:
+            TreeNotFoundError: If the family tree does not exist or is deleted.
             Exception: If an error occurs during deletion.
         """
         try:
+            tree_id, member_id = self.tree_id, self.id
+            FamilyTree.bump_version(tree_id)
+            table = FamilyMember.__table__
+            child_ids = list(db.session.execute(
+                select(table.c.id).where(or_(table.c.father_id == self.id, table.c.mother_id == self.id))
+            ).scalars())
+            if child_ids:
+                for parent_column in (table.c.father_id, table.c.mother_id):
+                    db.session.execute(table.update().where(parent_column == self.id).values({
+                        parent_column.name: None,
+                        'change_seq': FamilyTree.change_seq(tree_id),
+                        'updated_at': utc_now(),
+                    }))
+                refresh_closure(db.session.connection(), child_ids)
+            db.session.execute(MemberTombstone.__table__.insert().values(
+                member_id=self.id, tree_id=tree_id, change_seq=FamilyTree.change_seq(tree_id), deleted_at=utc_now()
+            ))
             db.session.delete(self)
             db.session.commit()
+            invalidate_kinship_index(tree_id)
+            publish_tree_event(tree_id, 'member_deleted', [member_id])
+            publish_tree_event(tree_id, 'member_updated', child_ids)
+        except Exception as e:
+            db.session.rollback()
+            raise e
+
+class MemberNameToken(db.Model):
+    """
+    Represents a trigram of a family member's name in the search index.
+
+    Attributes:
+        token (str): A trigram of the normalized member name.
+        tree_id (int): The ID of the family tree the member belongs to.
+        member_id (int): The ID of the family member.
+    """
+    token = db.Column(db.String(TOKEN_LENGTH), primary_key=True)
+    tree_id = db.Column(db.Integer, db.ForeignKey('family_tree.id'), primary_key=True)
+    member_id = db.Column(db.Integer, db.ForeignKey('family_member.id'), primary_key=True, index=True)
+
+class AncestryClosure(db.Model):
+    """
+    Represents an ancestor/descendant pair in the ancestry closure of a family tree.
+
+    Every family member also has a row pairing it with itself at depth 0.
+
+    Attributes:
+        ancestor_id (int): The ID of the ancestor.
+        descendant_id (int): The ID of the descendant.
+        depth (int): The number of generations between them along the shortest line.
+        tree_id (int): The ID of the family tree both members belong to.
+    """
+    ancestor_id = db.Column(db.Integer, db.ForeignKey('family_member.id'), primary_key=True)
+    descendant_id = db.Column(db.Integer, db.ForeignKey('family_member.id'), primary_key=True, index=True)
+    depth = db.Column(db.Integer, nullable=False)
+    tree_id = db.Column(db.Integer, db.ForeignKey('family_tree.id'), nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_ancestry_closure_tree_id_depth', 'tree_id', 'depth'),
+    )
+
+class MemberTombstone(db.Model):
+    """
+    Represents the deletion of a family member, for the change feed of its tree.
+
+    Attributes:
+        id (int): The ID of the tombstone.
+        member_id (int): The ID of the deleted family member.
+        tree_id (int): The ID of the family tree the member belonged to.
+        change_seq (int): Version of the tree at the deletion.
+        deleted_at (DateTime): UTC time of the deletion.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    member_id = db.Column(db.Integer, nullable=False)
+    tree_id = db.Column(db.Integer, db.ForeignKey('family_tree.id'), nullable=False)
+    change_seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+
+    __table_args__ = (
+        db.Index('ix_member_tombstone_tree_id_change_seq', 'tree_id', 'change_seq', 'member_id'),
+    )
+
+class Job(db.Model):
+    """
+    Represents a background job and its outcome.
+
+    Attributes:
+        id (int): The unique identifier for the job.
+        user_id (int): The ID of the user who started the job.
+        kind (str): What the job does, e.g. 'delete_tree' or 'export_gedcom'.
+        tree_id (int): The ID of the family tree the job works on, kept after the tree is deleted.
+        status (str): 'queued', 'running', 'succeeded' or 'failed'.
+        progress (int): Percentage of the work done.
+        result (JSON): The outcome of a succeeded job, e.g. import counts.
+        result_path (str): The file produced by the job, if any, on the server.
+        error (str): The error message of a failed job.
+        created_at (DateTime): UTC time the job was queued.
+        started_at (DateTime): UTC time the job started running.
+        finished_at (DateTime): UTC time the job succeeded or failed.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(50), nullable=False)
+    tree_id = db.Column(db.Integer)
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    result = db.Column(db.JSON)
+    result_path = db.Column(db.String(255))
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=utc_now)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+    @staticmethod
+    def create_job(user_id, kind, tree_id=None):
+        """
+        Queue a new job.
+
+        Args:
+            user_id (int): The ID of the user starting the job.
+            kind (str): What the job does.
+            tree_id (int): The ID of the family tree the job works on.
+
+        Returns:
+            Job: The new job.
+
+        Raises:
+            Exception: If an error occurs during creation.
+        """
+        try:
+            job = Job(user_id=user_id, kind=kind, tree_id=tree_id)
+            db.session.add(job)
+            db.session.commit()
+            return job
         except Exception as e:
             db.session.rollback()
             raise e
 
+    @staticmethod
+    def get_job(job_id, user_id):
+        """
+        Get a job of a user.
+
+        Args:
+            job_id (int): The ID of the job.
+            user_id (int): The ID of the user who started the job.
+
+        Returns:
+            Job: The job, or None if the user has no such job.
+        """
+        with primary_reads():
+            return Job.query.filter_by(id=job_id, user_id=user_id).first()
+
+""" Keep the name token index in step with ORM writes of family members """
+@event.listens_for(FamilyMember, 'after_insert')
+def index_member_name(mapper, connection, target):
+    token_rows = name_token_rows(target.id, target.tree_id, target.name)
+    if token_rows:
+        connection.execute(MemberNameToken.__table__.insert(), token_rows)
+
+@event.listens_for(FamilyMember, 'after_update')
+def reindex_member_name(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.name.history.has_changes() or state.attrs.tree_id.history.has_changes()):
+        return
+    token_table = MemberNameToken.__table__
+    connection.execute(token_table.delete().where(token_table.c.member_id == target.id))
+    token_rows = name_token_rows(target.id, target.tree_id, target.name)
+    if token_rows:
+        connection.execute(token_table.insert(), token_rows)
+
+@event.listens_for(FamilyMember, 'before_delete')
+def unindex_member_name(mapper, connection, target):
+    token_table = MemberNameToken.__table__
+    connection.execute(token_table.delete().where(token_table.c.member_id == target.id))
+
+""" Hide soft-deleted family trees from ORM queries, unless run with include_deleted=True """
+@event.listens_for(db.session, 'do_orm_execute')
+def hide_deleted_trees(execute_state):
+    if execute_state.is_select and not execute_state.execution_options.get('include_deleted', False):
+        execute_state.statement = execute_state.statement.options(
+            with_loader_criteria(FamilyTree, FamilyTree.deleted_at.is_(None), include_aliases=True)
+        )
+
+""" Keep the duplicate fingerprint in step with ORM writes of family members """
+@event.listens_for(FamilyMember, 'before_insert')
+@event.listens_for(FamilyMember, 'before_update')
+def set_member_fingerprint(mapper, connection, target):
+    target.fingerprint = member_fingerprint(target.name, target.gender, target.date_of_birth)
+
+""" Stamp ORM writes of family members for the change feed; bump_version has run before the flush """
+@event.listens_for(FamilyMember, 'before_insert')
+@event.listens_for(FamilyMember, 'before_update')
+def stamp_member_change(mapper, connection, target):
+    target.updated_at = utc_now()
+    target.change_seq = FamilyTree.change_seq(target.tree_id)
+
+""" Keep the ancestry closure in step with ORM writes of family members """
+@event.listens_for(FamilyMember, 'after_insert')
+def add_member_to_closure(mapper, connection, target):
+    refresh_closure(connection, [target.id])
+
+@event.listens_for(FamilyMember, 'after_update')
+def update_member_in_closure(mapper, connection, target):
+    state = inspect(target)
+    if not (state.attrs.father_id.history.has_changes() or state.attrs.mother_id.history.has_changes()
+            or state.attrs.tree_id.history.has_changes()):
+        return
+    refresh_closure(connection, [target.id])
+
+@event.listens_for(FamilyMember, 'before_delete')
+def remove_member_from_closure(mapper, connection, target):
+    remove_from_closure(connection, target.id)
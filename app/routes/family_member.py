@@ -1,11 +1,30 @@
 """ app/routes/family_member.py """
+from datetime import date
 from flask import Blueprint, request, jsonify, session
 from app import db
-from app.models import FamilyMember, FamilyTree, User
-from app.utils.decorators import login_required
+from app.models import (
+    DuplicateMemberError, FamilyMember, FamilyTree, TreeNotFoundError, User, LOOKUP_CHUNK_SIZE, MEMBER_PATCH_FIELDS
+)
+from app.utils.decorators import login_required, tree_conditional
+from app.utils.kinship import describe_relationship, get_kinship_index
+from app.utils.search import member_fingerprint
+from app.utils.serializers import MEMBER_FIELDS, MEMBER_SUMMARY_FIELDS, serialize_member, serialize_member_rows
 
 family_member_bp = Blueprint('family_member', __name__)
 
+""" Bounds for the ancestors/descendants traversal parameters """
+LINEAGE_DEFAULT_DEPTH = 10
+LINEAGE_MAX_DEPTH = 50
+LINEAGE_DEFAULT_LIMIT = 500
+LINEAGE_MAX_LIMIT = 5000
+
+""" Page size bounds for the member search """
+SEARCH_DEFAULT_LIMIT = 100
+SEARCH_MAX_LIMIT = 1000
+
+""" Maximum number of members accepted by the bulk import """
+BULK_MAX_MEMBERS = 50000
+
 @family_member_bp.route('/api/family-trees/<int:tree_id>/members', methods=['POST'])
 @login_required
 def add_family_member(tree_id):
@@ -22,22 +41,21 @@ def add_family_member(tree_id):
         data = request.get_json()
         name = data.get('name')
         gender = data.get('gender')
-        date_of_birth = data.get('date_of_birth')
         biography = data.get('biography')
         picture_url = data.get('picture_url')
         father_name = data.get('father_name')
         mother_name = data.get('mother_name')
 
-        """ Check if the member already exists """
-        existing_member = FamilyMember.query.filter_by(
-            name=name,
-            gender=gender,
-            date_of_birth=date_of_birth,
-            tree_id=tree_id
-        ).first()
+        try:
+            date_of_birth = date.fromisoformat(data.get('date_of_birth'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'A valid date_of_birth (YYYY-MM-DD) is required.'}), 400
+
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
 
-        if existing_member:
-            return jsonify({'error': 'Member already exists in the family tree.'}), 400
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
 
         """ Fetch existing parent names for the given tree """
         father_names = [father.name for father in FamilyMember.get_all_members_in_tree(tree_id) if father.gender == 'Male']
@@ -47,8 +65,11 @@ def add_family_member(tree_id):
         father_id = FamilyMember.query.filter_by(name=father_name, tree_id=tree_id).first().id if father_name and father_name in father_names else None
         mother_id = FamilyMember.query.filter_by(name=mother_name, tree_id=tree_id).first().id if mother_name and mother_name in mother_names else None
 
-        FamilyMember.add_member(tree_id, name, gender, date_of_birth, biography, picture_url, father_id, mother_id)
-        added_member = FamilyMember.query.filter_by(name=name, tree_id=tree_id).first()
+        """ Duplicates are rejected by the unique fingerprint index """
+        try:
+            added_member = FamilyMember.add_member(tree_id, name, gender, date_of_birth, biography, picture_url, father_id, mother_id)
+        except DuplicateMemberError as e:
+            return jsonify({'error': str(e)}), 400
 
         return jsonify({
             'message': 'Family member added successfully',
@@ -58,11 +79,185 @@ def add_family_member(tree_id):
             'mother_id': added_member.mother_id
         }), 201
 
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+def resolve_bulk_members(tree_id, members):
+    """
+    Validate a bulk import payload and resolve its parent references.
+
+    Parents are given either as 'father_ref'/'mother_ref', naming the 'ref'
+    of another member in the payload, or as 'father_id'/'mother_id' of a
+    member already in the tree.
+
+    Args:
+        tree_id (int): The ID of the family tree the members will be added to.
+        members (list): The member dicts from the request payload.
+
+    Returns:
+        tuple: (list of member dicts for FamilyMember.add_members, error message or None).
+    """
+    refs = {}
+    for index, member in enumerate(members):
+        if not isinstance(member, dict):
+            return None, f'Member {index} must be an object.'
+        ref = member.get('ref')
+        if ref is not None:
+            if not isinstance(ref, (str, int)) or isinstance(ref, bool):
+                return None, f'Member {index} ref must be a string or an integer.'
+            if ref in refs:
+                return None, f'Member {index} reuses ref {ref!r}.'
+            refs[ref] = index
+
+    resolved = []
+    fingerprints = set()
+    existing_parent_ids = set()
+    for index, member in enumerate(members):
+        name = member.get('name')
+        gender = member.get('gender')
+
+        if not name or not gender or not member.get('date_of_birth'):
+            return None, f'Member {index} requires name, gender and date_of_birth.'
+
+        try:
+            date_of_birth = date.fromisoformat(member['date_of_birth'])
+        except (TypeError, ValueError):
+            return None, f'Member {index} has an invalid date_of_birth.'
+
+        fingerprint = member_fingerprint(name, gender, date_of_birth)
+        if fingerprint in fingerprints:
+            return None, f'Member {index} is duplicated in the payload.'
+        fingerprints.add(fingerprint)
+
+        new_member = {
+            'name': name,
+            'gender': gender,
+            'date_of_birth': date_of_birth,
+            'biography': member.get('biography'),
+            'picture_url': member.get('picture_url'),
+        }
+
+        for parent in ('father', 'mother'):
+            parent_ref = member.get(f'{parent}_ref')
+            parent_id = member.get(f'{parent}_id')
+            if parent_ref is not None:
+                if not isinstance(parent_ref, (str, int)) or isinstance(parent_ref, bool) or parent_ref not in refs:
+                    return None, f'Member {index} references unknown {parent}_ref {parent_ref!r}.'
+                if refs[parent_ref] == index:
+                    return None, f'Member {index} cannot be its own {parent}.'
+                new_member[f'{parent}_index'] = refs[parent_ref]
+            elif parent_id is not None:
+                if not isinstance(parent_id, int) or isinstance(parent_id, bool):
+                    return None, f'Member {index} {parent}_id must be an integer or null.'
+                new_member[f'{parent}_id'] = parent_id
+                existing_parent_ids.add(parent_id)
+
+        resolved.append(new_member)
+
+    """ Reject parent references that loop back to the same member (0: unvisited, 1: on path, 2: done) """
+    def parent_indexes(index):
+        return iter([resolved[index][key] for key in ('father_index', 'mother_index') if key in resolved[index]])
+
+    state = [0] * len(resolved)
+    for root in range(len(resolved)):
+        if state[root]:
+            continue
+        state[root] = 1
+        stack = [(root, parent_indexes(root))]
+        while stack:
+            index, parents = stack[-1]
+            parent = next(parents, None)
+            if parent is None:
+                state[index] = 2
+                stack.pop()
+            elif state[parent] == 1:
+                return None, f'Member {parent} is its own ancestor.'
+            elif state[parent] == 0:
+                state[parent] = 1
+                stack.append((parent, parent_indexes(parent)))
+
+    """ Check parents and duplicates against the tree in chunked lookups """
+    existing_parent_ids = list(existing_parent_ids)
+    found_parent_ids = set()
+    for start in range(0, len(existing_parent_ids), LOOKUP_CHUNK_SIZE):
+        chunk = existing_parent_ids[start:start + LOOKUP_CHUNK_SIZE]
+        found_parent_ids.update(
+            row.id for row in db.session.query(FamilyMember.id).filter(
+                FamilyMember.tree_id == tree_id,
+                FamilyMember.id.in_(chunk)
+            )
+        )
+
+    fingerprints = list(fingerprints)
+    for start in range(0, len(fingerprints), LOOKUP_CHUNK_SIZE):
+        chunk = fingerprints[start:start + LOOKUP_CHUNK_SIZE]
+        existing = db.session.query(FamilyMember.name).filter(
+            FamilyMember.tree_id == tree_id, FamilyMember.fingerprint.in_(chunk)
+        ).first()
+        if existing:
+            return None, f'Member {existing.name!r} already exists in the family tree.'
+
+    for index, member in enumerate(resolved):
+        for parent in ('father', 'mother'):
+            parent_id = member.get(f'{parent}_id')
+            if parent_id is not None and parent_id not in found_parent_ids:
+                return None, f'Member {index} references unknown {parent}_id {parent_id}.'
+
+    return resolved, None
+
+@family_member_bp.route('/api/family-trees/<int:tree_id>/members/bulk', methods=['POST'])
+@login_required
+def add_family_members_bulk(tree_id):
+    """
+    Add many family members to the specified family tree in one transaction.
+
+    Args:
+        tree_id (int): The ID of family tree to which the members will be added.
+
+    Returns:
+        jsonify: A JSON response containing the IDs of the added members, in payload order.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        data = request.get_json()
+        members = data.get('members') if isinstance(data, dict) else None
+
+        if not isinstance(members, list) or not members:
+            return jsonify({'error': 'A non-empty members list is required.'}), 400
+
+        if len(members) > BULK_MAX_MEMBERS:
+            return jsonify({'error': f'At most {BULK_MAX_MEMBERS} members can be added at once.'}), 400
+
+        resolved, error = resolve_bulk_members(tree_id, members)
+
+        if error:
+            return jsonify({'error': error}), 400
+
+        try:
+            member_ids = FamilyMember.add_members(tree_id, resolved)
+        except DuplicateMemberError as e:
+            return jsonify({'error': str(e)}), 400
+
+        return jsonify({
+            'message': 'Family members added successfully',
+            'member_ids': member_ids
+        }), 201
+
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>', methods=['GET'])
 @login_required
+@tree_conditional
 def get_family_member(tree_id, member_id):
     """
     Retrieve member information in the specified family tree.
@@ -86,23 +281,13 @@ def get_family_member(tree_id, member_id):
         if not member:
             return jsonify({'error': 'Family member not found'}), 404
 
-        member_data = {
-            'id': member.id,
-            'name': member.name,
-            'gender': member.gender,
-            'date_of_birth': member.date_of_birth,
-            'biography': member.biography,
-            'picture_url': member.picture_url,
-            'father_id': member.father_id,
-            'mother_id': member.mother_id,
-        }
-
-        return jsonify({'family_member': member_data}), 200
+        return jsonify({'family_member': serialize_member(member)}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>/siblings', methods=['GET'])
 @login_required
+@tree_conditional
 def get_siblings(tree_id, member_id):
     """
     Retrieve siblings of a family member in the specified family tree.
@@ -115,30 +300,25 @@ def get_siblings(tree_id, member_id):
         jsonify: A JSON response containing the siblings of the family member.
     """
     try:
-        member = FamilyMember.query.filter_by(id=member_id, tree_id=tree_id).first()
+        tree_version = FamilyTree.get_version(tree_id, session.get('user_id'))
 
-        if not member:
+        if tree_version is None:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        kinship_index = get_kinship_index(tree_id, tree_version.version)
+
+        if member_id not in kinship_index:
             return jsonify({'error': 'Family member not found'}), 404
 
-        siblings = member.get_siblings()
-
-        siblings_list = []
-        for sibling in siblings:
-            siblings_list.append({
-                'id': sibling.id,
-                'name': sibling.name,
-                'gender': sibling.gender,
-                'date_of_birth': sibling.date_of_birth,
-                'biography': sibling.biography,
-                'picture_url': sibling.picture_url,
-            })
+        siblings = FamilyMember.get_members_by_ids(tree_id, kinship_index.siblings(member_id), MEMBER_SUMMARY_FIELDS)
 
-        return jsonify({'siblings': siblings_list}), 200
+        return jsonify({'siblings': serialize_member_rows(siblings, MEMBER_SUMMARY_FIELDS)}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>/parents', methods=['GET'])
 @login_required
+@tree_conditional
 def get_parents(tree_id, member_id):
     """
     Retrieve parents of a family member in the specified family tree.
@@ -151,36 +331,185 @@ def get_parents(tree_id, member_id):
         jsonify: A JSON response containing the parents of the family member.
     """
     try:
-        member = FamilyMember.query.filter_by(id=member_id, tree_id=tree_id).first()
+        tree_version = FamilyTree.get_version(tree_id, session.get('user_id'))
 
-        if not member:
+        if tree_version is None:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        kinship_index = get_kinship_index(tree_id, tree_version.version)
+
+        if member_id not in kinship_index:
             return jsonify({'error': 'Family member not found'}), 404
 
-        parents = member.get_parents()
+        father_id, mother_id = kinship_index.parents(member_id)
+        parent_ids = [parent_id for parent_id in (father_id, mother_id) if parent_id]
+        members = {
+            parent.id: parent
+            for parent in FamilyMember.get_members_by_ids(tree_id, parent_ids, MEMBER_SUMMARY_FIELDS)
+        }
 
         parents_data = {
-            'father': {
-                'id': parents['father'].id,
-                'name': parents['father'].name,
-                'gender': parents['father'].gender,
-                'date_of_birth': parents['father'].date_of_birth,
-                'biography': parents['father'].biography,
-                'picture_url': parents['father'].picture_url,
-            } if parents['father'] else None,
-            'mother': {
-                'id': parents['mother'].id,
-                'name': parents['mother'].name,
-                'gender': parents['mother'].gender,
-                'date_of_birth': parents['mother'].date_of_birth,
-                'biography': parents['mother'].biography,
-                'picture_url': parents['mother'].picture_url,
-            } if parents['mother'] else None,
+            'father': serialize_member(members.get(father_id), MEMBER_SUMMARY_FIELDS),
+            'mother': serialize_member(members.get(mother_id), MEMBER_SUMMARY_FIELDS),
         }
 
         return jsonify({'parents': parents_data}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+def get_lineage(tree_id, member_id, ancestors):
+    """
+    Retrieve the ancestors or descendants of a family member.
+
+    Args:
+        tree_id (int): The ID of family tree the member belongs.
+        member_id (int): The ID of the family member to start from.
+        ancestors (bool): Retrieve ancestors if True, else descendants.
+
+    Returns:
+        jsonify: A JSON response containing the lineage of the family member.
+    """
+    depth = request.args.get('depth', LINEAGE_DEFAULT_DEPTH, type=int)
+    limit = request.args.get('limit', LINEAGE_DEFAULT_LIMIT, type=int)
+
+    if not 1 <= depth <= LINEAGE_MAX_DEPTH:
+        return jsonify({'error': f'depth must be between 1 and {LINEAGE_MAX_DEPTH}'}), 400
+
+    if not 1 <= limit <= LINEAGE_MAX_LIMIT:
+        return jsonify({'error': f'limit must be between 1 and {LINEAGE_MAX_LIMIT}'}), 400
+
+    user_id = session.get('user_id')
+    family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+    if not family_tree:
+        return jsonify({'error': 'Family tree not found'}), 404
+
+    member = FamilyMember.query.filter_by(id=member_id, tree_id=tree_id).first()
+
+    if not member:
+        return jsonify({'error': 'Family member not found'}), 404
+
+    if ancestors:
+        lineage = FamilyMember.get_ancestors(tree_id, member_id, depth, limit)
+    else:
+        lineage = FamilyMember.get_descendants(tree_id, member_id, depth, limit)
+
+    lineage_list = serialize_member_rows(lineage, MEMBER_FIELDS + ['generation'])
+
+    return jsonify({'ancestors' if ancestors else 'descendants': lineage_list}), 200
+
+@family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>/ancestors', methods=['GET'])
+@login_required
+@tree_conditional
+def get_ancestors(tree_id, member_id):
+    """
+    Retrieve ancestors of a family member in the specified family tree.
+
+    Query Args:
+        depth (int): The maximum number of generations to walk up.
+        limit (int): The maximum number of ancestors to return.
+
+    Args:
+        tree_id (int): The ID of family tree the member belongs.
+        member_id (int): The ID of family member whose ancestors to retrieve.
+
+    Returns:
+        jsonify: A JSON response containing the ancestors of the family member.
+    """
+    try:
+        return get_lineage(tree_id, member_id, ancestors=True)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>/descendants', methods=['GET'])
+@login_required
+@tree_conditional
+def get_descendants(tree_id, member_id):
+    """
+    Retrieve descendants of a family member in the specified family tree.
+
+    Query Args:
+        depth (int): The maximum number of generations to walk down.
+        limit (int): The maximum number of descendants to return.
+
+    Args:
+        tree_id (int): The ID of family tree the member belongs.
+        member_id (int): The ID of family member whose descendants to retrieve.
+
+    Returns:
+        jsonify: A JSON response containing the descendants of the family member.
+    """
+    try:
+        return get_lineage(tree_id, member_id, ancestors=False)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_member_bp.route('/api/family-trees/<int:tree_id>/relationship', methods=['GET'])
+@login_required
+@tree_conditional
+def get_relationship(tree_id):
+    """
+    Retrieve how two family members in the specified family tree are related.
+
+    Query Args:
+        a (int): The ID of the family member the relationship is described from.
+        b (int): The ID of the relative.
+
+    Args:
+        tree_id (int): The ID of family tree the members belong to.
+
+    Returns:
+        jsonify: A JSON response containing what b is to a and their lowest common ancestors.
+    """
+    try:
+        tree_version = FamilyTree.get_version(tree_id, session.get('user_id'))
+
+        if tree_version is None:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        member_id = request.args.get('a', type=int)
+        relative_id = request.args.get('b', type=int)
+
+        if member_id is None or relative_id is None:
+            return jsonify({'error': 'Both a and b member IDs are required'}), 400
+
+        kinship_index = get_kinship_index(tree_id, tree_version.version)
+
+        if member_id not in kinship_index or relative_id not in kinship_index:
+            return jsonify({'error': 'Family member not found'}), 404
+
+        common_ancestors = kinship_index.relationship(member_id, relative_id)
+        members = {
+            member.id: member
+            for member in FamilyMember.get_members_by_ids(
+                tree_id, [relative_id] + [ancestor_id for ancestor_id, _, _ in common_ancestors], ['id', 'name', 'gender']
+            )
+        }
+
+        relationship = None
+        if common_ancestors:
+            _, up, down = common_ancestors[0]
+            relationship = describe_relationship(up, down, members[relative_id].gender, len(common_ancestors) == 1)
+
+        ancestors_list = []
+        for ancestor_id, up, down in common_ancestors:
+            ancestors_list.append({
+                'id': ancestor_id,
+                'name': members[ancestor_id].name,
+                'gender': members[ancestor_id].gender,
+                'generations_from_a': up,
+                'generations_from_b': down,
+            })
+
+        return jsonify({
+            'a': member_id,
+            'b': relative_id,
+            'relationship': relationship,
+            'lowest_common_ancestors': ancestors_list,
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
 @family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>', methods=['PUT'])
 @login_required
 def update_family_member(tree_id, member_id):
@@ -198,44 +527,155 @@ def update_family_member(tree_id, member_id):
         data = request.get_json()
         name = data.get('name')
         gender = data.get('gender')
-        date_of_birth = data.get('date_of_birth')
         biography = data.get('biography')
         picture_url = data.get('picture_url')
         father_name = data.get('father_name')
         mother_name = data.get('mother_name')
 
+        try:
+            date_of_birth = date.fromisoformat(data.get('date_of_birth'))
+        except (TypeError, ValueError):
+            return jsonify({'error': 'A valid date_of_birth (YYYY-MM-DD) is required.'}), 400
+
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
         family_member = FamilyMember.query.filter_by(id=member_id, tree_id=tree_id).first()
 
         if not family_member:
             return jsonify({'error': 'Family member not found'}), 404
 
-        existing_member_with_details = FamilyMember.query.filter_by(
-            name=name,
-            gender=gender,
-            date_of_birth=date_of_birth,
-            tree_id=tree_id
-        ).filter(FamilyMember.id != member_id).first()
+        """ A member is never resolved as its own parent """
+        relatives = [relative for relative in FamilyMember.get_all_members_in_tree(tree_id) if relative.id != member_id]
+        father_names = [father.name for father in relatives if father.gender == 'Male']
+        mother_names = [mother.name for mother in relatives if mother.gender == 'Female']
+        father_id = FamilyMember.query.filter_by(name=father_name, tree_id=tree_id).filter(FamilyMember.id != member_id).first().id if father_name and father_name in father_names else None
+        mother_id = FamilyMember.query.filter_by(name=mother_name, tree_id=tree_id).filter(FamilyMember.id != member_id).first().id if mother_name and mother_name in mother_names else None
+
+        for parent_id in (father_id, mother_id):
+            if parent_id and FamilyMember.is_ancestor(member_id, parent_id):
+                return jsonify({'error': 'A family member cannot be their own ancestor.'}), 400
+
+        try:
+            family_member.update_member(
+                name=name,
+                gender=gender,
+                date_of_birth=date_of_birth,
+                biography=biography,
+                picture_url=picture_url,
+                father_id=father_id,
+                mother_id=mother_id
+            )
+        except DuplicateMemberError as e:
+            return jsonify({'error': str(e)}), 400
 
-        if existing_member_with_details:
-            return jsonify({'error': 'Member already exists in the family tree.'}), 400
+        return jsonify({'message': 'Family member updated successfully'}), 200
 
-        father_names = [father.name for father in FamilyMember.get_all_members_in_tree(tree_id) if father.gender == 'Male']
-        mother_names = [mother.name for mother in FamilyMember.get_all_members_in_tree(tree_id) if mother.gender == 'Female']
-        father_id = FamilyMember.query.filter_by(name=father_name, tree_id=tree_id).first().id if father_name and father_name in father_names else None
-        mother_id = FamilyMember.query.filter_by(name=mother_name, tree_id=tree_id).first().id if mother_name and mother_name in mother_names else None
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-        family_member.update_member(
-            name=name,
-            gender=gender,
-            date_of_birth=date_of_birth,
-            biography=biography,
-            picture_url=picture_url,
-            father_id=father_id,
-            mother_id=mother_id
-        )
+@family_member_bp.route('/api/family-trees/<int:tree_id>/members/<int:member_id>', methods=['PATCH'])
+@login_required
+def patch_family_member(tree_id, member_id):
+    """
+    Update only the supplied fields of a specific family member.
 
-        return jsonify({'message': 'Family member updated successfully'}), 200
+    Parents are given as 'father_id'/'mother_id', or by name as
+    'father_name'/'mother_name'; null removes the parent. Parents are only
+    looked up when one of these fields is present, and duplicates are caught
+    by the fingerprint index, so the cost of a request does not depend on
+    the size of the tree.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+        member_id (int): The ID of the family member.
+
+    Returns:
+        jsonify: A JSON response containing the updated family member.
+    """
+    try:
+        data = request.get_json(silent=True)
+
+        if not isinstance(data, dict) or not data:
+            return jsonify({'error': 'A JSON object with the fields to update is required.'}), 400
+
+        unknown_fields = set(data) - set(MEMBER_PATCH_FIELDS) - {'father_name', 'mother_name'}
+        if unknown_fields:
+            return jsonify({'error': f"Unknown fields: {', '.join(sorted(unknown_fields))}."}), 400
+
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        family_member = FamilyMember.query.filter_by(id=member_id, tree_id=tree_id).first()
+
+        if not family_member:
+            return jsonify({'error': 'Family member not found'}), 404
+
+        changes = {}
+        for field in ('name', 'gender'):
+            if field in data:
+                if not isinstance(data[field], str) or not data[field].strip():
+                    return jsonify({'error': f'{field} cannot be empty.'}), 400
+                changes[field] = data[field]
+
+        for field in ('biography', 'picture_url'):
+            if field in data:
+                changes[field] = data[field]
+
+        if 'date_of_birth' in data:
+            try:
+                changes['date_of_birth'] = date.fromisoformat(data['date_of_birth'])
+            except (TypeError, ValueError):
+                return jsonify({'error': 'date_of_birth must be a valid date (YYYY-MM-DD).'}), 400
+
+        """ A member is never resolved as its own parent; parents given by name must have the matching gender """
+        for parent, parent_gender in (('father', 'Male'), ('mother', 'Female')):
+            if f'{parent}_id' in data and f'{parent}_name' in data:
+                return jsonify({'error': f'Give either {parent}_id or {parent}_name, not both.'}), 400
+
+            if f'{parent}_id' in data:
+                parent_key = data[f'{parent}_id']
+                if parent_key is not None and (not isinstance(parent_key, int) or isinstance(parent_key, bool)):
+                    return jsonify({'error': f'{parent}_id must be an integer or null.'}), 400
+                criteria = [FamilyMember.id == parent_key]
+            elif f'{parent}_name' in data:
+                parent_key = data[f'{parent}_name']
+                criteria = [FamilyMember.name == parent_key, FamilyMember.gender == parent_gender]
+            else:
+                continue
+
+            if parent_key is None:
+                changes[f'{parent}_id'] = None
+                continue
+
+            parent_member = db.session.query(FamilyMember.id).filter(
+                *criteria, FamilyMember.tree_id == tree_id, FamilyMember.id != member_id
+            ).first()
+
+            if not parent_member:
+                return jsonify({'error': f'Unknown {parent} {parent_key!r}.'}), 400
+            changes[f'{parent}_id'] = parent_member.id
+
+        try:
+            family_member.patch_member(changes)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
 
+        return jsonify({
+            'message': 'Family member updated successfully',
+            'family_member': serialize_member(family_member)
+        }), 200
+
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -245,45 +685,43 @@ def search_family_members_all_trees():
     """
     Search for family members across all family trees of the logged-in user based on name.
 
+    Query Args:
+        q (str): The text to find in member names.
+        offset (int): The number of ranked results to skip.
+        limit (int): The maximum number of results to return.
+
     Returns:
-        jsonify: A JSON response containing the search results grouped by family tree.
+        jsonify: A JSON response containing the ranked search results grouped by family tree.
     """
     try:
         user_id = session.get('user_id')
 
-        # Retrieve all family trees of the user
-        user_family_trees = FamilyTree.query.filter_by(user_id=user_id).all()
-
         search_query = request.args.get('q')
 
-        if not search_query:
+        if not search_query or not search_query.strip():
             return jsonify({'error': 'Search query is required'}), 400
 
-        search_results = {}
+        offset = request.args.get('offset', 0, type=int)
+        limit = request.args.get('limit', SEARCH_DEFAULT_LIMIT, type=int)
 
-        # Search for family members with matching names in each family tree
-        for tree in user_family_trees:
-            matching_members = FamilyMember.query.filter(
-                FamilyMember.tree_id == tree.id,
-                FamilyMember.name.ilike(f"%{search_query}%")
-            ).all()
+        if offset < 0 or not 1 <= limit <= SEARCH_MAX_LIMIT:
+            return jsonify({'error': f'offset must be positive and limit between 1 and {SEARCH_MAX_LIMIT}'}), 400
 
-            tree_results = []
-            for member in matching_members:
-                tree_results.append({
-                    'id': member.id,
-                    'name': member.name,
-                    'gender': member.gender,
-                    'date_of_birth': member.date_of_birth,
-                    'biography': member.biography,
-                    'picture_url': member.picture_url,
-                    'father_id': member.father_id,
-                    'mother_id': member.mother_id,
-                })
+        # Every tree of the user gets an entry, even without matches
+        user_family_trees = db.session.query(FamilyTree.id, FamilyTree.name).filter_by(user_id=user_id).all()
+        search_results = {tree.name: [] for tree in user_family_trees}
+        tree_names = {tree.id: tree.name for tree in user_family_trees}
 
-            search_results[tree.name] = tree_results
+        matches = FamilyMember.search_members(user_id, search_query, offset, limit + 1)
 
-        return jsonify({'search_results': search_results}), 200
+        for member, relevance in matches[:limit]:
+            member_data = serialize_member(member)
+            member_data['relevance'] = relevance
+            search_results[tree_names[member.tree_id]].append(member_data)
+
+        next_offset = offset + limit if len(matches) > limit else None
+
+        return jsonify({'search_results': search_results, 'next_offset': next_offset}), 200
 
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -302,6 +740,12 @@ def delete_family_member(tree_id, member_id):
         Response: JSON response indicating the success of the deletion.
     """
     try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
         # Fetch the existing family member
         member = FamilyMember.query.filter_by(id=member_id, tree_id=tree_id).first()
 
@@ -312,6 +756,8 @@ def delete_family_member(tree_id, member_id):
         member.delete_member()
 
         return jsonify({'message': 'Family member deleted successfully'}), 200
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
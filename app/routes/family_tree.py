@@ -1,11 +1,134 @@
 """ app/routes/family_tree.py """
-from flask import Blueprint, request, jsonify, session
+import io
+import os
+import shutil
+from uuid import uuid4
+from flask import Blueprint, Response, current_app, request, jsonify, session, stream_with_context
 from app import db
-from app.models import FamilyTree, FamilyMember, User
-from app.utils.decorators import login_required
+from app.models import FamilyTree, FamilyMember, TreeNotFoundError, User
+from app.utils.decorators import login_required, tree_conditional
+from app.utils.events import stream_tree_events
+from app.utils.gedcom import export_gedcom, import_gedcom
+from app.utils.jobs import get_results_dir, start_job, wants_async
+from app.utils.stats import get_tree_stats
+from app.utils.serializers import (
+    MEMBER_FIELDS, MEMBER_SUMMARY_FIELDS, TREE_SUMMARY_FIELDS, serialize_job, serialize_member_rows, serialize_tree
+)
 
 family_tree_bp = Blueprint('family_tree', __name__)
 
+""" Paging and sparse fieldset options for the tree member listing """
+MEMBERS_DEFAULT_LIMIT = 1000
+MEMBERS_MAX_LIMIT = 5000
+""" Biographies are the largest column, so they are only loaded when requested """
+MEMBER_DEFAULT_FIELDS = [field for field in MEMBER_SUMMARY_FIELDS if field != 'biography']
+
+def parse_change_position(position):
+    """
+    Parse a change feed position.
+
+    Args:
+        position (str): 'change_seq' or 'change_seq:member_id'.
+
+    Returns:
+        tuple: (change_seq, member ID or None).
+
+    Raises:
+        ValueError: If the position is malformed.
+    """
+    since, _, after_id = position.partition(':')
+    return int(since), int(after_id) if after_id else None
+
+def serialize_changes(changes, fields):
+    """
+    Serialize change feed entries.
+
+    Args:
+        changes (list): (change_seq, member ID, row or None) tuples, see FamilyMember.get_changes.
+        fields (list): Names of the member columns in the rows.
+
+    Returns:
+        list: Dicts with change_seq, member_id and deleted, plus the member for a write.
+    """
+    members = iter(serialize_member_rows([row for _, _, row in changes if row is not None], fields))
+    return [
+        {'change_seq': change_seq, 'member_id': member_id, 'deleted': True} if row is None else
+        {'change_seq': change_seq, 'member_id': member_id, 'deleted': False, 'member': next(members)}
+        for change_seq, member_id, row in changes
+    ]
+
+def job_accepted(job):
+    """
+    Build the response to a request queued as a background job.
+
+    Args:
+        job (Job): The queued job.
+
+    Returns:
+        tuple: A 202 JSON response containing the job, with its status URL as Location.
+    """
+    data = serialize_job(job)
+    return jsonify({'message': 'Job queued', 'job': data}), 202, {'Location': data['status_url']}
+
+def purge_tree_job(job, tree_id):
+    """
+    Background job purging a soft-deleted family tree in batches.
+
+    Args:
+        job (JobContext): The running job.
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        dict: The number of members deleted.
+    """
+    return {'members': FamilyTree.purge_tree(tree_id, job.report)}
+
+def export_gedcom_job(job, tree_id):
+    """
+    Background job writing the GEDCOM export of a family tree to the job's result file.
+
+    Args:
+        job (JobContext): The running job.
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        dict: The number of exported members.
+    """
+    family_tree = db.session.get(FamilyTree, tree_id)
+    if not family_tree:
+        raise ValueError('Family tree not found')
+
+    with open(job.result_file('ged'), 'w', encoding='utf-8', newline='') as gedcom_file:
+        for chunk in export_gedcom(family_tree):
+            gedcom_file.write(chunk)
+    return {'members': family_tree.get_tree_members_count()}
+
+def import_gedcom_job(job, tree_id, path):
+    """
+    Background job importing a spooled GEDCOM upload, reporting progress by bytes read.
+
+    Args:
+        job (JobContext): The running job.
+        tree_id (int): The ID of the family tree to import into.
+        path (str): The spooled upload, deleted once imported.
+
+    Returns:
+        dict: The import counts.
+    """
+    try:
+        total = os.path.getsize(path)
+        with open(path, 'rb') as gedcom_file:
+            def lines():
+                done = 0
+                for raw_line in gedcom_file:
+                    done += len(raw_line)
+                    job.report(done, total)
+                    yield raw_line.decode('utf-8', errors='replace')
+
+            return import_gedcom(tree_id, lines())
+    finally:
+        os.remove(path)
+
 @family_tree_bp.route('/api/family-trees', methods=['GET'])
 @login_required
 def get_family_trees():
@@ -21,15 +144,24 @@ def get_family_trees():
         user = User.query.get(user_id)
         family_trees = user.get_user_family_trees()
 
-        family_tree_list = []
-        for tree in family_trees:
-            family_tree_list.append({
-                'id': tree.id,
-                'name': tree.name,
-                'description': tree.description,
-            })
+        return jsonify({'family_trees': [serialize_tree(tree) for tree in family_trees]}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_tree_bp.route('/api/family-trees/summary', methods=['GET'])
+@login_required
+def get_family_tree_summaries():
+    """
+    Retrieve the family trees of the logged-in user with their member count,
+    generation count, earliest and latest birth dates and last change time.
+
+    Returns:
+        jsonify: A JSON response containing the user's family tree summaries.
+    """
+    try:
+        summaries = FamilyTree.get_tree_summaries(session.get('user_id'))
 
-        return jsonify({'family_trees': family_tree_list}), 200
+        return jsonify({'family_trees': [serialize_tree(summary, TREE_SUMMARY_FIELDS) for summary in summaries]}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -61,6 +193,7 @@ def create_family_tree():
 
 @family_tree_bp.route('/api/family-trees/<int:tree_id>', methods=['GET'])
 @login_required
+@tree_conditional
 def get_family_tree(tree_id):
     """
     Retrieve information about a specific family tree.
@@ -78,27 +211,224 @@ def get_family_tree(tree_id):
         if not family_tree:
             return jsonify({'error': 'Family tree not found'}), 404
 
-        tree_data = {
-            'id': family_tree.id,
-            'name': family_tree.name,
-            'description': family_tree.description,
-        }
-
-        return jsonify({'family_tree': tree_data}), 200
+        return jsonify({'family_tree': serialize_tree(family_tree)}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @family_tree_bp.route('/api/family-trees/<int:tree_id>/members', methods=['GET'])
 @login_required
+@tree_conditional
 def get_all_members_in_tree(tree_id):
     """
-    Retrieve a list of all family members in a specific family tree for logged in user.
+    Retrieve a page of the family members in a specific family tree for logged in user.
+
+    Query Args:
+        cursor (int): The next_cursor of the previous page; omit for the first page.
+        limit (int): The maximum number of members to return.
+        fields (str): Comma-separated member fields to return; the ID is always included.
 
     Args:
         tree_id (int): The ID of the family tree to retrieve members from.
 
     Returns:
-        jsonify: A JSON response containing the family members in the tree.
+        jsonify: A JSON response containing the family members in the page and the next cursor.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        cursor = request.args.get('cursor', 0, type=int)
+        limit = request.args.get('limit', MEMBERS_DEFAULT_LIMIT, type=int)
+
+        if not 1 <= limit <= MEMBERS_MAX_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MEMBERS_MAX_LIMIT}'}), 400
+
+        fields = MEMBER_DEFAULT_FIELDS
+        if request.args.get('fields'):
+            fields = ['id'] + [field for field in request.args['fields'].split(',') if field and field != 'id']
+            unknown_fields = [field for field in fields if field not in MEMBER_FIELDS]
+            if unknown_fields:
+                return jsonify({'error': f"Unknown fields: {', '.join(unknown_fields)}"}), 400
+
+        members = FamilyMember.get_members_page(tree_id, cursor, limit + 1, fields)
+        next_cursor = members[limit - 1].id if len(members) > limit else None
+
+        return jsonify({'family_members': serialize_member_rows(members[:limit], fields), 'next_cursor': next_cursor}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_tree_bp.route('/api/family-trees/<int:tree_id>/changes', methods=['GET'])
+@login_required
+def get_family_tree_changes(tree_id):
+    """
+    Retrieve the members added, updated and deleted in a family tree since a change feed position.
+
+    Writes and deletions come in a single list in feed order, so a client
+    applying them in turn ends with the latest state of every member ID.
+
+    Positions are opaque strings. A full sync starts from '0' (or no
+    'since' at all) and pages through the feed with next_since while
+    has_more is true; the final next_since is kept for the next sync.
+
+    Query Args:
+        since (str): The next_since of the previous response.
+        limit (int): The maximum number of changes to return.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        jsonify: A JSON response containing the changes, see serialize_changes,
+            and the position to continue from.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.execution_options(include_deleted=True).filter_by(
+            id=tree_id, user_id=user_id
+        ).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        if family_tree.deleted_at is not None:
+            return jsonify({'error': 'Family tree deleted'}), 410
+
+        try:
+            since, after_id = parse_change_position(request.args.get('since', '0'))
+        except ValueError:
+            return jsonify({'error': 'since must be a position returned as next_since'}), 400
+
+        limit = request.args.get('limit', MEMBERS_DEFAULT_LIMIT, type=int)
+
+        if not 1 <= limit <= MEMBERS_MAX_LIMIT:
+            return jsonify({'error': f'limit must be between 1 and {MEMBERS_MAX_LIMIT}'}), 400
+
+        fields = MEMBER_FIELDS + ['updated_at', 'change_seq']
+        changes = FamilyMember.get_changes(tree_id, since, after_id, limit + 1, fields)
+        has_more = len(changes) > limit
+        changes = changes[:limit]
+
+        """ The tree version was read in the same transaction, so no change above it is visible yet """
+        next_since = f'{changes[-1][0]}:{changes[-1][1]}' if has_more else str(max(family_tree.version, since))
+
+        return jsonify({
+            'tree_id': tree_id,
+            'changes': serialize_changes(changes, fields),
+            'next_since': next_since,
+            'has_more': has_more,
+        }), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_tree_bp.route('/api/family-trees/<int:tree_id>/events', methods=['GET'])
+@login_required
+def stream_family_tree_events(tree_id):
+    """
+    Stream the member changes of a family tree as Server-Sent Events.
+
+    The stream starts at the current version of the tree, at the 'since'
+    position of the change feed, or after the event named by a
+    Last-Event-ID header, which browsers send when they reconnect.
+
+    Query Args:
+        since (str): A next_since of the change feed, or the ID of an event.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        Response: A text/event-stream response, see stream_tree_events.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.execution_options(include_deleted=True).filter_by(
+            id=tree_id, user_id=user_id
+        ).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        if family_tree.deleted_at is not None:
+            return jsonify({'error': 'Family tree deleted'}), 410
+
+        position = request.headers.get('Last-Event-ID') or request.args.get('since')
+        try:
+            since, after_id = parse_change_position(position) if position else (family_tree.version, None)
+        except ValueError:
+            return jsonify({'error': 'since and Last-Event-ID must be change feed positions'}), 400
+
+        return Response(
+            stream_with_context(stream_tree_events(tree_id, since, after_id)),
+            mimetype='text/event-stream',
+            headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_tree_bp.route('/api/family-trees/<int:tree_id>/graph', methods=['GET'])
+@login_required
+@tree_conditional
+def get_family_tree_graph(tree_id):
+    """
+    Retrieve the whole family tree as a compact graph for visualization.
+
+    Nodes are returned as parallel arrays, one per column, and edges as
+    parallel arrays of parent ID, child ID and relation ('father' or 'mother').
+
+    Args:
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        jsonify: A JSON response containing the nodes and edges of the family tree.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        rows = FamilyMember.get_graph_rows(tree_id)
+
+        nodes = {'id': [], 'name': [], 'gender': [], 'date_of_birth': []}
+        for row in rows:
+            nodes['id'].append(row.id)
+            nodes['name'].append(row.name)
+            nodes['gender'].append(row.gender)
+            nodes['date_of_birth'].append(row.date_of_birth)
+
+        member_ids = set(nodes['id'])
+        edges = {'parent': [], 'child': [], 'relation': []}
+        for row in rows:
+            for relation, parent_id in (('father', row.father_id), ('mother', row.mother_id)):
+                if parent_id in member_ids:
+                    edges['parent'].append(parent_id)
+                    edges['child'].append(row.id)
+                    edges['relation'].append(relation)
+
+        return jsonify({'tree_id': tree_id, 'nodes': nodes, 'edges': edges}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_tree_bp.route('/api/family-trees/<int:tree_id>/stats', methods=['GET'])
+@login_required
+@tree_conditional
+def get_family_tree_stats(tree_id):
+    """
+    Retrieve statistics of a family tree: members per generation, gender
+    split, births per decade, average family size and most common names.
+
+    The statistics are computed with grouped queries and cached until the
+    tree changes.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        jsonify: A JSON response containing the statistics.
     """
     try:
         user_id = session.get('user_id')
@@ -107,23 +437,84 @@ def get_all_members_in_tree(tree_id):
         if not family_tree:
             return jsonify({'error': 'Family tree not found'}), 404
 
-        members = FamilyMember.query.filter_by(tree_id=tree_id).all()
+        return jsonify({'tree_id': tree_id, 'stats': get_tree_stats(tree_id, family_tree.version)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@family_tree_bp.route('/api/family-trees/<int:tree_id>/gedcom', methods=['GET'])
+@login_required
+@tree_conditional
+def export_family_tree_gedcom(tree_id):
+    """
+    Export a specific family tree as a streamed GEDCOM 5.5.1 file.
+
+    With a 'Prefer: respond-async' header, the file is written by a
+    background job instead and a 202 response points to the job.
+
+    Args:
+        tree_id (int): The ID of the family tree to export.
+
+    Returns:
+        Response: A streaming response containing the GEDCOM file.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
 
-        members_list = []
-        for member in members:
-            members_list.append({
-                'id': member.id,
-                'name': member.name,
-                'gender': member.gender,
-                'date_of_birth': member.date_of_birth,
-                'biography': member.biography,
-                'picture_url': member.picture_url,
-            })
+        if wants_async():
+            return job_accepted(start_job(user_id, 'export_gedcom', export_gedcom_job, tree_id, tree_id=tree_id))
 
-        return jsonify({'family_members': members_list}), 200
+        return Response(
+            stream_with_context(export_gedcom(family_tree)),
+            mimetype='application/x-gedcom',
+            headers={'Content-Disposition': f'attachment; filename=family-tree-{tree_id}.ged'}
+        )
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@family_tree_bp.route('/api/family-trees/<int:tree_id>/gedcom', methods=['POST'])
+@login_required
+def import_family_tree_gedcom(tree_id):
+    """
+    Import a GEDCOM file into a specific family tree.
+
+    The file is sent either as the raw request body or as the 'file' field
+    of a multipart form, and is read incrementally. With a 'Prefer:
+    respond-async' header, the file is saved and imported by a background
+    job instead and a 202 response points to the job.
+
+    Args:
+        tree_id (int): The ID of the family tree to import into.
+
+    Returns:
+        jsonify: A JSON response containing the import counts.
+    """
+    try:
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
+
+        if not family_tree:
+            return jsonify({'error': 'Family tree not found'}), 404
+
+        upload = request.files.get('file')
+        stream = upload.stream if upload else request.stream
+
+        if wants_async():
+            path = os.path.join(get_results_dir(current_app), f'upload-{uuid4().hex}.ged')
+            with open(path, 'wb') as spool:
+                shutil.copyfileobj(stream, spool)
+            return job_accepted(start_job(user_id, 'import_gedcom', import_gedcom_job, tree_id, path, tree_id=tree_id))
+
+        counts = import_gedcom(tree_id, io.TextIOWrapper(stream, encoding='utf-8-sig', errors='replace'))
+
+        return jsonify({'message': 'GEDCOM file imported successfully', **counts}), 201
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 @family_tree_bp.route('/api/family-trees/<int:tree_id>', methods=['PUT'])
 @login_required
@@ -138,7 +529,8 @@ def update_family_tree(tree_id):
         Response: JSON response with updated family tree details.
     """
     try:
-        family_tree = FamilyTree.query.filter_by(id=tree_id).first()
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
 
         if not family_tree:
             return jsonify({'error': 'Family tree not found'}), 404
@@ -150,6 +542,8 @@ def update_family_tree(tree_id):
         )
 
         return jsonify({'message': 'Family tree updated successfully'}), 200
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
@@ -159,6 +553,9 @@ def delete_family_tree(tree_id):
     """
     Delete a specific family tree.
 
+    With a 'Prefer: respond-async' header, the tree is hidden at once and
+    purged by a background job, and a 202 response points to the job.
+
     Args:
         tree_id (int): The ID of the family tree.
 
@@ -166,14 +563,21 @@ def delete_family_tree(tree_id):
         Response: JSON response indicating the success of the deletion.
     """
     try:
-        family_tree = FamilyTree.query.filter_by(id=tree_id).first()
+        user_id = session.get('user_id')
+        family_tree = FamilyTree.query.filter_by(id=tree_id, user_id=user_id).first()
 
         if not family_tree:
             return jsonify({'error': 'Family tree not found'}), 404
 
+        if wants_async():
+            family_tree.soft_delete()
+            return job_accepted(start_job(user_id, 'delete_tree', purge_tree_job, tree_id, tree_id=tree_id))
+
         family_tree.delete_tree()
 
         return jsonify({'message': 'Family tree deleted successfully'}), 200
+    except TreeNotFoundError:
+        return jsonify({'error': 'Family tree not found'}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
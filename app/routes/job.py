@@ -0,0 +1,64 @@
+""" app/routes/job.py """
+import os
+from flask import Blueprint, jsonify, send_file, session
+from app.models import Job
+from app.utils.decorators import login_required
+from app.utils.serializers import serialize_job
+
+job_bp = Blueprint('job', __name__)
+
+""" Download types of job result files, by extension """
+RESULT_MIMETYPES = {'ged': 'application/x-gedcom'}
+
+@job_bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+@login_required
+def get_job(job_id):
+    """
+    Retrieve the status, progress and outcome of a background job.
+
+    Args:
+        job_id (int): The ID of the job.
+
+    Returns:
+        jsonify: A JSON response containing the job.
+    """
+    try:
+        job = Job.get_job(job_id, session.get('user_id'))
+
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        return jsonify({'job': serialize_job(job)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+@job_bp.route('/api/jobs/<int:job_id>/result', methods=['GET'])
+@login_required
+def get_job_result(job_id):
+    """
+    Download the file produced by a succeeded background job.
+
+    Args:
+        job_id (int): The ID of the job.
+
+    Returns:
+        Response: The file.
+    """
+    try:
+        job = Job.get_job(job_id, session.get('user_id'))
+
+        if not job:
+            return jsonify({'error': 'Job not found'}), 404
+
+        if job.status != 'succeeded' or not job.result_path or not os.path.exists(job.result_path):
+            return jsonify({'error': 'Job result not available'}), 404
+
+        extension = os.path.splitext(job.result_path)[1].lstrip('.')
+        return send_file(
+            job.result_path,
+            mimetype=RESULT_MIMETYPES.get(extension, 'application/octet-stream'),
+            as_attachment=True,
+            download_name=f'{job.kind}-{job.tree_id}.{extension}'
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
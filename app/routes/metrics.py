@@ -0,0 +1,21 @@
+""" app/routes/metrics.py """
+from flask import Blueprint, Response, current_app, jsonify
+from app.utils.metrics import render_metrics
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def get_metrics():
+    """
+    Expose the request and connection pool metrics for Prometheus.
+
+    Returns:
+        Response: The metrics in the Prometheus text exposition format.
+    """
+    try:
+        if not current_app.config.get('METRICS_ENABLED', True):
+            return jsonify({'error': 'Not found'}), 404
+
+        return Response(render_metrics(current_app), content_type='text/plain; version=0.0.4; charset=utf-8')
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
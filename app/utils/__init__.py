@@ -1,3 +1,3 @@
 # app/utils/__init__.py
-from .decorators import login_required
+from .decorators import login_required, tree_conditional
 
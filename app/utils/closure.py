@@ -0,0 +1,138 @@
+""" app/utils/closure.py """
+"""
+Incremental maintenance of the ancestry closure table.
+
+The closure holds one row per (ancestor, descendant) pair with the length
+of the shortest line between them, plus a depth 0 row for every member.
+When the parents of some members change, the rows of those members and
+of everything below them are recomputed one generation at a time, each
+generation with a single INSERT ... SELECT from the closure rows of its
+parents.
+"""
+
+from sqlalchemy import func, or_, select
+
+
+def _chunks(values, size):
+    """
+    Split a list into consecutive chunks.
+
+    Args:
+        values (list): The values to split.
+        size (int): The maximum chunk size.
+
+    Returns:
+        list: The chunks.
+    """
+    return [values[start:start + size] for start in range(0, len(values), size)]
+
+
+def refresh_closure(connection, member_ids):
+    """
+    Recompute the closure rows of members and of all their descendants.
+
+    Args:
+        connection (Connection): The connection of the current transaction.
+        member_ids (iterable): IDs of members whose parents were set or changed.
+
+    Raises:
+        ValueError: If the parent links of the members form a cycle.
+    """
+    from app.models import AncestryClosure, FamilyMember, LOOKUP_CHUNK_SIZE
+
+    closure = AncestryClosure.__table__
+    members = FamilyMember.__table__
+
+    subtree = set(member_ids)
+    for chunk in _chunks(list(subtree), LOOKUP_CHUNK_SIZE):
+        subtree.update(connection.execute(
+            select(closure.c.descendant_id).where(closure.c.ancestor_id.in_(chunk))
+        ).scalars())
+
+    rows = []
+    for chunk in _chunks(sorted(subtree), LOOKUP_CHUNK_SIZE):
+        rows.extend(connection.execute(
+            select(members.c.id, members.c.father_id, members.c.mother_id, members.c.tree_id)
+            .where(members.c.id.in_(chunk))
+        ))
+
+    """ Order the subtree into generations, parents before children """
+    pending_parents = {}
+    children = {}
+    for row in rows:
+        parents = {parent_id for parent_id in (row.father_id, row.mother_id) if parent_id in subtree}
+        pending_parents[row.id] = len(parents)
+        for parent_id in parents:
+            children.setdefault(parent_id, []).append(row.id)
+
+    generations = []
+    generation = [member_id for member_id, count in pending_parents.items() if count == 0]
+    placed = 0
+    while generation:
+        generations.append(generation)
+        placed += len(generation)
+        next_generation = []
+        for member_id in generation:
+            for child_id in children.get(member_id, []):
+                pending_parents[child_id] -= 1
+                if pending_parents[child_id] == 0:
+                    next_generation.append(child_id)
+        generation = next_generation
+
+    if placed != len(rows):
+        raise ValueError('Parent links form a cycle.')
+
+    for chunk in _chunks(sorted(subtree), LOOKUP_CHUNK_SIZE):
+        connection.execute(closure.delete().where(closure.c.descendant_id.in_(chunk)))
+
+    if rows:
+        connection.execute(closure.insert(), [
+            {'ancestor_id': row.id, 'descendant_id': row.id, 'depth': 0, 'tree_id': row.tree_id}
+            for row in rows
+        ])
+
+    parent_rows = closure.alias('parent_rows')
+    for generation in generations:
+        for chunk in _chunks(generation, LOOKUP_CHUNK_SIZE):
+            connection.execute(closure.insert().from_select(
+                ['ancestor_id', 'descendant_id', 'depth', 'tree_id'],
+                select(
+                    parent_rows.c.ancestor_id,
+                    members.c.id,
+                    func.min(parent_rows.c.depth) + 1,
+                    members.c.tree_id,
+                ).select_from(members.join(parent_rows, or_(
+                    parent_rows.c.descendant_id == members.c.father_id,
+                    parent_rows.c.descendant_id == members.c.mother_id,
+                ))).where(members.c.id.in_(chunk)).group_by(
+                    parent_rows.c.ancestor_id, members.c.id, members.c.tree_id
+                )
+            ))
+
+
+def remove_from_closure(connection, member_id):
+    """
+    Remove a member about to be deleted from the closure.
+
+    The member's rows are dropped and the rows of its descendants are
+    recomputed without the lines that ran through it.
+
+    Args:
+        connection (Connection): The connection of the current transaction.
+        member_id (int): The ID of the member being deleted.
+    """
+    from app.models import AncestryClosure, FamilyMember
+
+    closure = AncestryClosure.__table__
+    members = FamilyMember.__table__
+
+    child_ids = list(connection.execute(
+        select(members.c.id).where(or_(members.c.father_id == member_id, members.c.mother_id == member_id))
+    ).scalars())
+
+    connection.execute(closure.delete().where(
+        or_(closure.c.ancestor_id == member_id, closure.c.descendant_id == member_id)
+    ))
+
+    if child_ids:
+        refresh_closure(connection, child_ids)
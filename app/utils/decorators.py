@@ -3,8 +3,9 @@
 Utility functions for the Flask application.
 """
 
+from datetime import timezone
 from functools import wraps
-from flask import jsonify, session, redirect
+from flask import current_app, jsonify, make_response, request, session, redirect
 
 def login_required(f):
     """
@@ -29,3 +30,55 @@ def login_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def tree_conditional(f):
+    """
+    Decorator answering conditional GET requests on a family tree route.
+
+    The tree's version is read on its own, so a request whose If-None-Match
+    or If-Modified-Since header still matches gets a 304 response without
+    the route running. Successful responses get ETag and Last-Modified
+    headers derived from the version.
+
+    Args:
+        f (function): The route function to be decorated; it takes a tree_id argument.
+
+    Returns:
+        function: Decorated function with conditional request handling.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        """
+        Inner function that compares the request validators with the tree version.
+
+        Returns:
+            Response: An empty 304 response if the client copy is current, else the original function result.
+        """
+        from app.models import FamilyTree
+
+        tree_id = kwargs['tree_id']
+        tree_version = FamilyTree.get_version(tree_id, session.get('user_id'))
+
+        if tree_version is None:
+            return f(*args, **kwargs)
+
+        etag = f'tree-{tree_id}-v{tree_version.version}'
+        last_modified = tree_version.updated_at.replace(microsecond=0, tzinfo=timezone.utc)
+
+        """ If-Modified-Since is only consulted without If-None-Match (RFC 9110) """
+        if request.if_none_match:
+            not_modified = request.if_none_match.contains_weak(etag)
+        else:
+            not_modified = request.if_modified_since is not None and last_modified <= request.if_modified_since
+
+        if not_modified:
+            response = current_app.response_class(status=304)
+        else:
+            response = make_response(f(*args, **kwargs))
+            if response.status_code != 200:
+                return response
+
+        response.set_etag(etag)
+        response.last_modified = last_modified
+        response.cache_control.no_cache = True
+        return response
+    return decorated_function
@@ -0,0 +1,326 @@
+""" app/utils/events.py """
+"""
+Live family tree events, streamed to collaborators as Server-Sent Events.
+
+The member write methods publish, after they commit, which members they
+added, updated or deleted. Publishing only wakes the streams subscribed
+to the tree; each stream then reads the tree's change feed from its last
+position, so the events it sends carry the committed rows, their IDs are
+change feed positions and a reconnecting client resumes from its
+Last-Event-ID without losing or repeating changes.
+
+The broker relaying notifications between writers and streams is chosen
+with EVENTS_BROKER. LocalBroker reaches the streams of the current process
+only. PollingBroker stands in for an external broker when several worker
+processes serve the API: one thread per process polls the versions of the
+trees it has streams for, so changes made by any process are picked up.
+"""
+
+from threading import Condition, Lock, Thread
+import logging
+import time
+from flask import current_app
+from sqlalchemy import select
+from werkzeug.utils import import_string
+from app import db
+from app.utils.sqlite import read_only_transactions
+
+logger = logging.getLogger('app.events')
+
+""" Default broker class, as an import path """
+DEFAULT_EVENTS_BROKER = 'app.utils.events.LocalBroker'
+
+""" Default number of seconds without events after which a stream sends a heartbeat """
+DEFAULT_HEARTBEAT_SECONDS = 15
+
+""" Default number of seconds between two polls of PollingBroker """
+DEFAULT_POLL_INTERVAL = 1.0
+
+""" Milliseconds a disconnected client waits before reconnecting """
+RETRY_MS = 3000
+
+""" Number of changes read from the change feed per query """
+EVENT_BATCH_SIZE = 1000
+
+
+class Subscription:
+    """
+    The notifications pending for one stream.
+
+    Notifications are merged until the stream takes them, so a slow
+    client costs one dict of member IDs, not a queue of messages.
+    """
+
+    def __init__(self):
+        self._condition = Condition()
+        self._pending = None
+
+    def notify(self, event, member_ids):
+        """
+        Record that members of the tree changed.
+
+        Args:
+            event (str): The event of the members, e.g. 'member_added'.
+            member_ids (iterable): The IDs of the members.
+        """
+        with self._condition:
+            if self._pending is None:
+                self._pending = {}
+            self._pending.update((member_id, event) for member_id in member_ids)
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """
+        Wait for notifications.
+
+        Args:
+            timeout (float): The maximum number of seconds to wait.
+
+        Returns:
+            dict: Member ID -> event of the members notified since the last
+                call, possibly empty; None if nothing was notified in time.
+        """
+        with self._condition:
+            if self._pending is None:
+                self._condition.wait(timeout)
+            pending, self._pending = self._pending, None
+            return pending
+
+
+class LocalBroker:
+    """
+    Relay notifications between the writers and streams of one process.
+    """
+
+    def __init__(self, app):
+        self._subscriptions = {}
+        self._lock = Lock()
+
+    def subscribe(self, tree_id):
+        """
+        Subscribe to the notifications of a family tree.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+
+        Returns:
+            Subscription: The new subscription.
+        """
+        subscription = Subscription()
+        with self._lock:
+            self._subscriptions.setdefault(tree_id, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, tree_id, subscription):
+        """
+        End a subscription.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            subscription (Subscription): The subscription returned by subscribe.
+        """
+        with self._lock:
+            subscriptions = self._subscriptions.get(tree_id)
+            if subscriptions is not None:
+                subscriptions.discard(subscription)
+                if not subscriptions:
+                    del self._subscriptions[tree_id]
+
+    def publish(self, tree_id, event, member_ids):
+        """
+        Notify the subscribers of a family tree that members changed.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            event (str): The event of the members, e.g. 'member_added'.
+            member_ids (iterable): The IDs of the members.
+        """
+        with self._lock:
+            subscriptions = list(self._subscriptions.get(tree_id, ()))
+        for subscription in subscriptions:
+            subscription.notify(event, member_ids)
+
+
+class PollingBroker(LocalBroker):
+    """
+    Relay notifications between processes by polling the versions of the subscribed trees.
+
+    Every member write bumps the version of its tree, so a changed version
+    wakes the local streams of the tree, whichever process wrote. Writes of
+    the current process still wake its streams at once.
+    """
+
+    def __init__(self, app):
+        super().__init__(app)
+        self._app = app
+        self._interval = app.config.get('EVENTS_POLL_INTERVAL', DEFAULT_POLL_INTERVAL)
+        self._versions = {}
+        self._thread = None
+
+    def subscribe(self, tree_id):
+        subscription = super().subscribe(tree_id)
+        with self._lock:
+            if self._thread is None:
+                self._thread = Thread(target=self._poll, name='events-poller', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def _poll(self):
+        from app.models import FamilyTree
+
+        while True:
+            time.sleep(self._interval)
+            with self._lock:
+                tree_ids = list(self._subscriptions)
+            for tree_id in list(self._versions):
+                if tree_id not in tree_ids:
+                    del self._versions[tree_id]
+            if not tree_ids:
+                continue
+
+            try:
+                with self._app.app_context(), read_only_transactions():
+                    rows = db.session.execute(
+                        select(FamilyTree.id, FamilyTree.version, FamilyTree.deleted_at)
+                        .where(FamilyTree.id.in_(tree_ids))
+                        .execution_options(include_deleted=True)
+                    ).all()
+            except Exception:
+                logger.exception('Polling family tree versions failed')
+                continue
+
+            versions = {row.id: (row.version, row.deleted_at) for row in rows}
+            for tree_id in tree_ids:
+                version = versions.get(tree_id)
+                if self._versions.get(tree_id, ()) != version:
+                    self._versions[tree_id] = version
+                    self.publish(tree_id, None, ())
+
+
+def get_broker(app):
+    """
+    Get the event broker of an application, creating it on first use.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        LocalBroker: The broker configured by EVENTS_BROKER.
+    """
+    broker = app.extensions.get('events')
+    if broker is None:
+        with app.extensions.setdefault('events_lock', Lock()):
+            broker = app.extensions.get('events')
+            if broker is None:
+                broker_class = app.config.get('EVENTS_BROKER') or DEFAULT_EVENTS_BROKER
+                if isinstance(broker_class, str):
+                    broker_class = import_string(broker_class)
+                broker = app.extensions['events'] = broker_class(app)
+    return broker
+
+
+def publish_tree_event(tree_id, event, member_ids=()):
+    """
+    Notify the streams of a family tree of a committed write.
+
+    Does nothing until a stream has created the broker of the process.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+        event (str): 'member_added', 'member_updated', 'member_deleted' or 'tree_deleted'.
+        member_ids (iterable): The IDs of the members written.
+    """
+    broker = current_app.extensions.get('events')
+    if broker is not None:
+        broker.publish(tree_id, event, member_ids)
+
+
+def format_event(event, data, event_id=None):
+    """
+    Format a Server-Sent Event.
+
+    Args:
+        event (str): The event name.
+        data (object): The JSON serializable payload.
+        event_id (str): The ID of the event, if any.
+
+    Returns:
+        str: The event, terminated by a blank line.
+    """
+    lines = [f'id: {event_id}'] if event_id is not None else []
+    lines.append(f'event: {event}')
+    lines.append(f'data: {current_app.json.dumps(data)}')
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream_tree_events(tree_id, since, after_id):
+    """
+    Stream the member events of a family tree from a change feed position.
+
+    Members written after the position are sent as 'member_added' or
+    'member_updated' events carrying the member, deleted members as
+    'member_deleted' events carrying its ID. Writes the stream was not
+    notified of, such as those replayed after a reconnect, are sent as
+    'member_updated'. A 'tree_deleted' event ends the stream. A comment
+    is sent as heartbeat after EVENTS_HEARTBEAT_SECONDS without events.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+        since (int): The change_seq of the position...
+        after_id (int): ...and the last member ID sent at it, or None.
+
+    Yields:
+        str: The stream, in the text/event-stream format.
+    """
+    from app.models import FamilyMember, FamilyTree
+    from app.utils.replica import primary_reads
+    from app.utils.serializers import MEMBER_FIELDS, serialize_member_rows
+
+    fields = MEMBER_FIELDS + ['updated_at', 'change_seq']
+    heartbeat = current_app.config.get('EVENTS_HEARTBEAT_SECONDS', DEFAULT_HEARTBEAT_SECONDS)
+    broker = get_broker(current_app._get_current_object())
+
+    """ Subscribe before the first read, so no write falls between the two """
+    subscription = broker.subscribe(tree_id)
+    try:
+        yield f'retry: {RETRY_MS}\n\n'
+        events = {}
+        while True:
+            """ Read one batch of the feed first, so the connection goes back to the pool before its events are written """
+            messages = []
+            with primary_reads():
+                """ Notifications come after the commit, which the replica may not have applied yet """
+                tree = db.session.execute(
+                    select(FamilyTree.deleted_at).where(FamilyTree.id == tree_id)
+                    .execution_options(include_deleted=True)
+                ).first()
+
+                changes = []
+                if tree is not None and tree.deleted_at is None:
+                    changes = FamilyMember.get_changes(tree_id, since, after_id, EVENT_BATCH_SIZE, fields)
+                for change_seq, member_id, row in changes:
+                    event_id = f'{change_seq}:{member_id}'
+                    if row is None:
+                        messages.append(format_event('member_deleted', {'id': member_id}, event_id))
+                    else:
+                        event = events.get(member_id)
+                        if event not in ('member_added', 'member_updated'):
+                            event = 'member_updated'
+                        messages.append(format_event(event, serialize_member_rows([row], fields)[0], event_id))
+                    since, after_id = change_seq, member_id
+            db.session.close()
+
+            yield from messages
+            if tree is None or tree.deleted_at is not None:
+                yield format_event('tree_deleted', {'id': tree_id})
+                return
+            if len(changes) == EVENT_BATCH_SIZE:
+                continue
+
+            while True:
+                events = subscription.wait(heartbeat)
+                if events is not None:
+                    break
+                yield ': heartbeat\n\n'
+    finally:
+        broker.unsubscribe(tree_id, subscription)
@@ -0,0 +1,408 @@
+""" app/utils/gedcom.py """
+"""
+Streaming GEDCOM 5.5.1 import and export for family trees.
+
+Files are read line by line and written in chunked bulk inserts, and
+exports are produced by a generator over paged queries, so memory stays
+bounded by the chunk size rather than the size of the tree. Only UTF-8
+(and plain ASCII) files are supported.
+"""
+
+from collections import namedtuple
+from datetime import date
+import re
+from sqlalchemy import func
+from app import db
+from app.utils.search import member_fingerprint
+
+""" Number of individuals written or read per database round-trip """
+GEDCOM_CHUNK_SIZE = 1000
+
+""" Longest line value written before the text is continued with CONC """
+GEDCOM_MAX_VALUE_LENGTH = 200
+
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+GENDERS = {'M': 'Male', 'F': 'Female'}
+SEXES = {'Male': 'M', 'Female': 'F'}
+
+DATE_PATTERN = re.compile(r'(?:(\d{1,2}) )?(?:([A-Z]{3}) )?(\d{3,4})$')
+
+Record = namedtuple('Record', ['xref', 'tag', 'value', 'lines'])
+
+
+def iter_records(lines):
+    """
+    Group the lines of a GEDCOM file into level 0 records.
+
+    Args:
+        lines (iterable): The lines of the file, as text.
+
+    Yields:
+        Record: The xref, tag and value of each record with its (level, tag, value) lines.
+    """
+    record = None
+    for raw_line in lines:
+        line = raw_line.strip('\r\n\ufeff').lstrip()
+        if not line:
+            continue
+
+        level, _, rest = line.partition(' ')
+        if not level.isdigit():
+            continue
+
+        xref = None
+        if rest.startswith('@'):
+            xref, _, rest = rest.partition(' ')
+        tag, _, value = rest.partition(' ')
+
+        if level == '0':
+            if record is not None:
+                yield record
+            record = Record(xref, tag, value, [])
+        elif record is not None:
+            record.lines.append((int(level), tag, value))
+
+    if record is not None:
+        yield record
+
+
+def parse_date(value):
+    """
+    Parse a GEDCOM date value into a date.
+
+    Qualifiers such as ABT or BEF are ignored, and a missing day or month
+    defaults to the first of the period.
+
+    Args:
+        value (str): The GEDCOM date value.
+
+    Returns:
+        date: The parsed date, or None if the value cannot be parsed.
+    """
+    words = value.upper().split()
+    while words and words[0] in ('ABT', 'CAL', 'EST', 'BEF', 'AFT', 'FROM', 'BET', 'INT'):
+        words.pop(0)
+    for separator in ('AND', 'TO'):
+        if separator in words:
+            words = words[:words.index(separator)]
+
+    match = DATE_PATTERN.match(' '.join(words))
+    if not match:
+        return None
+
+    day, month, year = match.groups()
+    if month is not None and month not in MONTHS:
+        return None
+
+    try:
+        return date(int(year), MONTHS.index(month) + 1 if month else 1, int(day) if day else 1)
+    except ValueError:
+        return None
+
+
+def parse_individual(record):
+    """
+    Convert an INDI record into family member columns.
+
+    Args:
+        record (Record): The INDI record.
+
+    Returns:
+        dict: The member columns, or None if the record has no name or birth date.
+    """
+    member = {'name': None, 'gender': 'Unknown', 'date_of_birth': None, 'biography': None, 'picture_url': None}
+    path = []
+    notes = []
+
+    for level, tag, value in record.lines:
+        del path[level - 1:]
+        path.append(tag)
+
+        if path == ['NAME'] and member['name'] is None:
+            member['name'] = ' '.join(value.replace('/', ' ').split())[:100] or None
+        elif path == ['SEX']:
+            member['gender'] = GENDERS.get(value.strip().upper()[:1], 'Unknown')
+        elif path == ['BIRT', 'DATE'] and member['date_of_birth'] is None:
+            member['date_of_birth'] = parse_date(value)
+        elif path == ['NOTE'] and not value.startswith('@'):
+            notes.append(value)
+        elif path == ['NOTE', 'CONT'] and notes:
+            notes[-1] += '\n' + value
+        elif path == ['NOTE', 'CONC'] and notes:
+            notes[-1] += value
+        elif path == ['OBJE', 'FILE'] and member['picture_url'] is None:
+            member['picture_url'] = value[:255] or None
+
+    if not member['name'] or member['date_of_birth'] is None:
+        return None
+
+    member['biography'] = '\n\n'.join(notes) or None
+    return member
+
+
+def parse_family(record):
+    """
+    Convert a FAM record into its husband, wife and children pointers.
+
+    Args:
+        record (Record): The FAM record.
+
+    Returns:
+        tuple: (husband xref or None, wife xref or None, list of child xrefs).
+    """
+    husband = wife = None
+    children = []
+    for level, tag, value in record.lines:
+        if level != 1:
+            continue
+        if tag == 'HUSB':
+            husband = value.strip()
+        elif tag == 'WIFE':
+            wife = value.strip()
+        elif tag == 'CHIL':
+            children.append(value.strip())
+    return husband, wife, children
+
+
+def import_gedcom(tree_id, lines):
+    """
+    Import the individuals and families of a GEDCOM file into a family tree.
+
+    Individuals are inserted in chunks of GEDCOM_CHUNK_SIZE as the file is
+    read. Individuals matching a member already in the tree (same
+    fingerprint of name, gender and date of birth) are merged into it, and individuals without
+    a name or a parseable birth date are skipped. Parent links from FAM
+    records are applied once every individual has an ID.
+
+    Args:
+        tree_id (int): The ID of the family tree to import into.
+        lines (iterable): The lines of the GEDCOM file, as text.
+
+    Returns:
+        dict: Counts of imported, merged and skipped individuals and of linked children.
+    """
+    from app.models import FamilyMember
+
+    counts = {'imported': 0, 'merged': 0, 'skipped': 0, 'linked': 0}
+    member_ids = {}
+    families = []
+    pending = []
+
+    def flush():
+        fingerprints = {}
+        for xref, member in pending:
+            fingerprint = member_fingerprint(member['name'], member['gender'], member['date_of_birth'])
+            fingerprints.setdefault(fingerprint, []).append(xref)
+
+        existing = db.session.query(FamilyMember.id, FamilyMember.fingerprint).filter(
+            FamilyMember.tree_id == tree_id,
+            FamilyMember.fingerprint.in_(list(fingerprints))
+        )
+        for row in existing:
+            xrefs = fingerprints.pop(row.fingerprint, None)
+            if xrefs:
+                member_ids.update((xref, row.id) for xref in xrefs)
+                counts['merged'] += len(xrefs)
+
+        new_members = []
+        new_xrefs = []
+        for xref, member in pending:
+            xrefs = fingerprints.pop(member_fingerprint(member['name'], member['gender'], member['date_of_birth']), None)
+            if xrefs:
+                new_members.append(member)
+                new_xrefs.append(xrefs)
+                counts['merged'] += len(xrefs) - 1
+
+        if new_members:
+            for xrefs, member_id in zip(new_xrefs, FamilyMember.add_members(tree_id, new_members)):
+                member_ids.update((xref, member_id) for xref in xrefs)
+            counts['imported'] += len(new_members)
+
+        pending.clear()
+
+    for record in iter_records(lines):
+        if record.tag == 'INDI':
+            member = parse_individual(record)
+            if member is None:
+                counts['skipped'] += 1
+                continue
+            pending.append((record.xref, member))
+            if len(pending) >= GEDCOM_CHUNK_SIZE:
+                flush()
+        elif record.tag == 'FAM':
+            families.append(parse_family(record))
+
+    if pending:
+        flush()
+
+    links = {}
+    for husband, wife, children in families:
+        father_id = member_ids.get(husband)
+        mother_id = member_ids.get(wife)
+        if father_id is None and mother_id is None:
+            continue
+        for child in children:
+            child_id = member_ids.get(child)
+            if child_id is not None and child_id not in (father_id, mother_id):
+                links[child_id] = {'member_id': child_id, 'father_id': father_id, 'mother_id': mother_id}
+
+    if links:
+        FamilyMember.link_parents(tree_id, list(links.values()))
+    counts['linked'] = len(links)
+
+    return counts
+
+
+def format_lines(level, tag, text):
+    """
+    Format a possibly multi-line text value as GEDCOM lines with CONT and CONC.
+
+    Args:
+        level (int): The level of the first line.
+        tag (str): The tag of the first line.
+        text (str): The text value.
+
+    Returns:
+        list: The GEDCOM lines, without line terminators.
+    """
+    lines = []
+    for index, paragraph in enumerate(text.splitlines() or ['']):
+        line_tag = tag if index == 0 else 'CONT'
+        line_level = level if index == 0 else level + 1
+        while True:
+            head, paragraph = paragraph[:GEDCOM_MAX_VALUE_LENGTH], paragraph[GEDCOM_MAX_VALUE_LENGTH:]
+            lines.append(f'{line_level} {line_tag} {head}'.rstrip())
+            if not paragraph:
+                break
+            line_tag, line_level = 'CONC', level + 1
+    return lines
+
+
+def format_date(value):
+    """
+    Format a date as a GEDCOM date value.
+
+    Args:
+        value (date): The date.
+
+    Returns:
+        str: The date as 'D MON YYYY'.
+    """
+    return f'{value.day} {MONTHS[value.month - 1]} {value.year}'
+
+
+def family_xref(father_id, mother_id):
+    """
+    Build the xref of the family formed by a pair of parents.
+
+    Args:
+        father_id (int): The ID of the father, or None.
+        mother_id (int): The ID of the mother, or None.
+
+    Returns:
+        str: The family xref.
+    """
+    return f'@F{father_id or 0}_{mother_id or 0}@'
+
+
+def export_gedcom(tree):
+    """
+    Generate a GEDCOM file for a family tree.
+
+    Individuals are read in pages of GEDCOM_CHUNK_SIZE members and families
+    are streamed grouped by parent pair, so memory use does not grow with
+    the size of the tree.
+
+    Args:
+        tree (FamilyTree): The family tree to export.
+
+    Yields:
+        str: Chunks of the GEDCOM file.
+    """
+    from app.models import FamilyMember
+
+    yield '\n'.join([
+        '0 HEAD',
+        '1 SOUR DZINZA',
+        '1 GEDC',
+        '2 VERS 5.5.1',
+        '2 FORM LINEAGE-LINKED',
+        '1 CHAR UTF-8',
+        '1 SUBM @U1@',
+        *format_lines(1, 'NOTE', tree.name),
+        '0 @U1@ SUBM',
+        '1 NAME Dzinza',
+    ]) + '\n'
+
+    last_id = 0
+    while True:
+        members = db.session.query(
+            FamilyMember.id, FamilyMember.name, FamilyMember.gender, FamilyMember.date_of_birth,
+            FamilyMember.biography, FamilyMember.picture_url, FamilyMember.father_id, FamilyMember.mother_id
+        ).filter(
+            FamilyMember.tree_id == tree.id,
+            FamilyMember.id > last_id
+        ).order_by(FamilyMember.id).limit(GEDCOM_CHUNK_SIZE).all()
+
+        if not members:
+            break
+        last_id = members[-1].id
+
+        """ Families in which the members of this page are a parent """
+        page_ids = [member.id for member in members]
+        spouse_families = {}
+        parent_pairs = db.session.query(FamilyMember.father_id, FamilyMember.mother_id).filter(
+            FamilyMember.tree_id == tree.id,
+            FamilyMember.father_id.in_(page_ids) | FamilyMember.mother_id.in_(page_ids)
+        ).distinct()
+        for father_id, mother_id in parent_pairs:
+            for parent_id in (father_id, mother_id):
+                spouse_families.setdefault(parent_id, []).append(family_xref(father_id, mother_id))
+
+        lines = []
+        for member in members:
+            name_parts = member.name.rsplit(' ', 1)
+            name = f'{name_parts[0]} /{name_parts[1]}/' if len(name_parts) == 2 else f'/{member.name}/'
+            lines.append(f'0 @I{member.id}@ INDI')
+            lines.append(f'1 NAME {name}')
+            lines.append(f"1 SEX {SEXES.get(member.gender, 'U')}")
+            lines.append('1 BIRT')
+            lines.append(f'2 DATE {format_date(member.date_of_birth)}')
+            if member.biography:
+                lines.extend(format_lines(1, 'NOTE', member.biography))
+            if member.picture_url:
+                lines.append('1 OBJE')
+                lines.append(f'2 FILE {member.picture_url}')
+            if member.father_id or member.mother_id:
+                lines.append(f'1 FAMC {family_xref(member.father_id, member.mother_id)}')
+            for xref in sorted(set(spouse_families.get(member.id, []))):
+                lines.append(f'1 FAMS {xref}')
+        yield '\n'.join(lines) + '\n'
+
+    """ Children ordered by parent pair, so each family is a run of rows """
+    children = db.session.query(
+        FamilyMember.father_id, FamilyMember.mother_id, FamilyMember.id
+    ).filter(
+        FamilyMember.tree_id == tree.id,
+        FamilyMember.father_id.isnot(None) | FamilyMember.mother_id.isnot(None)
+    ).order_by(
+        func.coalesce(FamilyMember.father_id, 0), func.coalesce(FamilyMember.mother_id, 0), FamilyMember.id
+    ).yield_per(GEDCOM_CHUNK_SIZE)
+
+    lines = []
+    family = None
+    for father_id, mother_id, child_id in children:
+        if family != (father_id, mother_id):
+            family = (father_id, mother_id)
+            lines.append(f'0 {family_xref(father_id, mother_id)} FAM')
+            if father_id:
+                lines.append(f'1 HUSB @I{father_id}@')
+            if mother_id:
+                lines.append(f'1 WIFE @I{mother_id}@')
+        lines.append(f'1 CHIL @I{child_id}@')
+        if len(lines) >= GEDCOM_CHUNK_SIZE:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+
+    lines.append('0 TRLR')
+    yield '\n'.join(lines) + '\n'
@@ -0,0 +1,105 @@
+""" app/utils/instrumentation.py """
+"""
+Per-request SQL instrumentation.
+
+Every statement run on the application's engines is counted and timed.
+The totals of a request are returned in the X-DB-Query-Count and
+X-DB-Time-Ms response headers when SQL_INSTRUMENTATION_HEADERS is enabled,
+and statements slower than SLOW_QUERY_THRESHOLD_MS are written to the
+'app.sql.slow' logger as JSON lines.
+"""
+
+import json
+import logging
+import time
+from flask import current_app, g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from app.utils.replica import get_engines
+
+slow_query_logger = logging.getLogger('app.sql.slow')
+
+""" Default slow query threshold, in milliseconds """
+DEFAULT_SLOW_QUERY_THRESHOLD_MS = 200
+
+""" Maximum length of a statement written to the slow query log """
+SLOW_QUERY_STATEMENT_LENGTH = 1000
+
+
+def parameter_shape(parameters, executemany):
+    """
+    Describe bound parameters by type only, so that no values reach the logs.
+
+    Args:
+        parameters (dict, tuple or list): The parameters passed to the DBAPI cursor.
+        executemany (bool): Whether the parameters are a list of parameter sets.
+
+    Returns:
+        dict or list: The parameter names or positions mapped to type names.
+    """
+    if executemany:
+        parameter_sets = list(parameters or [])
+        return {
+            'rows': len(parameter_sets),
+            'parameters': parameter_shape(parameter_sets[0], False) if parameter_sets else None,
+        }
+    if isinstance(parameters, dict):
+        return {name: type(value).__name__ for name, value in parameters.items()}
+    return [type(value).__name__ for value in parameters or ()]
+
+
+def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_start_times', []).append(time.perf_counter())
+
+
+def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed_ms = (time.perf_counter() - conn.info['query_start_times'].pop()) * 1000
+
+    if not has_app_context():
+        return
+
+    if has_request_context():
+        g.db_query_count = g.get('db_query_count', 0) + 1
+        g.db_time_ms = g.get('db_time_ms', 0.0) + elapsed_ms
+
+    threshold_ms = current_app.config.get('SLOW_QUERY_THRESHOLD_MS', DEFAULT_SLOW_QUERY_THRESHOLD_MS)
+    if threshold_ms is not None and elapsed_ms >= threshold_ms:
+        slow_query_logger.warning(json.dumps({
+            'event': 'slow_query',
+            'duration_ms': round(elapsed_ms, 2),
+            'route': request.endpoint if has_request_context() else None,
+            'method': request.method if has_request_context() else None,
+            'statement': ' '.join(statement.split())[:SLOW_QUERY_STATEMENT_LENGTH],
+            'parameters': parameter_shape(parameters, executemany),
+        }))
+
+
+def add_query_headers(response):
+    """
+    Add the SQL statement count and time of the request to the response headers.
+
+    Args:
+        response (Response): The response of the request.
+
+    Returns:
+        Response: The response, with X-DB-Query-Count and X-DB-Time-Ms headers if enabled.
+    """
+    if current_app.config.get('SQL_INSTRUMENTATION_HEADERS', True):
+        response.headers['X-DB-Query-Count'] = str(g.get('db_query_count', 0))
+        response.headers['X-DB-Time-Ms'] = f"{g.get('db_time_ms', 0.0):.2f}"
+    return response
+
+
+def init_sql_instrumentation(app):
+    """
+    Instrument the database engines of an application.
+
+    Args:
+        app (Flask): The application, with the database extension initialized.
+    """
+    with app.app_context():
+        for engine in get_engines().values():
+            if not event.contains(engine, 'before_cursor_execute', before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', after_cursor_execute)
+
+    app.after_request(add_query_headers)
@@ -0,0 +1,207 @@
+""" app/utils/jobs.py """
+"""
+In-process background jobs.
+
+Long operations are queued as rows of the job table and run on a thread
+pool of JOB_WORKERS threads per process, each job in an application
+context of its own. Progress, status and results are written to the job
+row in short transactions of their own, so clients can poll them while
+the job's work is still in progress. Files produced by jobs are kept in
+JOB_RESULTS_DIR. No broker is needed; jobs queued or running when the
+process exits are lost and stay in the 'queued' or 'running' state.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+import logging
+import os
+from threading import Lock
+from flask import current_app, request
+from app import db
+
+logger = logging.getLogger('app.jobs')
+
+""" Default number of job threads per process """
+DEFAULT_JOB_WORKERS = 2
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def update_job(job_id, **values):
+    """
+    Write job columns in a transaction of their own.
+
+    Args:
+        job_id (int): The ID of the job.
+        **values: Column name -> new value.
+    """
+    from app.models import Job
+
+    table = Job.__table__
+    with db.engine.begin() as connection:
+        connection.execute(table.update().where(table.c.id == job_id).values(**values))
+
+
+class JobContext:
+    """
+    Handle given to a running job function.
+
+    Attributes:
+        job_id (int): The ID of the job.
+        results_dir (str): The directory for the files produced by jobs.
+        result_path (str): The file produced by the job; set by the job function, if any.
+        progress (int): The last reported percentage.
+    """
+
+    def __init__(self, job_id, results_dir):
+        self.job_id = job_id
+        self.results_dir = results_dir
+        self.result_path = None
+        self.progress = 0
+        self._written_progress = 0
+
+    def report(self, done, total):
+        """
+        Record the progress of the job.
+
+        The percentage is written when it changed and the job's session is
+        between transactions; on SQLite, writing from another connection
+        while the job holds the write lock would wait for the job itself.
+
+        Args:
+            done (int): The amount of work done.
+            total (int): The total amount of work.
+        """
+        self.progress = min(100, int(100 * done / total)) if total else 100
+        if self.progress != self._written_progress and not db.session().in_transaction():
+            self._written_progress = self.progress
+            update_job(self.job_id, progress=self.progress)
+
+    def result_file(self, extension):
+        """
+        Reserve the path of the file produced by the job.
+
+        Args:
+            extension (str): The file extension, without the dot.
+
+        Returns:
+            str: The path, also recorded as the job's result_path.
+        """
+        self.result_path = os.path.join(self.results_dir, f'job-{self.job_id}.{extension}')
+        return self.result_path
+
+
+class JobRunner:
+    """
+    Thread pool running the jobs of an application.
+
+    Attributes:
+        app (Flask): The application.
+        executor (ThreadPoolExecutor): The pool the jobs run on.
+    """
+
+    def __init__(self, app, max_workers):
+        self.app = app
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='job')
+
+    def submit(self, job_id, function, *args):
+        """
+        Run a job function in the background.
+
+        Args:
+            job_id (int): The ID of the queued job.
+            function (callable): Called as function(JobContext, *args); returns a
+                JSON serializable result or None.
+            *args: Further arguments of the function.
+
+        Returns:
+            Future: The future of the job.
+        """
+        return self.executor.submit(self._run, job_id, function, args)
+
+    def _run(self, job_id, function, args):
+        with self.app.app_context():
+            context = JobContext(job_id, get_results_dir(self.app))
+            update_job(job_id, status='running', started_at=_now())
+            try:
+                result = function(context, *args)
+            except Exception as e:
+                logger.exception('Job %s failed', job_id)
+                db.session.close()
+                update_job(job_id, status='failed', error=str(e), finished_at=_now())
+                return
+            db.session.close()
+            update_job(
+                job_id, status='succeeded', progress=100, result=result,
+                result_path=context.result_path, finished_at=_now()
+            )
+
+
+def get_results_dir(app):
+    """
+    Get the directory for the files produced by jobs, creating it if needed.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        str: The directory, JOB_RESULTS_DIR or 'job-results' in the instance folder.
+    """
+    directory = app.config.get('JOB_RESULTS_DIR') or os.path.join(app.instance_path, 'job-results')
+    os.makedirs(directory, exist_ok=True)
+    return directory
+
+
+def get_job_runner(app):
+    """
+    Get the job runner of an application, starting it on first use.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        JobRunner: The runner.
+    """
+    runner = app.extensions.get('jobs')
+    if runner is None:
+        with app.extensions.setdefault('jobs_lock', Lock()):
+            runner = app.extensions.get('jobs')
+            if runner is None:
+                runner = app.extensions['jobs'] = JobRunner(
+                    app, app.config.get('JOB_WORKERS', DEFAULT_JOB_WORKERS)
+                )
+    return runner
+
+
+def start_job(user_id, kind, function, *args, tree_id=None):
+    """
+    Queue a job and run it in the background.
+
+    Args:
+        user_id (int): The ID of the user starting the job.
+        kind (str): What the job does.
+        function (callable): The job function, see JobRunner.submit.
+        *args: Further arguments of the function.
+        tree_id (int): The ID of the family tree the job works on.
+
+    Returns:
+        Job: The queued job.
+    """
+    from app.models import Job
+
+    job = Job.create_job(user_id, kind, tree_id)
+    get_job_runner(current_app._get_current_object()).submit(job.id, function, *args)
+    return job
+
+
+def wants_async():
+    """
+    Check whether the client asked for the current request to run as a job.
+
+    Returns:
+        bool: True if the request has a 'Prefer: respond-async' header.
+    """
+    preferences = request.headers.get('Prefer', '')
+    return 'respond-async' in (preference.strip().lower() for preference in preferences.split(','))
@@ -0,0 +1,85 @@
+""" app/utils/json_provider.py """
+"""
+JSON provider using orjson when it is installed.
+
+Falls back to the standard library json module otherwise. Both backends
+write dates and datetimes in ISO 8601 and keep dict keys in insertion order.
+"""
+
+from datetime import date
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    Flask JSON provider serializing responses with orjson when available.
+    """
+    sort_keys = False
+
+    @staticmethod
+    def default(o):
+        """
+        Convert a value the JSON encoder does not support natively.
+
+        Args:
+            o (object): The value to convert.
+
+        Returns:
+            object: A JSON serializable value.
+        """
+        if isinstance(o, date):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        """
+        Serialize data as a JSON string.
+
+        Args:
+            obj (object): The data to serialize.
+            **kwargs: Options for json.dumps; orjson is only used without any.
+
+        Returns:
+            str: The JSON document.
+        """
+        if orjson is None or kwargs:
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(obj, default=self.default, option=orjson.OPT_NON_STR_KEYS).decode()
+
+    def loads(self, s, **kwargs):
+        """
+        Deserialize data from a JSON string or bytes.
+
+        Args:
+            s (str or bytes): The JSON document.
+            **kwargs: Options for json.loads; orjson is only used without any.
+
+        Returns:
+            object: The deserialized data.
+        """
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        """
+        Serialize data as a JSON response, indented in debug mode as with the default provider.
+
+        Returns:
+            Response: The JSON response.
+        """
+        if orjson is None:
+            return super().response(*args, **kwargs)
+
+        obj = self._prepare_response_obj(args, kwargs)
+        option = orjson.OPT_NON_STR_KEYS
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            option |= orjson.OPT_INDENT_2
+        return self._app.response_class(
+            orjson.dumps(obj, default=self.default, option=option) + b'\n', mimetype=self.mimetype
+        )
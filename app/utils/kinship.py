@@ -0,0 +1,343 @@
+""" app/utils/kinship.py """
+"""
+In-process kinship graph index for family trees.
+
+Each family tree gets a compact adjacency index of its parent/child links,
+built lazily from a single projected query the first time the tree is
+accessed. Indexes are kept per process with the version of the tree they
+were built at, rebuilt once the tree's version moves past it, and evicted
+least recently used first beyond KINSHIP_CACHE_SIZE trees.
+"""
+
+from array import array
+from collections import OrderedDict
+from threading import Lock
+from flask import current_app
+from app import db
+from app.utils.replica import primary_reads
+
+""" Default number of family trees whose kinship index is cached per process """
+DEFAULT_KINSHIP_CACHE_SIZE = 100
+
+
+class KinshipIndex:
+    """
+    Adjacency index of the parent/child links of a single family tree.
+
+    Attributes:
+        tree_id (int): The ID of the indexed family tree.
+        ids (array): Member IDs in ascending order.
+        fathers (array): Father ID of each member (0 when unknown).
+        mothers (array): Mother ID of each member (0 when unknown).
+        child_offsets (array): Start of each member's slice in child_ids.
+        child_ids (array): Children of every member, grouped by parent.
+    """
+
+    def __init__(self, tree_id, rows):
+        """
+        Build the index from (id, father_id, mother_id) rows.
+
+        Args:
+            tree_id (int): The ID of the family tree.
+            rows (iterable): Rows of (id, father_id, mother_id) ordered by id.
+        """
+        self.tree_id = tree_id
+        self.ids = array('q')
+        self.fathers = array('q')
+        self.mothers = array('q')
+        self._positions = {}
+
+        for member_id, father_id, mother_id in rows:
+            self._positions[member_id] = len(self.ids)
+            self.ids.append(member_id)
+            self.fathers.append(father_id or 0)
+            self.mothers.append(mother_id or 0)
+
+        """ Lay the children out contiguously per parent (CSR layout) """
+        counts = [0] * (len(self.ids) + 1)
+        for parents in (self.fathers, self.mothers):
+            for parent_id in parents:
+                position = self._positions.get(parent_id)
+                if position is not None:
+                    counts[position + 1] += 1
+
+        for position in range(len(self.ids)):
+            counts[position + 1] += counts[position]
+
+        self.child_offsets = array('q', counts)
+        self.child_ids = array('q', bytes(8 * counts[-1]))
+        cursor = counts[:-1]
+        for parents in (self.fathers, self.mothers):
+            for position, parent_id in enumerate(parents):
+                parent_position = self._positions.get(parent_id)
+                if parent_position is not None:
+                    self.child_ids[cursor[parent_position]] = self.ids[position]
+                    cursor[parent_position] += 1
+
+    def __contains__(self, member_id):
+        return member_id in self._positions
+
+    def __len__(self):
+        return len(self.ids)
+
+    def parents(self, member_id):
+        """
+        Get the parent IDs of a member.
+
+        Args:
+            member_id (int): The ID of the family member.
+
+        Returns:
+            tuple: (father_id, mother_id), each None when unknown.
+        """
+        position = self._positions[member_id]
+        return (self.fathers[position] or None, self.mothers[position] or None)
+
+    def children(self, member_id):
+        """
+        Get the child IDs of a member.
+
+        Args:
+            member_id (int): The ID of the family member.
+
+        Returns:
+            list: IDs of the member's children in ascending order.
+        """
+        position = self._positions[member_id]
+        start = self.child_offsets[position]
+        end = self.child_offsets[position + 1]
+        return sorted(self.child_ids[start:end])
+
+    def siblings(self, member_id):
+        """
+        Get the IDs of members sharing a father or a mother with a member.
+
+        Args:
+            member_id (int): The ID of the family member.
+
+        Returns:
+            list: IDs of full and half siblings in ascending order.
+        """
+        sibling_ids = set()
+        for parent_id in self.parents(member_id):
+            if parent_id in self._positions:
+                sibling_ids.update(self.children(parent_id))
+        sibling_ids.discard(member_id)
+        return sorted(sibling_ids)
+
+    def ancestors(self, member_id):
+        """
+        Get every ancestor of a member with its nearest generation distance.
+
+        The member itself is included at distance 0. Parent links that leave
+        the tree or form a cycle are ignored.
+
+        Args:
+            member_id (int): The ID of the family member.
+
+        Returns:
+            dict: Ancestor ID -> number of generations up from the member.
+        """
+        distances = {member_id: 0}
+        frontier = [member_id]
+        generation = 0
+        while frontier:
+            generation += 1
+            next_frontier = []
+            for current_id in frontier:
+                for parent_id in self.parents(current_id):
+                    if parent_id in self._positions and parent_id not in distances:
+                        distances[parent_id] = generation
+                        next_frontier.append(parent_id)
+            frontier = next_frontier
+        return distances
+
+    def relationship(self, member_id, relative_id):
+        """
+        Find the lowest common ancestors of two members.
+
+        The lowest common ancestors are the common ancestors with the fewest
+        generations between them and the two members combined; ties are
+        usually a couple.
+
+        Args:
+            member_id (int): The ID of the first family member.
+            relative_id (int): The ID of the second family member.
+
+        Returns:
+            list: (ancestor_id, generations from member, generations from relative)
+                tuples, empty if the members are not blood relatives.
+        """
+        member_ancestors = self.ancestors(member_id)
+        relative_ancestors = self.ancestors(relative_id)
+        if len(relative_ancestors) < len(member_ancestors):
+            common = [ancestor_id for ancestor_id in relative_ancestors if ancestor_id in member_ancestors]
+        else:
+            common = [ancestor_id for ancestor_id in member_ancestors if ancestor_id in relative_ancestors]
+
+        if not common:
+            return []
+
+        def closeness(ancestor_id):
+            up, down = member_ancestors[ancestor_id], relative_ancestors[ancestor_id]
+            return (up + down, abs(up - down))
+
+        nearest = min(closeness(ancestor_id) for ancestor_id in common)
+        return sorted(
+            (ancestor_id, member_ancestors[ancestor_id], relative_ancestors[ancestor_id])
+            for ancestor_id in common
+            if closeness(ancestor_id) == nearest
+        )
+
+
+def ordinal(number):
+    """
+    Format a number as an English ordinal.
+
+    Args:
+        number (int): The number.
+
+    Returns:
+        str: The ordinal, e.g. '1st', '2nd', '11th'.
+    """
+    if 10 <= number % 100 <= 20:
+        suffix = 'th'
+    else:
+        suffix = {1: 'st', 2: 'nd', 3: 'rd'}.get(number % 10, 'th')
+    return f'{number}{suffix}'
+
+
+def generation_prefix(extra):
+    """
+    Build the 'grand'/'great-' prefix for a relationship more than one generation away.
+
+    Args:
+        extra (int): The number of generations beyond the closest form of the relationship.
+
+    Returns:
+        str: '' for 0, 'grand' for 1, 'great-grand' for 2, then '2nd great-grand' and so on.
+    """
+    if extra <= 0:
+        return ''
+    if extra == 1:
+        return 'grand'
+    if extra == 2:
+        return 'great-grand'
+    return f'{ordinal(extra - 1)} great-grand'
+
+
+def describe_relationship(up, down, gender, half):
+    """
+    Name what a relative is to a member from their distances to a lowest common ancestor.
+
+    Args:
+        up (int): Generations from the member up to the common ancestor.
+        down (int): Generations from the relative up to the common ancestor.
+        gender (str): The gender of the relative, 'Male' or 'Female'.
+        half (bool): Whether the relatives share only one ancestor at that generation.
+
+    Returns:
+        str: The relationship, e.g. 'grandfather', 'half-sister' or 'second cousin once removed'.
+    """
+    def gendered(male, female, neutral):
+        return {'Male': male, 'Female': female}.get(gender, neutral)
+
+    if up == 0 and down == 0:
+        return 'self'
+
+    if down == 0:
+        return generation_prefix(up - 1) + gendered('father', 'mother', 'parent')
+
+    if up == 0:
+        return generation_prefix(down - 1) + gendered('son', 'daughter', 'child')
+
+    half_prefix = 'half-' if half else ''
+
+    if up == 1 and down == 1:
+        return half_prefix + gendered('brother', 'sister', 'sibling')
+
+    if up == 1:
+        return half_prefix + generation_prefix(down - 2) + gendered('nephew', 'niece', 'nibling')
+
+    if down == 1:
+        return half_prefix + generation_prefix(up - 2) + gendered('uncle', 'aunt', 'pibling')
+
+    degree = min(up, down) - 1
+    removed = abs(up - down)
+    names = {1: 'first', 2: 'second', 3: 'third', 4: 'fourth', 5: 'fifth'}
+    relationship = f"{half_prefix}{names.get(degree, ordinal(degree))} cousin"
+    if removed == 1:
+        relationship += ' once removed'
+    elif removed == 2:
+        relationship += ' twice removed'
+    elif removed > 2:
+        relationship += f' {removed} times removed'
+    return relationship
+
+
+def _get_cache():
+    """
+    Get the per-application index cache and its lock.
+
+    Returns:
+        tuple: (OrderedDict of tree_id -> (version, KinshipIndex), Lock), least recently used first.
+    """
+    return current_app.extensions.setdefault('kinship_index', (OrderedDict(), Lock()))
+
+
+def get_kinship_index(tree_id, version):
+    """
+    Get the kinship index of a family tree, building it unless cached for this version.
+
+    The caller checks that the tree exists and may be read. The version
+    is compared with the one the cached index was built at, so an index
+    is rebuilt after a write made by any process, not only this one.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+        version (int): The current version of the family tree.
+
+    Returns:
+        KinshipIndex: The index of the family tree, at this version or a later one.
+    """
+    from app.models import FamilyMember, FamilyTree
+
+    indexes, lock = _get_cache()
+    with lock:
+        cached = indexes.get(tree_id)
+        if cached is not None and cached[0] >= version:
+            indexes.move_to_end(tree_id)
+            return cached[1]
+
+    """ The index outlives the request, so it is never built from a lagging replica """
+    with primary_reads():
+        built_version = db.session.query(FamilyTree.version).filter(FamilyTree.id == tree_id).scalar()
+        rows = db.session.query(
+            FamilyMember.id, FamilyMember.father_id, FamilyMember.mother_id
+        ).filter_by(tree_id=tree_id).order_by(FamilyMember.id).all()
+    index = KinshipIndex(tree_id, rows)
+
+    """ The version is read first, so the rows are at least as recent as it """
+    if built_version is not None:
+        with lock:
+            cached = indexes.get(tree_id)
+            if cached is None or cached[0] <= built_version:
+                indexes[tree_id] = (built_version, index)
+                indexes.move_to_end(tree_id)
+                while len(indexes) > current_app.config.get('KINSHIP_CACHE_SIZE', DEFAULT_KINSHIP_CACHE_SIZE):
+                    indexes.popitem(last=False)
+    return index
+
+
+def invalidate_kinship_index(tree_id):
+    """
+    Drop the cached kinship index of a family tree.
+
+    Indexes of other processes are rebuilt once they see the new version.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+    """
+    indexes, lock = _get_cache()
+    with lock:
+        indexes.pop(tree_id, None)
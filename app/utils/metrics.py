@@ -0,0 +1,570 @@
+""" app/utils/metrics.py """
+"""
+Request and connection pool metrics in the Prometheus text format.
+
+Each process keeps its metrics in memory behind a single lock held only
+for dict updates. Under a multi-worker server, set METRICS_DIR to a
+directory shared by the workers: a thread of each process then writes a
+snapshot of its metrics there every METRICS_FLUSH_INTERVAL seconds, when
+they changed, and the /metrics endpoint adds up the snapshots of all
+processes. The snapshot of an exited process is folded into a single
+file of exited processes and removed: its counters and histograms are
+kept, its gauges dropped. The pool gauges of each process are read from
+its pools before each snapshot, so they add up across processes too.
+"""
+
+import atexit
+import fcntl
+import json
+import logging
+import os
+import tempfile
+import time
+from threading import Lock, Thread
+from flask import current_app, g, request
+from sqlalchemy import event
+from sqlalchemy.pool import QueuePool
+from app.utils.replica import get_engines
+
+logger = logging.getLogger('app.metrics')
+
+""" Histogram buckets, in seconds """
+REQUEST_DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+POOL_WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+
+""" Default minimum time between two snapshots of a process, in seconds """
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+""" Counters and histograms of exited processes, and the lock guarding it, in METRICS_DIR """
+EXITED_FILE = 'exited.json'
+EXITED_LOCK_FILE = '.exited.lock'
+
+""" Guards starting the snapshot thread of a process """
+_flusher_lock = Lock()
+
+METRIC_HELP = {
+    'http_requests_total': ('counter', 'HTTP requests by route and status code.'),
+    'http_request_duration_seconds': ('histogram', 'HTTP request latency by route.'),
+    'http_requests_in_flight': ('gauge', 'HTTP requests being processed by route.'),
+    'db_pool_checked_out': ('gauge', 'Database connections checked out of the pool.'),
+    'db_pool_overflow': ('gauge', 'Database connections open beyond the pool size.'),
+    'db_pool_size': ('gauge', 'Configured size of the database connection pool.'),
+    'db_pool_wait_seconds': ('histogram', 'Time spent waiting for a database connection from the pool.'),
+}
+
+
+class MetricsStore:
+    """
+    In-process metric values.
+
+    Attributes:
+        counters (dict): (name, labels) -> value.
+        gauges (dict): (name, labels) -> value.
+        histograms (dict): (name, labels) -> [bucket counts, sum, count], with
+            non-cumulative bucket counts and a last bucket for +Inf.
+        buckets (dict): Histogram name -> upper bounds of its buckets.
+        changes (int): The number of updates so far.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.histograms = {}
+        self.changes = 0
+        self.buckets = {
+            'http_request_duration_seconds': REQUEST_DURATION_BUCKETS,
+            'db_pool_wait_seconds': POOL_WAIT_BUCKETS,
+        }
+        self.lock = Lock()
+
+    def inc(self, name, labels, amount=1):
+        """
+        Increase a counter.
+
+        Args:
+            name (str): The metric name.
+            labels (tuple): Sorted (label, value) pairs.
+            amount (float): The amount to add.
+        """
+        with self.lock:
+            self.counters[(name, labels)] = self.counters.get((name, labels), 0) + amount
+            self.changes += 1
+
+    def add_gauge(self, name, labels, amount):
+        """
+        Add to a gauge.
+
+        Args:
+            name (str): The metric name.
+            labels (tuple): Sorted (label, value) pairs.
+            amount (float): The amount to add, negative to subtract.
+        """
+        with self.lock:
+            self.gauges[(name, labels)] = self.gauges.get((name, labels), 0) + amount
+            self.changes += 1
+
+    def set_gauge(self, name, labels, value):
+        """
+        Set a gauge.
+
+        Args:
+            name (str): The metric name.
+            labels (tuple): Sorted (label, value) pairs.
+            value (float): The new value.
+        """
+        with self.lock:
+            if self.gauges.get((name, labels)) != value:
+                self.gauges[(name, labels)] = value
+                self.changes += 1
+
+    def observe(self, name, labels, value):
+        """
+        Record an observation in a histogram.
+
+        Args:
+            name (str): The metric name.
+            labels (tuple): Sorted (label, value) pairs.
+            value (float): The observed value.
+        """
+        bounds = self.buckets[name]
+        position = next((index for index, bound in enumerate(bounds) if value <= bound), len(bounds))
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = [[0] * (len(bounds) + 1), 0.0, 0]
+            histogram[0][position] += 1
+            histogram[1] += value
+            histogram[2] += 1
+            self.changes += 1
+
+    def snapshot(self):
+        """
+        Copy the metric values in a JSON serializable form.
+
+        Returns:
+            dict: 'counters', 'gauges' and 'histograms' lists of [name, labels, value],
+                and the 'changes' count they include.
+        """
+        with self.lock:
+            return {
+                'changes': self.changes,
+                'counters': [[name, list(labels), value] for (name, labels), value in self.counters.items()],
+                'gauges': [[name, list(labels), value] for (name, labels), value in self.gauges.items()],
+                'histograms': [
+                    [name, list(labels), [list(histogram[0]), histogram[1], histogram[2]]]
+                    for (name, labels), histogram in self.histograms.items()
+                ],
+            }
+
+    def add_snapshot(self, data):
+        """
+        Add the values of a snapshot to the store.
+
+        Args:
+            data (dict): A snapshot, as returned by snapshot.
+        """
+        for name, labels, value in data['counters']:
+            self.inc(name, tuple(tuple(pair) for pair in labels), value)
+        for name, labels, value in data['gauges']:
+            self.add_gauge(name, tuple(tuple(pair) for pair in labels), value)
+        with self.lock:
+            for name, labels, (bucket_counts, total, count) in data['histograms']:
+                key = (name, tuple(tuple(pair) for pair in labels))
+                histogram = self.histograms.setdefault(key, [[0] * len(bucket_counts), 0.0, 0])
+                histogram[0] = [current + added for current, added in zip(histogram[0], bucket_counts)]
+                histogram[1] += total
+                histogram[2] += count
+
+
+def _labels(**labels):
+    """
+    Build the hashable label set of a metric.
+
+    Returns:
+        tuple: Sorted (label, value) pairs, with None values written as 'none'.
+    """
+    return tuple(sorted((key, 'none' if value is None else str(value)) for key, value in labels.items()))
+
+
+def _route_labels():
+    """
+    Get the route labels of the current request.
+
+    Returns:
+        dict: 'blueprint' and 'endpoint' of the matched route.
+    """
+    return {'blueprint': request.blueprint, 'endpoint': request.endpoint}
+
+
+def _get_store(app):
+    """
+    Get the metrics store of an application.
+
+    Returns:
+        MetricsStore: The store.
+    """
+    return app.extensions['metrics']
+
+
+def _pid_alive(pid):
+    """
+    Check whether a process is still running.
+
+    Args:
+        pid (int): The process ID.
+
+    Returns:
+        bool: True if the process exists.
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _read_json(path):
+    """
+    Read a snapshot file.
+
+    Args:
+        path (str): The path of the file.
+
+    Returns:
+        dict: The snapshot, or None if the file is missing or unreadable.
+    """
+    try:
+        with open(path) as snapshot_file:
+            return json.load(snapshot_file)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_json(directory, file_name, data):
+    """
+    Replace a snapshot file atomically, so readers never see a partial snapshot.
+
+    Args:
+        directory (str): The METRICS_DIR directory.
+        file_name (str): The name of the file.
+        data (dict): The snapshot.
+    """
+    descriptor, temporary_path = tempfile.mkstemp(dir=directory, prefix='.metrics-')
+    with os.fdopen(descriptor, 'w') as snapshot_file:
+        json.dump(data, snapshot_file)
+    os.replace(temporary_path, os.path.join(directory, file_name))
+
+
+def retire_snapshot(directory, file_name):
+    """
+    Fold the snapshot of an exited process into the exited processes file and remove it.
+
+    Its gauges are dropped. Processes folding snapshots at the same time
+    take turns on a lock file, so each snapshot is added once.
+
+    Args:
+        directory (str): The METRICS_DIR directory.
+        file_name (str): The name of the snapshot file.
+    """
+    path = os.path.join(directory, file_name)
+    with open(os.path.join(directory, EXITED_LOCK_FILE), 'a') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            if not os.path.exists(path):
+                return
+            data = _read_json(path)
+            if data is not None:
+                exited = MetricsStore()
+                exited_data = _read_json(os.path.join(directory, EXITED_FILE))
+                if exited_data is not None:
+                    exited.add_snapshot(exited_data)
+                data['gauges'] = []
+                exited.add_snapshot(data)
+                _write_json(directory, EXITED_FILE, exited.snapshot())
+            os.remove(path)
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def write_snapshot(app):
+    """
+    Write the metrics of this process to METRICS_DIR, if configured and changed since the last snapshot.
+
+    A snapshot already carrying the process ID before the first one is
+    written belongs to an exited process and is retired first.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        bool: True if a snapshot was written.
+    """
+    directory = app.config.get('METRICS_DIR')
+    if not directory:
+        return False
+
+    update_pool_gauges(app)
+    data = _get_store(app).snapshot()
+    pid = os.getpid()
+    file_name = f'metrics-{pid}.json'
+    written_pid, written_changes = app.extensions.get('metrics_written', (None, None))
+    if written_pid == pid and written_changes == data['changes']:
+        return False
+    if written_pid != pid:
+        retire_snapshot(directory, file_name)
+
+    data['pid'] = pid
+    _write_json(directory, file_name, data)
+    app.extensions['metrics_written'] = (pid, data['changes'])
+    return True
+
+
+def _flush_snapshots(app, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            write_snapshot(app)
+        except Exception:
+            logger.exception('Writing the metrics snapshot failed')
+
+
+def _start_flusher(app):
+    """
+    Start the snapshot thread of the current process, unless it runs already.
+
+    The thread is started on the first request of each process rather
+    than at startup, as worker processes forked from the application do
+    not inherit its threads.
+
+    Args:
+        app (Flask): The application.
+    """
+    pid = os.getpid()
+    if app.extensions.get('metrics_flusher') == pid:
+        return
+    with _flusher_lock:
+        if app.extensions.get('metrics_flusher') != pid:
+            interval = app.config.get('METRICS_FLUSH_INTERVAL', DEFAULT_FLUSH_INTERVAL)
+            Thread(target=_flush_snapshots, args=(app, interval), name='metrics-flusher', daemon=True).start()
+            app.extensions['metrics_flusher'] = pid
+
+
+def collect(app):
+    """
+    Add up the metrics of this process and of the snapshots of the other processes.
+
+    Snapshots of exited processes are retired on the way.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        MetricsStore: A store holding the combined values.
+    """
+    update_pool_gauges(app)
+    combined = MetricsStore()
+    combined.add_snapshot(_get_store(app).snapshot())
+
+    directory = app.config.get('METRICS_DIR')
+    if directory:
+        for file_name in os.listdir(directory):
+            if not (file_name.startswith('metrics-') and file_name.endswith('.json')):
+                continue
+            data = _read_json(os.path.join(directory, file_name))
+            if data is None or data.get('pid') == os.getpid():
+                continue
+            if not _pid_alive(data.get('pid', 0)):
+                retire_snapshot(directory, file_name)
+                continue
+            combined.add_snapshot(data)
+
+        """ Read last, so it includes the snapshots retired above """
+        exited = _read_json(os.path.join(directory, EXITED_FILE))
+        if exited is not None:
+            combined.add_snapshot(exited)
+
+    return combined
+
+
+def _format_labels(labels, extra=()):
+    """
+    Format a label set in the Prometheus text format.
+
+    Args:
+        labels (tuple): (label, value) pairs.
+        extra (tuple): Additional (label, value) pairs, e.g. the bucket bound.
+
+    Returns:
+        str: The label set in braces, or '' if empty.
+    """
+    pairs = list(labels) + list(extra)
+    if not pairs:
+        return ''
+    escaped = (
+        '{}="{}"'.format(key, value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for key, value in pairs
+    )
+    return '{' + ','.join(escaped) + '}'
+
+
+def render_metrics(app):
+    """
+    Render the metrics of all processes in the Prometheus text exposition format.
+
+    Args:
+        app (Flask): The application.
+
+    Returns:
+        str: The metrics.
+    """
+    combined = collect(app)
+
+    families = {}
+    for (name, labels), value in combined.counters.items():
+        families.setdefault(name, []).append(f'{name}{_format_labels(labels)} {value:g}')
+    for (name, labels), value in combined.gauges.items():
+        families.setdefault(name, []).append(f'{name}{_format_labels(labels)} {value:g}')
+    for (name, labels), (bucket_counts, total, count) in combined.histograms.items():
+        lines = families.setdefault(name, [])
+        cumulative = 0
+        bounds = [f'{bound:g}' for bound in combined.buckets[name]] + ['+Inf']
+        for bound, bucket_count in zip(bounds, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f"{name}_bucket{_format_labels(labels, (('le', bound),))} {cumulative}")
+        lines.append(f'{name}_sum{_format_labels(labels)} {total:g}')
+        lines.append(f'{name}_count{_format_labels(labels)} {count}')
+
+    output = []
+    for name in sorted(families):
+        metric_type, help_text = METRIC_HELP[name]
+        output.append(f'# HELP {name} {help_text}')
+        output.append(f'# TYPE {name} {metric_type}')
+        output.extend(sorted(families[name]) if metric_type != 'histogram' else families[name])
+    return '\n'.join(output) + '\n'
+
+
+class TimedQueuePool(QueuePool):
+    """
+    Queue pool noting how long each checkout waited for a connection.
+
+    The wait is left in the info dict of the connection record, for the
+    checkout listener of the engine to record under its labels.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        record = super()._do_get()
+        record.info['metrics_pool_wait'] = time.perf_counter() - start
+        return record
+
+
+def _pool_wait_listener(store, labels):
+    """
+    Build the checkout listener recording the waits noted by TimedQueuePool for an engine.
+
+    Args:
+        store (MetricsStore): The store of the application.
+        labels (tuple): The labels of the engine.
+
+    Returns:
+        function: The 'checkout' pool event listener.
+    """
+    def record_pool_wait(dbapi_connection, connection_record, connection_proxy):
+        wait = connection_record.info.pop('metrics_pool_wait', None)
+        if wait is not None:
+            store.observe('db_pool_wait_seconds', labels, wait)
+
+    return record_pool_wait
+
+
+def update_pool_gauges(app):
+    """
+    Set the pool gauges of an application from its pools.
+
+    The pool is looked up on each engine, so the gauges follow it when the
+    engine is disposed and its pool recreated.
+
+    Args:
+        app (Flask): The application.
+    """
+    store = _get_store(app)
+    for engine, labels in app.extensions.get('metrics_engines', ()):
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            store.set_gauge('db_pool_checked_out', labels, pool.checkedout())
+            store.set_gauge('db_pool_overflow', labels, max(pool.overflow(), 0))
+            store.set_gauge('db_pool_size', labels, pool.size())
+
+
+def configure_pool_metrics(app):
+    """
+    Have the queue pools of an application time their checkouts.
+
+    Sets TimedQueuePool as the poolclass of SQLALCHEMY_ENGINE_OPTIONS,
+    unless one is configured. Must run before the engines are created.
+    Engines needing another pool, such as in-memory SQLite, keep it.
+
+    Args:
+        app (Flask): The application.
+    """
+    options = dict(app.config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    options.setdefault('poolclass', TimedQueuePool)
+    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = options
+
+
+def before_request_metrics():
+    g.metrics_start = time.perf_counter()
+    _get_store(current_app).add_gauge('http_requests_in_flight', _labels(**_route_labels()), 1)
+
+
+def after_request_metrics(response):
+    g.metrics_status = response.status_code
+    return response
+
+
+def teardown_request_metrics(exception):
+    if 'metrics_start' not in g:
+        return
+
+    app = current_app._get_current_object()
+    store = _get_store(app)
+    route_labels = _route_labels()
+    store.add_gauge('http_requests_in_flight', _labels(**route_labels), -1)
+    store.observe(
+        'http_request_duration_seconds',
+        _labels(method=request.method, **route_labels),
+        time.perf_counter() - g.metrics_start
+    )
+    store.inc('http_requests_total', _labels(
+        method=request.method, status=g.get('metrics_status', 500), **route_labels
+    ))
+
+    if app.config.get('METRICS_DIR'):
+        _start_flusher(app)
+
+
+def init_metrics(app):
+    """
+    Collect request and connection pool metrics for an application.
+
+    Args:
+        app (Flask): The application, with the database extension initialized.
+    """
+    store = app.extensions['metrics'] = MetricsStore()
+
+    with app.app_context():
+        engines = app.extensions['metrics_engines'] = [
+            (engine, _labels(engine=bind_key or 'default')) for bind_key, engine in get_engines().items()
+        ]
+    for engine, labels in engines:
+        event.listen(engine, 'checkout', _pool_wait_listener(store, labels))
+    update_pool_gauges(app)
+
+    app.before_request(before_request_metrics)
+    app.after_request(after_request_metrics)
+    app.teardown_request(teardown_request_metrics)
+
+    if app.config.get('METRICS_DIR'):
+        atexit.register(write_snapshot, app)
@@ -0,0 +1,133 @@
+""" app/utils/replica.py """
+"""
+Routing of read-only database work to a read replica.
+
+When SQLALCHEMY_REPLICA_URI is set, the application gets a replica engine
+of its own, kept out of SQLALCHEMY_BINDS so that the models' metadata and
+create_all/drop_all only ever see the primary, and the session sends SELECT statements to it while
+serving GET, HEAD and OPTIONS requests, and inside the model readers
+marked with `replica_reads` in any request. Everything else runs on the
+primary: flushes, INSERT/UPDATE/DELETE and raw SQL statements, and, once
+a session has written anything, every later read of that session, so a
+request always reads its own writes.
+"""
+
+from contextlib import contextmanager
+from functools import wraps
+from flask import current_app, has_request_context, request
+from flask_sqlalchemy.session import Session
+from sqlalchemy import create_engine
+
+""" Key of the replica engine, in the application's extensions and in get_engines """
+REPLICA_BIND_KEY = 'replica'
+
+""" HTTP methods whose requests only read """
+READ_ONLY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+
+class RoutingSession(Session):
+    """
+    Session choosing between the primary and the replica engine per statement.
+
+    The routing state lives in the session's info dict, which lasts as long
+    as the session, i.e. one application context:
+        'wrote' (bool): The session has sent a write to the primary.
+        'replica_reads' (int): Depth of `replica_reads` calls in progress.
+        'primary_reads' (int): Depth of `primary_reads` blocks in progress.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None:
+            replica = current_app.extensions.get(REPLICA_BIND_KEY)
+            if replica is not None and self._reads_from_replica(clause):
+                return replica
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+    def _reads_from_replica(self, clause):
+        """
+        Decide whether a statement may run on the replica.
+
+        Args:
+            clause (ClauseElement): The statement, or None for a flush or a bare connection request.
+
+        Returns:
+            bool: True to run the statement on the replica.
+        """
+        if not getattr(clause, 'is_select', False):
+            self.info['wrote'] = True
+            return False
+        if self.info.get('wrote') or self.info.get('primary_reads'):
+            return False
+        if self.info.get('replica_reads'):
+            return True
+        return has_request_context() and request.method in READ_ONLY_METHODS
+
+
+def replica_reads(f):
+    """
+    Decorator allowing a read-only model method to read from the replica in any request.
+
+    Args:
+        f (function): The reader to be decorated.
+
+    Returns:
+        function: The decorated reader.
+    """
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        from app import db
+
+        info = db.session.info
+        info['replica_reads'] = info.get('replica_reads', 0) + 1
+        try:
+            return f(*args, **kwargs)
+        finally:
+            info['replica_reads'] -= 1
+    return decorated_function
+
+
+@contextmanager
+def primary_reads():
+    """
+    Keep the reads of a block on the primary, e.g. when their result is cached past the request.
+    """
+    from app import db
+
+    info = db.session.info
+    info['primary_reads'] = info.get('primary_reads', 0) + 1
+    try:
+        yield
+    finally:
+        info['primary_reads'] -= 1
+
+
+def configure_replica(app):
+    """
+    Create the replica engine of an application from SQLALCHEMY_REPLICA_URI, if set.
+
+    The engine takes the SQLALCHEMY_ENGINE_OPTIONS of the primary.
+
+    Args:
+        app (Flask): The application.
+    """
+    replica_uri = app.config.get('SQLALCHEMY_REPLICA_URI')
+    if replica_uri:
+        app.extensions[REPLICA_BIND_KEY] = create_engine(
+            replica_uri, **app.config.get('SQLALCHEMY_ENGINE_OPTIONS', {})
+        )
+
+
+def get_engines():
+    """
+    Get the engines of the current application, the replica included.
+
+    Returns:
+        dict: Bind key -> engine; None for the primary, REPLICA_BIND_KEY for the replica.
+    """
+    from app import db
+
+    engines = dict(db.engines)
+    replica = current_app.extensions.get(REPLICA_BIND_KEY)
+    if replica is not None:
+        engines[REPLICA_BIND_KEY] = replica
+    return engines
@@ -0,0 +1,101 @@
+""" app/utils/search.py """
+"""
+Name tokenization for the family member search index.
+
+Member names are indexed as trigrams of their normalized form, so a
+substring query can be answered from an index on the tokens instead of
+a full scan with a leading-wildcard LIKE. The same normalized form keys
+the duplicate-member fingerprint.
+"""
+
+import hashlib
+import unicodedata
+
+""" Length of the tokens stored in the search index """
+TOKEN_LENGTH = 3
+
+
+def normalize_name(name):
+    """
+    Normalize a name for indexing: strip accents, case-fold and collapse whitespace.
+
+    Accents are stripped so that tokens stay distinct under accent-insensitive
+    database collations.
+
+    Args:
+        name (str): The name to normalize.
+
+    Returns:
+        str: The normalized name.
+    """
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def name_tokens(name):
+    """
+    Get the distinct trigrams of a name.
+
+    Args:
+        name (str): The name to tokenize.
+
+    Returns:
+        list: The sorted distinct tokens, empty if the normalized name is too short.
+    """
+    normalized = normalize_name(name)
+    return sorted({
+        normalized[start:start + TOKEN_LENGTH]
+        for start in range(len(normalized) - TOKEN_LENGTH + 1)
+    })
+
+
+def name_token_rows(member_id, tree_id, name):
+    """
+    Build the search index rows of a family member.
+
+    Args:
+        member_id (int): The ID of the family member.
+        tree_id (int): The ID of the family tree the member belongs to.
+        name (str): The name of the family member.
+
+    Returns:
+        list: Dicts with 'token', 'tree_id' and 'member_id' keys.
+    """
+    return [
+        {'token': token, 'tree_id': tree_id, 'member_id': member_id}
+        for token in name_tokens(name)
+    ]
+
+
+def member_fingerprint(name, gender, date_of_birth):
+    """
+    Build the fingerprint identifying duplicate family members within a tree.
+
+    Members are duplicates when their normalized names, case-folded genders
+    and dates of birth are equal.
+
+    Args:
+        name (str): The name of the family member.
+        gender (str): The gender of the family member.
+        date_of_birth (Date): The date of birth of the family member.
+
+    Returns:
+        str: The hex SHA-256 digest, 64 characters long.
+    """
+    birth = date_of_birth.isoformat() if hasattr(date_of_birth, 'isoformat') else str(date_of_birth)
+    key = '\x1f'.join((normalize_name(name), ' '.join((gender or '').casefold().split()), birth))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def escape_like(value):
+    """
+    Escape the LIKE wildcards in a value, using backslash as the escape character.
+
+    Args:
+        value (str): The value to escape.
+
+    Returns:
+        str: The escaped value.
+    """
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
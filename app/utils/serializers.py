@@ -0,0 +1,95 @@
+""" app/utils/serializers.py """
+"""
+Serialization of family trees, family members and jobs for JSON responses.
+
+The serializers read attributes by name, so they accept ORM instances and
+column-projected rows alike; routes listing many members should query only
+the columns they return and pass the rows straight through.
+"""
+
+from flask import url_for
+
+""" Member fields returned by default, and the subset without parent IDs """
+MEMBER_FIELDS = ['id', 'name', 'gender', 'date_of_birth', 'biography', 'picture_url', 'father_id', 'mother_id']
+MEMBER_SUMMARY_FIELDS = ['id', 'name', 'gender', 'date_of_birth', 'biography', 'picture_url']
+
+""" Tree fields returned by default, and with the aggregates of the tree summary """
+TREE_FIELDS = ['id', 'name', 'description']
+TREE_SUMMARY_FIELDS = TREE_FIELDS + ['member_count', 'generations', 'earliest_birth', 'latest_birth', 'updated_at']
+
+JOB_FIELDS = ['id', 'kind', 'tree_id', 'status', 'progress', 'result', 'error', 'created_at', 'started_at', 'finished_at']
+
+
+def member_columns(fields):
+    """
+    Get the FamilyMember columns to project for a list of member fields.
+
+    Args:
+        fields (list): Names of FamilyMember columns.
+
+    Returns:
+        list: The matching FamilyMember column attributes, in the same order.
+    """
+    from app.models import FamilyMember
+
+    return [getattr(FamilyMember, field) for field in fields]
+
+
+def serialize_member(member, fields=MEMBER_FIELDS):
+    """
+    Serialize a family member.
+
+    Args:
+        member (FamilyMember or Row): The family member or a row with the fields as columns.
+        fields (list): Names of the fields to include.
+
+    Returns:
+        dict: Field name -> value, or None if member is None.
+    """
+    if member is None:
+        return None
+    return {field: getattr(member, field) for field in fields}
+
+
+def serialize_member_rows(rows, fields):
+    """
+    Serialize projected family member rows whose columns are exactly the fields, in order.
+
+    Args:
+        rows (list): Rows selected with member_columns(fields).
+        fields (list): Names of the projected fields.
+
+    Returns:
+        list: One dict per row.
+    """
+    return [dict(zip(fields, row)) for row in rows]
+
+
+def serialize_tree(tree, fields=TREE_FIELDS):
+    """
+    Serialize a family tree.
+
+    Args:
+        tree (FamilyTree or Row): The family tree or a row with the fields as columns.
+        fields (list): Names of the fields to include.
+
+    Returns:
+        dict: Field name -> value.
+    """
+    return {field: getattr(tree, field) for field in fields}
+
+
+def serialize_job(job):
+    """
+    Serialize a background job with the URLs to poll it and to fetch its result.
+
+    Args:
+        job (Job): The job.
+
+    Returns:
+        dict: Field name -> value.
+    """
+    data = {field: getattr(job, field) for field in JOB_FIELDS}
+    data['status_url'] = url_for('job.get_job', job_id=job.id)
+    data['result_url'] = url_for('job.get_job_result', job_id=job.id) if job.result_path else None
+    return data
@@ -0,0 +1,127 @@
+""" app/utils/sqlite.py """
+"""
+Connection setup for embedded SQLite deployments.
+
+Every new connection to a SQLite engine gets the pragmas of the
+SQLITE_PRAGMAS setting (WAL journal, synchronous=NORMAL, memory map and
+page cache sizes in SqliteConfig). Transactions are started explicitly
+instead of by the sqlite3 module: requests that may write (anything but
+GET, HEAD and OPTIONS, unless they ask to run as a background job, which
+queues a job row) and work outside requests, such as CLI commands,
+begin with BEGIN IMMEDIATE and so take the write lock up front. Under a
+threaded server, concurrent writers then wait for each other within the
+busy timeout instead of failing when a read transaction tries to turn
+into a write one, while readers keep running alongside the writer.
+Background threads that only read, such as the event poller, wrap their
+work in `read_only_transactions` to begin deferred transactions instead.
+"""
+
+from contextlib import contextmanager
+from threading import local
+from flask import has_request_context, request
+from sqlalchemy import event
+from app.utils.replica import get_engines
+from app.utils.jobs import wants_async
+
+""" HTTP methods whose requests only read """
+READ_ONLY_METHODS = {'GET', 'HEAD', 'OPTIONS'}
+
+""" Per-thread depth of read_only_transactions blocks in progress """
+_read_only = local()
+
+
+def _pragma_value(value):
+    """
+    Format a pragma value for a PRAGMA statement.
+
+    Args:
+        value (str, int or bool): The value.
+
+    Returns:
+        str: The value as SQL.
+    """
+    if isinstance(value, bool):
+        return 'ON' if value else 'OFF'
+    if isinstance(value, int):
+        return str(value)
+    if not str(value).replace('_', '').isalnum():
+        raise ValueError(f'Invalid SQLite pragma value: {value!r}')
+    return str(value)
+
+
+def _connect_listener(pragmas):
+    """
+    Build the listener applying pragmas to new DBAPI connections.
+
+    Args:
+        pragmas (dict): Pragma name -> value, applied in order.
+
+    Returns:
+        function: The 'connect' event listener.
+    """
+    statements = []
+    for name, value in pragmas.items():
+        if not name.replace('_', '').isalnum():
+            raise ValueError(f'Invalid SQLite pragma name: {name!r}')
+        statements.append(f'PRAGMA {name} = {_pragma_value(value)}')
+
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        """ Leave transaction control to the begin listener """
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        try:
+            for statement in statements:
+                cursor.execute(statement)
+        finally:
+            cursor.close()
+
+    return set_sqlite_pragmas
+
+
+@contextmanager
+def read_only_transactions():
+    """
+    Begin the transactions of a block without the write lock, outside requests too.
+
+    For work that only reads; a write in the block may fail with SQLITE_BUSY.
+    """
+    _read_only.depth = getattr(_read_only, 'depth', 0) + 1
+    try:
+        yield
+    finally:
+        _read_only.depth -= 1
+
+
+def begin_sqlite_transaction(conn):
+    """
+    Start a transaction, taking the write lock unless the current request or block only reads.
+
+    Args:
+        conn (Connection): The connection beginning a transaction.
+    """
+    if getattr(_read_only, 'depth', 0):
+        conn.exec_driver_sql('BEGIN')
+    elif has_request_context() and request.method in READ_ONLY_METHODS and not wants_async():
+        conn.exec_driver_sql('BEGIN')
+    else:
+        conn.exec_driver_sql('BEGIN IMMEDIATE')
+
+
+def init_sqlite(app):
+    """
+    Configure the SQLite engines of an application.
+
+    Engines of other databases are left untouched.
+
+    Args:
+        app (Flask): The application, with the database extension initialized.
+    """
+    listener = _connect_listener(app.config.get('SQLITE_PRAGMAS', {}))
+
+    with app.app_context():
+        for engine in get_engines().values():
+            if engine.dialect.name != 'sqlite':
+                continue
+            event.listen(engine, 'connect', listener)
+            if not event.contains(engine, 'begin', begin_sqlite_transaction):
+                event.listen(engine, 'begin', begin_sqlite_transaction)
@@ -0,0 +1,138 @@
+""" app/utils/stats.py """
+"""
+Statistics of family trees, cached by tree version.
+
+The statistics are computed with a handful of grouped SQL queries; only
+per-group counts cross the wire, never member rows. Results are cached
+per process and keyed by the version of the tree, which every member
+write bumps, so a cached result is reused until the tree changes and is
+never served stale.
+"""
+
+from collections import Counter, OrderedDict
+from threading import Lock
+from flask import current_app
+from sqlalchemy import func, select
+from app import db
+
+""" Default number of family trees whose statistics are cached per process """
+DEFAULT_STATS_CACHE_SIZE = 1000
+
+""" Number of names listed in the most common name rankings """
+TOP_NAMES = 10
+
+
+def compute_tree_stats(tree_id):
+    """
+    Compute the statistics of a family tree.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+
+    Returns:
+        dict: member_count, members_per_generation, gender_split,
+            births_per_decade, families, average_family_size,
+            most_common_given_names and most_common_surnames.
+    """
+    from app.models import AncestryClosure, FamilyMember
+
+    """ A member's generation is one more than its deepest line of ancestors """
+    lines = select(
+        AncestryClosure.descendant_id, func.max(AncestryClosure.depth).label('depth')
+    ).where(AncestryClosure.tree_id == tree_id).group_by(AncestryClosure.descendant_id).subquery()
+    generations = db.session.execute(
+        select(lines.c.depth, func.count()).group_by(lines.c.depth).order_by(lines.c.depth)
+    ).all()
+
+    genders = db.session.execute(
+        select(FamilyMember.gender, func.count())
+        .where(FamilyMember.tree_id == tree_id)
+        .group_by(FamilyMember.gender).order_by(FamilyMember.gender)
+    ).all()
+
+    birth_year = func.extract('year', FamilyMember.date_of_birth)
+    births_by_year = db.session.execute(
+        select(birth_year, func.count()).where(FamilyMember.tree_id == tree_id).group_by(birth_year)
+    ).all()
+    births_per_decade = Counter()
+    for year, births in births_by_year:
+        births_per_decade[int(year) // 10 * 10] += births
+
+    """ A family is a couple (or a single known parent) with its children """
+    family_sizes = select(func.count().label('children')).where(
+        FamilyMember.tree_id == tree_id,
+        (FamilyMember.father_id.isnot(None)) | (FamilyMember.mother_id.isnot(None))
+    ).group_by(FamilyMember.father_id, FamilyMember.mother_id).subquery()
+    families, average_children = db.session.execute(
+        select(func.count(), func.avg(family_sizes.c.children))
+    ).one()
+
+    given_names = Counter()
+    surnames = Counter()
+    for name, count in db.session.execute(
+        select(FamilyMember.name, func.count()).where(FamilyMember.tree_id == tree_id).group_by(FamilyMember.name)
+    ):
+        words = name.split()
+        if words:
+            given_names[words[0]] += count
+        if len(words) > 1:
+            surnames[words[-1]] += count
+
+    return {
+        'member_count': sum(count for _, count in genders),
+        'members_per_generation': [
+            {'generation': depth + 1, 'members': count} for depth, count in generations
+        ],
+        'gender_split': {gender: count for gender, count in genders},
+        'births_per_decade': [
+            {'decade': decade, 'births': births_per_decade[decade]} for decade in sorted(births_per_decade)
+        ],
+        'families': families,
+        'average_family_size': round(float(average_children), 2) if families else 0,
+        'most_common_given_names': [
+            {'name': name, 'count': count} for name, count in given_names.most_common(TOP_NAMES)
+        ],
+        'most_common_surnames': [
+            {'name': name, 'count': count} for name, count in surnames.most_common(TOP_NAMES)
+        ],
+    }
+
+
+def _get_cache():
+    """
+    Get the per-application statistics cache and its lock.
+
+    Returns:
+        tuple: (OrderedDict of tree_id -> (version, stats), Lock), least recently used first.
+    """
+    return current_app.extensions.setdefault('tree_stats', (OrderedDict(), Lock()))
+
+
+def get_tree_stats(tree_id, version):
+    """
+    Get the statistics of a family tree, computing them unless cached for this version.
+
+    Args:
+        tree_id (int): The ID of the family tree.
+        version (int): The current version of the family tree.
+
+    Returns:
+        dict: The statistics, see compute_tree_stats.
+    """
+    cache, lock = _get_cache()
+    with lock:
+        cached = cache.get(tree_id)
+        if cached is not None and cached[0] == version:
+            cache.move_to_end(tree_id)
+            return cached[1]
+
+    stats = compute_tree_stats(tree_id)
+
+    with lock:
+        cached = cache.get(tree_id)
+        if cached is None or cached[0] <= version:
+            cache[tree_id] = (version, stats)
+            cache.move_to_end(tree_id)
+            while len(cache) > current_app.config.get('STATS_CACHE_SIZE', DEFAULT_STATS_CACHE_SIZE):
+                cache.popitem(last=False)
+    return stats
@@ -0,0 +1,4 @@
+""" benchmarks/__init__.py """
+"""
+Benchmarks for the Dzinza database schema and API.
+"""
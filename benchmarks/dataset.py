@@ -0,0 +1,247 @@
+""" benchmarks/dataset.py """
+"""
+Synthetic genealogy dataset generator.
+
+Builds realistic family trees through the application's models: every
+tree starts from a founding couple, and each following generation gives
+every child of the previous one a spouse from outside the family and
+`branching` children, until the requested number of generations or the
+member cap of the tree is reached. Surnames pass down the father's line
+and birth dates advance about 28 years per generation.
+
+Usage:
+    python -m benchmarks.dataset --database-uri sqlite:///benchmark.db --generations 8 --branching 3
+"""
+
+import argparse
+from datetime import date, timedelta
+import random
+import time
+from app import create_app, db
+from app.models import FamilyMember, FamilyTree, User
+
+MALE_NAMES = ['Tendai', 'Tatenda', 'Farai', 'Kuda', 'Simba', 'Tinashe', 'Tapiwa', 'John', 'Peter', 'David',
+              'Paul', 'James', 'Joseph', 'Samuel', 'Takunda', 'Blessing', 'Munyaradzi', 'Tonderai', 'Nigel', 'Brian']
+FEMALE_NAMES = ['Rudo', 'Chipo', 'Nyasha', 'Tsitsi', 'Rutendo', 'Chiedza', 'Fadzai', 'Mary', 'Grace', 'Ruth',
+                'Esther', 'Sarah', 'Anna', 'Ruvimbo', 'Vimbai', 'Tariro', 'Shamiso', 'Nokuthula', 'Precious', 'Linda']
+SURNAMES = ['Moyo', 'Ncube', 'Sibanda', 'Dube', 'Ndlovu', 'Mpofu', 'Nyathi', 'Mhlanga', 'Chikore', 'Mutasa',
+            'Banda', 'Phiri', 'Zulu', 'Khumalo', 'Shumba', 'Gumbo', 'Marufu', 'Mapfumo', 'Chiweshe', 'Makoni']
+
+""" Birth year of the founders and years between generations """
+FOUNDER_BIRTH_YEAR = 1750
+GENERATION_YEARS = 28
+
+BENCHMARK_PASSWORD = 'benchmark-password'
+
+
+class TreeGenerator:
+    """
+    Generator of the members of one synthetic family tree.
+
+    Attributes:
+        tree_id (int): The ID of the family tree being filled.
+        rng (Random): The random number generator.
+        fingerprints (set): (name, gender, date_of_birth) of the members so far, which must stay unique.
+    """
+
+    def __init__(self, tree_id, rng):
+        self.tree_id = tree_id
+        self.rng = rng
+        self.fingerprints = set()
+
+    def person(self, gender, surname, generation):
+        """
+        Make a member dict with a name and birth date unique in the tree.
+
+        Args:
+            gender (str): 'Male' or 'Female'.
+            surname (str): The surname of the member.
+            generation (int): The generation number, 0 for the founders.
+
+        Returns:
+            dict: The member columns for FamilyMember.add_members.
+        """
+        first_names = MALE_NAMES if gender == 'Male' else FEMALE_NAMES
+        born = date(FOUNDER_BIRTH_YEAR + generation * GENERATION_YEARS, 1, 1)
+        while True:
+            name = f'{self.rng.choice(first_names)} {surname}'
+            date_of_birth = born + timedelta(days=self.rng.randrange(15 * 365))
+            if (name, gender, date_of_birth) not in self.fingerprints:
+                self.fingerprints.add((name, gender, date_of_birth))
+                return {
+                    'name': name,
+                    'gender': gender,
+                    'date_of_birth': date_of_birth,
+                    'biography': f'Generation {generation} of the {surname} family.',
+                    'picture_url': None,
+                }
+
+    def generate(self, generations, branching, max_members):
+        """
+        Add the members of the tree, one bulk insert per generation.
+
+        Args:
+            generations (int): The number of generations after the founders.
+            branching (int): The number of children of each couple.
+            max_members (int): The maximum number of members in the tree.
+
+        Returns:
+            int: The number of members added.
+        """
+        surname = self.rng.choice(SURNAMES)
+        founders = [self.person('Male', surname, 0), self.person('Female', self.rng.choice(SURNAMES), 0)]
+        father_id, mother_id = FamilyMember.add_members(self.tree_id, founders)
+        count = 2
+
+        """ (father ID, mother ID, surname) of the couples of the last generation """
+        couples = [(father_id, mother_id, surname)]
+        for generation in range(1, generations + 1):
+            batch = []
+            children = []
+            for father_id, mother_id, family_surname in couples:
+                for _ in range(branching):
+                    if count + len(batch) + 2 > max_members:
+                        break
+                    gender = self.rng.choice(['Male', 'Female'])
+                    child = self.person(gender, family_surname, generation)
+                    child.update(father_id=father_id, mother_id=mother_id)
+                    children.append((len(batch), gender, family_surname))
+                    batch.append(child)
+
+            if not batch:
+                break
+
+            """ Children who will have children of their own marry into the tree """
+            marriages = []
+            if generation < generations:
+                for child_index, gender, family_surname in children:
+                    if gender == 'Male':
+                        batch.append(self.person('Female', self.rng.choice(SURNAMES), generation))
+                    else:
+                        family_surname = self.rng.choice(SURNAMES)
+                        batch.append(self.person('Male', family_surname, generation))
+                    marriages.append((child_index, len(batch) - 1, gender, family_surname))
+
+            member_ids = FamilyMember.add_members(self.tree_id, batch)
+            count += len(batch)
+
+            couples = []
+            for child_index, spouse_index, gender, family_surname in marriages:
+                child_id, spouse_id = member_ids[child_index], member_ids[spouse_index]
+                if gender == 'Male':
+                    couples.append((child_id, spouse_id, family_surname))
+                else:
+                    couples.append((spouse_id, child_id, family_surname))
+
+        return count
+
+
+def generate_dataset(users, trees_per_user, generations, branching, max_members, seed=42):
+    """
+    Create synthetic users, family trees and members through the models.
+
+    Must run inside an application context.
+
+    Args:
+        users (int): The number of users.
+        trees_per_user (int): The number of family trees of each user.
+        generations (int): The number of generations after the founders of each tree.
+        branching (int): The number of children of each couple.
+        max_members (int): The maximum number of members in each tree.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        list: One dict per user with 'email', 'password' and 'tree_ids' keys.
+    """
+    rng = random.Random(seed)
+    dataset = []
+    for user_number in range(1, users + 1):
+        email = f'benchmark{user_number}@example.com'
+        User.register_user(email, BENCHMARK_PASSWORD)
+        user = User.get_user_by_email(email)
+
+        tree_ids = []
+        for tree_number in range(1, trees_per_user + 1):
+            name = f'Benchmark Tree {user_number}.{tree_number}'
+            FamilyTree.create_family_tree(name, f'Synthetic tree {tree_number} of user {user_number}', user.id)
+            tree = FamilyTree.query.filter_by(user_id=user.id, name=name).first()
+            TreeGenerator(tree.id, rng).generate(generations, branching, max_members)
+            tree_ids.append(tree.id)
+
+        dataset.append({'email': email, 'password': BENCHMARK_PASSWORD, 'tree_ids': tree_ids})
+    return dataset
+
+
+class BenchmarkConfig:
+    """
+    Configuration of the application under benchmark; set the database URI before use.
+    """
+    SECRET_KEY = 'benchmark'
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQLALCHEMY_DATABASE_URI = 'sqlite:///benchmark.db'
+    SLOW_QUERY_THRESHOLD_MS = None
+
+
+def add_dataset_arguments(parser):
+    """
+    Add the dataset and database options to an argument parser.
+
+    Args:
+        parser (ArgumentParser): The parser.
+    """
+    parser.add_argument('--database-uri', default='sqlite:///benchmark.db')
+    parser.add_argument('--users', type=int, default=2)
+    parser.add_argument('--trees-per-user', type=int, default=2)
+    parser.add_argument('--generations', type=int, default=7)
+    parser.add_argument('--branching', type=int, default=3)
+    parser.add_argument('--members-per-tree', type=int, default=5000)
+    parser.add_argument('--seed', type=int, default=42)
+
+
+def create_benchmark_app(database_uri):
+    """
+    Create the application against the benchmark database.
+
+    Args:
+        database_uri (str): The SQLAlchemy URI of the benchmark database.
+
+    Returns:
+        Flask: The application.
+    """
+    config = type('BenchmarkConfig', (BenchmarkConfig,), {'SQLALCHEMY_DATABASE_URI': database_uri})
+    return create_app(config)
+
+
+def build(app, args):
+    """
+    Recreate the schema of the benchmark database and fill it.
+
+    Args:
+        app (Flask): The application.
+        args (Namespace): The parsed dataset options.
+
+    Returns:
+        list: The generated users, as returned by generate_dataset.
+    """
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        start = time.perf_counter()
+        dataset = generate_dataset(
+            args.users, args.trees_per_user, args.generations, args.branching, args.members_per_tree, args.seed
+        )
+        members = FamilyMember.query.count()
+        print(f'Generated {members} members in {args.users * args.trees_per_user} trees '
+              f'in {time.perf_counter() - start:.1f}s')
+    return dataset
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser)
+    args = parser.parse_args()
+    build(create_benchmark_app(args.database_uri), args)
+
+
+if __name__ == '__main__':
+    main()
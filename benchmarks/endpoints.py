@@ -0,0 +1,409 @@
+""" benchmarks/endpoints.py """
+"""
+Benchmark every route of the application on a synthetic dataset.
+
+Recreates the benchmark database, fills it with benchmarks.dataset, then
+drives each route through the Flask test client and reports, per route,
+the throughput, latency percentiles and SQL statements per request (from
+the X-DB-Query-Count header). Write routes work on scratch members and
+trees, so the generated trees stay the same size for the whole run.
+
+A run can be saved as a JSON baseline and later runs compared with it;
+the comparison exits with status 1 when the median latency of a route
+grew by more than --max-regression.
+
+Usage:
+    python -m benchmarks.endpoints --database-uri sqlite:///benchmark.db --iterations 50 --save-baseline baseline.json
+    python -m benchmarks.endpoints --database-uri sqlite:///benchmark.db --iterations 50 --compare baseline.json
+"""
+
+import argparse
+from datetime import date, timedelta
+import json
+import random
+import statistics
+import sys
+import time
+from sqlalchemy import select
+from app import db
+from app.models import FamilyMember
+from benchmarks.dataset import add_dataset_arguments, build, create_benchmark_app
+
+""" Number of members in each bulk insert request """
+BULK_BATCH_SIZE = 50
+
+""" Status codes of responses timed apart from the full responses of their route """
+MARKED_STATUSES = (202, 304)
+
+""" Routes not driven by the benchmark """
+SKIPPED_ENDPOINTS = {'static'}
+
+
+class EndpointBenchmark:
+    """
+    Runner timing requests to the application by route.
+
+    Attributes:
+        app (Flask): The application.
+        samples (dict): Route label -> list of (latency in seconds, SQL statement count).
+        errors (dict): Route label -> number of unexpected status codes.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        self.adapter = app.url_map.bind('localhost')
+        self.samples = {}
+        self.errors = {}
+
+    def label(self, method, path, status):
+        """
+        Name the route a request was sent to.
+
+        Args:
+            method (str): The HTTP method.
+            path (str): The request path, without the query string.
+            status (int): The response status code.
+
+        Returns:
+            str: The method and URL rule, marked when the response was a 202 or a 304.
+        """
+        rule, _ = self.adapter.match(path, method=method, return_rule=True)
+        label = f'{method} {rule.rule}'
+        return f'{label} ({status})' if status in MARKED_STATUSES else label
+
+    def request(self, client, method, path, expected=(200,), **kwargs):
+        """
+        Send a timed request.
+
+        Args:
+            client (FlaskClient): The logged-in test client.
+            method (str): The HTTP method.
+            path (str): The request path, without the query string.
+            expected (tuple): The status codes counted as a success.
+            **kwargs: Arguments for the test client, e.g. json, query_string or headers.
+
+        Returns:
+            TestResponse: The response.
+        """
+        start = time.perf_counter()
+        response = client.open(path, method=method, **kwargs)
+        elapsed = time.perf_counter() - start
+
+        label = self.label(method, path, response.status_code)
+        queries = response.headers.get('X-DB-Query-Count')
+        self.samples.setdefault(label, []).append((elapsed, int(queries) if queries is not None else None))
+        if response.status_code not in expected:
+            self.errors[label] = self.errors.get(label, 0) + 1
+        return response
+
+    def unexercised(self):
+        """
+        List the routes of the application no request was sent to.
+
+        Returns:
+            list: 'METHOD rule' of each route without samples.
+        """
+        exercised = {label.split(' (')[0] for label in self.samples}
+        routes = []
+        for rule in self.app.url_map.iter_rules():
+            if rule.endpoint in SKIPPED_ENDPOINTS:
+                continue
+            for method in sorted(rule.methods - {'HEAD', 'OPTIONS'}):
+                if f'{method} {rule.rule}' not in exercised:
+                    routes.append(f'{method} {rule.rule}')
+        return routes
+
+    def results(self):
+        """
+        Summarize the samples of each route.
+
+        Returns:
+            dict: Route label -> count, errors, throughput, mean, p50, p90 and p99 in
+                milliseconds, and mean SQL statements per request.
+        """
+        results = {}
+        for label, samples in sorted(self.samples.items()):
+            latencies = [elapsed * 1000 for elapsed, _ in samples]
+            queries = [count for _, count in samples if count is not None]
+            if len(latencies) > 1:
+                percentiles = statistics.quantiles(latencies, n=100, method='inclusive')
+                p50, p90, p99 = percentiles[49], percentiles[89], percentiles[98]
+            else:
+                p50 = p90 = p99 = latencies[0]
+            results[label] = {
+                'count': len(latencies),
+                'errors': self.errors.get(label, 0),
+                'requests_per_second': len(latencies) / (sum(latencies) / 1000),
+                'mean_ms': statistics.fmean(latencies),
+                'p50_ms': p50,
+                'p90_ms': p90,
+                'p99_ms': p99,
+                'queries_per_request': statistics.fmean(queries) if queries else None,
+            }
+        return results
+
+
+def sample_members(app, tree_ids, rng):
+    """
+    Pick the members the read routes are called for.
+
+    Args:
+        app (Flask): The application.
+        tree_ids (list): The IDs of the generated family trees.
+        rng (Random): The random number generator.
+
+    Returns:
+        dict: Tree ID -> 'members' (a random sample of member IDs), 'founder'
+            (the first member), 'surnames' (surnames in the tree) and 'size'.
+    """
+    table = FamilyMember.__table__
+    samples = {}
+    with app.app_context():
+        for tree_id in tree_ids:
+            member_ids = list(db.session.execute(
+                select(table.c.id).where(table.c.tree_id == tree_id).order_by(table.c.id)
+            ).scalars())
+            names = db.session.execute(
+                select(table.c.name).where(table.c.tree_id == tree_id).limit(200)
+            ).scalars()
+            samples[tree_id] = {
+                'members': rng.sample(member_ids, min(len(member_ids), 200)),
+                'founder': member_ids[0],
+                'surnames': sorted({name.rsplit(' ', 1)[-1] for name in names}),
+                'size': len(member_ids),
+            }
+    return samples
+
+
+def scratch_member(number):
+    """
+    Build the payload of a scratch family member.
+
+    Args:
+        number (int): A number unique to the member.
+
+    Returns:
+        dict: The member fields.
+    """
+    return {
+        'name': f'Scratch Member {number}',
+        'gender': 'Male' if number % 2 else 'Female',
+        'date_of_birth': (date(1900, 1, 1) + timedelta(days=number)).isoformat(),
+        'biography': f'Scratch member {number}.',
+        'picture_url': None,
+    }
+
+
+def tree_id_by_name(client, name):
+    """
+    Look up the ID of a family tree of the logged-in user by name, without timing it.
+
+    Args:
+        client (FlaskClient): The logged-in test client.
+        name (str): The name of the family tree.
+
+    Returns:
+        int: The ID of the family tree.
+    """
+    trees = client.get('/api/family-trees').json['family_trees']
+    return next(tree['id'] for tree in trees if tree['name'] == name)
+
+
+def run(app, dataset, iterations, seed):
+    """
+    Send every benchmarked request the given number of times.
+
+    Args:
+        app (Flask): The application.
+        dataset (list): The generated users, as returned by generate_dataset.
+        iterations (int): The number of rounds of requests.
+        seed (int): The seed of the random number generator.
+
+    Returns:
+        EndpointBenchmark: The runner holding the samples.
+    """
+    rng = random.Random(seed)
+    benchmark = EndpointBenchmark(app)
+    clients = []
+    for user in dataset:
+        client = app.test_client()
+        client.post('/api/login', json={'email': user['email'], 'password': user['password']})
+        scratch_name = f"Scratch Tree of {user['email']}"
+        client.post('/api/family-trees', json={'name': scratch_name, 'description': 'Bulk insert target'})
+        clients.append((client, user, tree_id_by_name(client, scratch_name)))
+
+    members = sample_members(app, [tree_id for user in dataset for tree_id in user['tree_ids']], rng)
+
+    """ GEDCOM import input, exported once from the smallest generated tree """
+    smallest_tree_id = min(members, key=lambda tree_id: members[tree_id]['size'])
+    gedcom = clients[0][0].get(f'/api/family-trees/{smallest_tree_id}/gedcom').get_data()
+
+    request = benchmark.request
+    for iteration in range(iterations):
+        client, user, scratch_tree_id = clients[iteration % len(clients)]
+        tree_id = rng.choice(user['tree_ids'])
+        tree = members[tree_id]
+        member_id = rng.choice(tree['members'])
+        base = f'/api/family-trees/{tree_id}'
+
+        """ Reads """
+        request(client, 'GET', '/api/family-trees')
+        request(client, 'GET', '/api/family-trees/summary')
+        response = request(client, 'GET', base)
+        request(client, 'GET', base, expected=(304,), headers={'If-None-Match': response.headers.get('ETag', '')})
+        request(client, 'GET', f'{base}/members', query_string={'limit': 100})
+        request(client, 'GET', f'{base}/members', query_string={
+            'cursor': member_id, 'limit': 100, 'fields': 'name,gender,date_of_birth'
+        })
+        request(client, 'GET', f'{base}/graph')
+        request(client, 'GET', f'{base}/stats')
+        response = request(client, 'GET', f'{base}/changes', query_string={'limit': 100})
+        request(client, 'GET', f'{base}/changes', query_string={'since': response.json.get('next_since', '0'), 'limit': 100})
+        request(client, 'GET', f'{base}/gedcom')
+        request(client, 'GET', f'{base}/members/{member_id}')
+        request(client, 'GET', f'{base}/members/{member_id}/siblings')
+        request(client, 'GET', f'{base}/members/{member_id}/parents')
+        request(client, 'GET', f'{base}/members/{member_id}/ancestors')
+        request(client, 'GET', f"{base}/members/{tree['founder']}/descendants")
+        request(client, 'GET', f'{base}/relationship', query_string={
+            'a': member_id, 'b': rng.choice(tree['members'])
+        })
+        request(client, 'GET', '/api/family-trees/members/search', query_string={'q': rng.choice(tree['surnames'])})
+        request(client, 'GET', '/metrics')
+
+        """ Background GEDCOM export, polled until done """
+        response = request(client, 'GET', f'{base}/gedcom', expected=(202,), headers={'Prefer': 'respond-async'})
+        job = response.json['job']
+        while job['status'] not in ('succeeded', 'failed'):
+            time.sleep(0.01)
+            job = request(client, 'GET', job['status_url']).json['job']
+        if job['result_url']:
+            request(client, 'GET', job['result_url']).close()
+
+        """ Member writes, on a scratch member of a generated tree """
+        number = iteration * (BULK_BATCH_SIZE + 1)
+        response = request(client, 'POST', f'{base}/members', expected=(201,), json=scratch_member(number))
+        scratch_member_id = response.json.get('member_id')
+        request(client, 'PUT', f'{base}/members/{scratch_member_id}', json={
+            **scratch_member(number), 'biography': 'Updated scratch member.'
+        })
+        request(client, 'PATCH', f'{base}/members/{scratch_member_id}', json={'biography': 'Patched scratch member.'})
+        request(client, 'DELETE', f'{base}/members/{scratch_member_id}')
+
+        """ Bulk insert of a couple and their children into the scratch tree """
+        batch = [{**scratch_member(number + 1 + index), 'ref': str(index)} for index in range(BULK_BATCH_SIZE)]
+        batch[0]['gender'], batch[1]['gender'] = 'Male', 'Female'
+        for member in batch[2:]:
+            member.update(father_ref='0', mother_ref='1')
+        request(client, 'POST', f'/api/family-trees/{scratch_tree_id}/members/bulk', expected=(201,), json={
+            'members': batch
+        })
+
+        """ Tree writes and GEDCOM import, on a scratch tree """
+        name = f'Scratch Import {iteration}'
+        request(client, 'POST', '/api/family-trees', expected=(201,), json={'name': name, 'description': 'Scratch'})
+        import_tree_id = tree_id_by_name(client, name)
+        request(client, 'PUT', f'/api/family-trees/{import_tree_id}', json={
+            'name': name, 'description': 'Updated scratch tree'
+        })
+        request(client, 'POST', f'/api/family-trees/{import_tree_id}/gedcom', expected=(201,), data=gedcom)
+        request(client, 'DELETE', f'/api/family-trees/{import_tree_id}')
+
+        """ Account routes, on a client of their own """
+        account = app.test_client()
+        credentials = {'email': f'scratch{iteration}@example.com', 'password': 'benchmark-password'}
+        request(account, 'POST', '/api/register', expected=(201,), json=credentials)
+        request(account, 'POST', '/api/login', json=credentials)
+        request(account, 'POST', '/api/logout')
+
+    return benchmark
+
+
+def print_results(results):
+    """
+    Print the summary of each route as a table.
+
+    Args:
+        results (dict): The results, as returned by EndpointBenchmark.results.
+    """
+    width = max(len(label) for label in results)
+    print(f"{'route':<{width}} {'count':>6} {'errors':>6} {'req/s':>8} {'mean ms':>8} "
+          f"{'p50 ms':>8} {'p90 ms':>8} {'p99 ms':>8} {'queries':>7}")
+    for label, result in results.items():
+        queries = result['queries_per_request']
+        print(f"{label:<{width}} {result['count']:>6} {result['errors']:>6} "
+              f"{result['requests_per_second']:>8.1f} {result['mean_ms']:>8.2f} {result['p50_ms']:>8.2f} "
+              f"{result['p90_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+              f"{'-' if queries is None else f'{queries:.1f}':>7}")
+
+
+def compare(results, baseline, max_regression):
+    """
+    Compare the median latencies of a run with a baseline.
+
+    Args:
+        results (dict): The results of this run.
+        baseline (dict): The results of the baseline run.
+        max_regression (float): The largest accepted relative growth of the median latency.
+
+    Returns:
+        list: The labels of the routes that regressed.
+    """
+    regressions = []
+    width = max(len(label) for label in results)
+    print(f"\n{'route':<{width}} {'base p50':>9} {'p50':>9} {'change':>8}")
+    for label, result in results.items():
+        if label not in baseline:
+            continue
+        before, after = baseline[label]['p50_ms'], result['p50_ms']
+        change = (after - before) / before if before else 0.0
+        marker = ' REGRESSION' if change > max_regression else ''
+        print(f'{label:<{width}} {before:>9.2f} {after:>9.2f} {change:>+8.1%}{marker}')
+        if marker:
+            regressions.append(label)
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    add_dataset_arguments(parser)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--max-regression', type=float, default=0.2)
+    args = parser.parse_args()
+
+    app = create_benchmark_app(args.database_uri)
+    dataset = build(app, args)
+
+    benchmark = run(app, dataset, args.iterations, args.seed)
+    results = benchmark.results()
+    print_results(results)
+
+    missing = benchmark.unexercised()
+    if missing:
+        print('\nRoutes not exercised: ' + ', '.join(missing))
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as baseline_file:
+            json.dump({
+                'dataset': {
+                    key: getattr(args, key)
+                    for key in ('users', 'trees_per_user', 'generations', 'branching', 'members_per_tree', 'seed')
+                },
+                'iterations': args.iterations,
+                'results': results,
+            }, baseline_file, indent=2)
+        print(f'\nBaseline saved to {args.save_baseline}')
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            baseline = json.load(baseline_file)
+        regressions = compare(results, baseline['results'], args.max_regression)
+        if regressions:
+            print(f'\n{len(regressions)} route(s) regressed by more than {args.max_regression:.0%}')
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,254 @@
+""" benchmarks/indexes.py """
+"""
+Benchmark the hot query patterns with and without the composite indexes.
+
+Builds a synthetic dataset (1M family members by default) with the
+application's table definitions, drops the indexes added by the
+'Add indexes for hot query patterns' migration, times each query, then
+creates the indexes and times the queries again.
+
+Usage:
+    python -m benchmarks.indexes --database-uri sqlite:///index_benchmark.db
+"""
+
+import argparse
+from datetime import date, timedelta
+import random
+import statistics
+import time
+from sqlalchemy import Index, create_engine, func, select
+from app import db
+from app.models import FamilyMember, FamilyTree, User
+
+""" Indexes added by the migration, by table """
+BENCHMARKED_INDEXES = {
+    'family_tree': ['ix_family_tree_user_id_name'],
+    'family_member': [
+        'ix_family_member_tree_id_id',
+        'ix_family_member_tree_id_name',
+        'ix_family_member_father_id',
+        'ix_family_member_mother_id',
+    ],
+}
+
+""" Foreign key columns left unindexed on MySQL once the benchmarked indexes are dropped """
+FOREIGN_KEY_COLUMNS = [
+    ('family_tree', 'user_id'),
+    ('family_member', 'tree_id'),
+    ('family_member', 'father_id'),
+    ('family_member', 'mother_id'),
+]
+
+FIRST_NAMES = ['Tendai', 'Rudo', 'Tatenda', 'Chipo', 'Farai', 'Nyasha', 'Tafadzwa', 'Kuda', 'Tsitsi', 'Simba',
+               'John', 'Mary', 'Peter', 'Grace', 'David', 'Ruth', 'Paul', 'Esther', 'James', 'Sarah']
+SURNAMES = ['Moyo', 'Ncube', 'Sibanda', 'Dube', 'Ndlovu', 'Mpofu', 'Nyathi', 'Mhlanga', 'Chikore', 'Mutasa',
+            'Banda', 'Phiri', 'Zulu', 'Khumalo', 'Shumba', 'Gumbo', 'Marufu', 'Mapfumo', 'Chiweshe', 'Makoni']
+
+BATCH_SIZE = 10000
+
+
+def populate(engine, users, trees_per_user, members):
+    """
+    Fill an empty schema with synthetic users, trees and members.
+
+    Members are spread evenly over the trees. Each member after the first
+    few in a tree gets a father and a mother chosen among earlier members
+    of the same tree, so parent links point backwards like real pedigrees.
+
+    Args:
+        engine (Engine): The engine of the benchmark database.
+        users (int): The number of users.
+        trees_per_user (int): The number of family trees of each user.
+        members (int): The total number of family members.
+    """
+    rng = random.Random(42)
+    tree_count = users * trees_per_user
+    per_tree = max(1, members // tree_count)
+
+    with engine.begin() as connection:
+        connection.execute(User.__table__.insert(), [
+            {'id': user_id, 'email': f'user{user_id}@example.com', 'password': 'x'}
+            for user_id in range(1, users + 1)
+        ])
+        connection.execute(FamilyTree.__table__.insert(), [
+            {'id': tree_id, 'name': f'Tree {tree_id}', 'description': None,
+             'user_id': (tree_id - 1) // trees_per_user + 1}
+            for tree_id in range(1, tree_count + 1)
+        ])
+
+    member_id = 0
+    rows = []
+    for tree_id in range(1, tree_count + 1):
+        first_id = member_id + 1
+        for position in range(per_tree):
+            member_id += 1
+            father_id = mother_id = None
+            if position >= 10:
+                father_id = rng.randrange(first_id, member_id)
+                mother_id = rng.randrange(first_id, member_id)
+            rows.append({
+                'id': member_id,
+                'name': f'{rng.choice(FIRST_NAMES)} {rng.choice(SURNAMES)}',
+                'gender': rng.choice(['Male', 'Female']),
+                'date_of_birth': date(1800, 1, 1) + timedelta(days=rng.randrange(80000)),
+                'biography': None,
+                'picture_url': None,
+                'tree_id': tree_id,
+                'father_id': father_id,
+                'mother_id': mother_id,
+            })
+            if len(rows) >= BATCH_SIZE:
+                with engine.begin() as connection:
+                    connection.execute(FamilyMember.__table__.insert(), rows)
+                rows = []
+
+    if rows:
+        with engine.begin() as connection:
+            connection.execute(FamilyMember.__table__.insert(), rows)
+
+
+def sample_queries(engine, samples):
+    """
+    Build the benchmarked queries with parameters sampled from the dataset.
+
+    Args:
+        engine (Engine): The engine of the benchmark database.
+        samples (int): The number of parameter sets per query.
+
+    Returns:
+        dict: Query label -> list of statements.
+    """
+    members = FamilyMember.__table__
+    trees = FamilyTree.__table__
+
+    with engine.connect() as connection:
+        max_id = connection.execute(select(func.max(members.c.id))).scalar()
+        rng = random.Random(7)
+        rows = [
+            connection.execute(select(members).where(members.c.id == rng.randint(1, max_id))).first()
+            for _ in range(samples)
+        ]
+        tree_rows = [
+            connection.execute(select(trees).where(trees.c.id == row.tree_id)).first()
+            for row in rows
+        ]
+
+    return {
+        'duplicate check (tree_id, name, gender, date_of_birth)': [
+            select(members.c.id).where(
+                members.c.tree_id == row.tree_id, members.c.name == row.name,
+                members.c.gender == row.gender, members.c.date_of_birth == row.date_of_birth
+            ).limit(1)
+            for row in rows
+        ],
+        'parent by name (tree_id, name)': [
+            select(members.c.id).where(members.c.tree_id == row.tree_id, members.c.name == row.name).limit(1)
+            for row in rows
+        ],
+        'children by father_id': [
+            select(members.c.id).where(members.c.father_id == row.id) for row in rows
+        ],
+        'children by mother_id': [
+            select(members.c.id).where(members.c.mother_id == row.id) for row in rows
+        ],
+        'member page (tree_id, id > cursor)': [
+            select(members).where(members.c.tree_id == row.tree_id, members.c.id > row.id)
+            .order_by(members.c.id).limit(100)
+            for row in rows
+        ],
+        'tree by name (user_id, name)': [
+            select(trees.c.id).where(trees.c.user_id == tree.user_id, trees.c.name == tree.name).limit(1)
+            for tree in tree_rows
+        ],
+    }
+
+
+def time_queries(engine, queries, repeat):
+    """
+    Time each query label over its statements.
+
+    Args:
+        engine (Engine): The engine of the benchmark database.
+        queries (dict): Query label -> list of statements.
+        repeat (int): The number of times each statement is run.
+
+    Returns:
+        dict: Query label -> median milliseconds per statement.
+    """
+    timings = {}
+    with engine.connect() as connection:
+        for label, statements in queries.items():
+            durations = []
+            for statement in statements:
+                for _ in range(repeat):
+                    start = time.perf_counter()
+                    connection.execute(statement).fetchall()
+                    durations.append((time.perf_counter() - start) * 1000)
+            timings[label] = statistics.median(durations)
+    return timings
+
+
+def set_indexes(engine, present):
+    """
+    Create or drop the benchmarked indexes.
+
+    Args:
+        engine (Engine): The engine of the benchmark database.
+        present (bool): Create the indexes if True, else drop them.
+    """
+    if not present and engine.dialect.name == 'mysql':
+        """ MySQL needs an index on every foreign key column, as in the migration downgrade """
+        for table_name, column_name in FOREIGN_KEY_COLUMNS:
+            Index(column_name, db.metadata.tables[table_name].c[column_name]).create(engine, checkfirst=True)
+
+    for table_name, index_names in BENCHMARKED_INDEXES.items():
+        table = db.metadata.tables[table_name]
+        for index in table.indexes:
+            if index.name in index_names:
+                if present:
+                    index.create(engine, checkfirst=True)
+                else:
+                    index.drop(engine, checkfirst=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--database-uri', default='sqlite:///index_benchmark.db')
+    parser.add_argument('--users', type=int, default=100)
+    parser.add_argument('--trees-per-user', type=int, default=10)
+    parser.add_argument('--members', type=int, default=1000000)
+    parser.add_argument('--samples', type=int, default=50)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--reuse', action='store_true', help='Reuse an already populated database.')
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_uri)
+    tables = [User.__table__, FamilyTree.__table__, FamilyMember.__table__]
+
+    if not args.reuse:
+        db.metadata.drop_all(engine, tables=tables)
+        db.metadata.create_all(engine, tables=tables)
+        set_indexes(engine, present=False)
+        start = time.perf_counter()
+        populate(engine, args.users, args.trees_per_user, args.members)
+        print(f'Populated {args.members} members in {time.perf_counter() - start:.1f}s')
+
+    queries = sample_queries(engine, args.samples)
+
+    set_indexes(engine, present=False)
+    before = time_queries(engine, queries, args.repeat)
+
+    start = time.perf_counter()
+    set_indexes(engine, present=True)
+    print(f'Created indexes in {time.perf_counter() - start:.1f}s')
+    after = time_queries(engine, queries, args.repeat)
+
+    width = max(len(label) for label in queries)
+    print(f"{'query':<{width}}  {'before ms':>10}  {'after ms':>10}  {'speedup':>8}")
+    for label in queries:
+        speedup = before[label] / after[label] if after[label] else float('inf')
+        print(f'{label:<{width}}  {before[label]:>10.3f}  {after[label]:>10.3f}  {speedup:>7.1f}x')
+
+
+if __name__ == '__main__':
+    main()
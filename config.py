@@ -4,6 +4,17 @@ import os
 class Config:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'passkey')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SQL_INSTRUMENTATION_HEADERS = True
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 200))
+    METRICS_DIR = os.environ.get('METRICS_DIR')
+    SQLALCHEMY_REPLICA_URI = os.environ.get('SQLALCHEMY_REPLICA_URI')
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 2))
+    JOB_RESULTS_DIR = os.environ.get('JOB_RESULTS_DIR')
+    STATS_CACHE_SIZE = int(os.environ.get('STATS_CACHE_SIZE', 1000))
+    KINSHIP_CACHE_SIZE = int(os.environ.get('KINSHIP_CACHE_SIZE', 100))
+    EVENTS_BROKER = os.environ.get('EVENTS_BROKER', 'app.utils.events.LocalBroker')
+    EVENTS_HEARTBEAT_SECONDS = float(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1))
 
 class TestConfig:
     SECRET_KEY = os.environ.get('SECRET_KEY', 'passkey')
@@ -21,9 +32,28 @@ class DevelopmentConfig(Config):
 class ProductionConfig(Config):
     SECRET_KEY = os.environ.get('SECRET_KEY', 'passkey')
     DEBUG = False
+    SQL_INSTRUMENTATION_HEADERS = False
     SQLALCHEMY_DATABASE_URI = (
         f"mysql://{os.environ.get('DB_USER')}:{os.environ.get('DB_PASSWORD')}@"
         f"{os.environ.get('DB_HOST')}/{os.environ.get('DB_NAME')}"
     )
     pass
 
+class SqliteConfig(Config):
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'passkey')
+    DEBUG = False
+    SQL_INSTRUMENTATION_HEADERS = False
+    SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.environ.get('SQLITE_PATH', 'dzinza.db')}"
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        'connect_args': {'timeout': float(os.environ.get('SQLITE_BUSY_TIMEOUT', 30))},
+        'pool_size': int(os.environ.get('SQLITE_POOL_SIZE', 10)),
+    }
+    SQLITE_PRAGMAS = {
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        'foreign_keys': True,
+        'mmap_size': int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024)),
+        'cache_size': -int(os.environ.get('SQLITE_CACHE_SIZE_KB', 64 * 1024)),
+        'temp_store': 'MEMORY',
+    }
+
@@ -0,0 +1,85 @@
+"""Key member tombstones by their own ID and never reuse member IDs
+
+Revision ID: 459f80bd4f92
+Revises: 8ea143e97bbf
+Create Date: 2026-10-18 18:12:05.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '459f80bd4f92'
+down_revision = '8ea143e97bbf'
+branch_labels = None
+depends_on = None
+
+
+def rebuild_family_member(autoincrement):
+    # SQLite only takes AUTOINCREMENT when a table is created, so the table
+    # is copied; env.py turns foreign key enforcement off meanwhile.
+    with op.batch_alter_table(
+        'family_member', recreate='always', table_kwargs={'sqlite_autoincrement': autoincrement}
+    ) as batch_op:
+        pass
+
+
+def upgrade():
+    op.create_table('member_tombstone_new',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('member_id', sa.Integer(), nullable=False),
+    sa.Column('tree_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['tree_id'], ['family_tree.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    bind = op.get_bind()
+    bind.execute(sa.text(
+        'INSERT INTO member_tombstone_new (member_id, tree_id, change_seq, deleted_at) '
+        'SELECT member_id, tree_id, change_seq, deleted_at FROM member_tombstone ORDER BY change_seq, member_id'
+    ))
+    op.drop_table('member_tombstone')
+    op.rename_table('member_tombstone_new', 'member_tombstone')
+    with op.batch_alter_table('member_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_member_tombstone_tree_id_change_seq', ['tree_id', 'change_seq', 'member_id'], unique=False)
+
+    # MySQL does not hand out AUTO_INCREMENT values again; SQLite reuses the
+    # highest rowid once it is deleted unless the table is AUTOINCREMENT.
+    if bind.dialect.name == 'sqlite':
+        rebuild_family_member(True)
+        # IDs already deleted before this migration are not handed out either
+        bind.execute(sa.text(
+            "INSERT INTO sqlite_sequence (name, seq) SELECT 'family_member', 0 "
+            "WHERE NOT EXISTS (SELECT 1 FROM sqlite_sequence WHERE name = 'family_member')"
+        ))
+        bind.execute(sa.text(
+            "UPDATE sqlite_sequence SET seq = MAX(seq, "
+            "(SELECT COALESCE(MAX(member_id), 0) FROM member_tombstone)) WHERE name = 'family_member'"
+        ))
+
+
+def downgrade():
+    bind = op.get_bind()
+    if bind.dialect.name == 'sqlite':
+        rebuild_family_member(False)
+
+    # Only the last deletion of a reused member ID is kept
+    op.create_table('member_tombstone_old',
+    sa.Column('member_id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('tree_id', sa.Integer(), nullable=False),
+    sa.Column('change_seq', sa.Integer(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['tree_id'], ['family_tree.id'], ),
+    sa.PrimaryKeyConstraint('member_id')
+    )
+    bind.execute(sa.text(
+        'INSERT INTO member_tombstone_old (member_id, tree_id, change_seq, deleted_at) '
+        'SELECT member_id, tree_id, change_seq, deleted_at FROM member_tombstone AS tombstone '
+        'WHERE id = (SELECT MAX(id) FROM member_tombstone WHERE member_id = tombstone.member_id)'
+    ))
+    op.drop_table('member_tombstone')
+    op.rename_table('member_tombstone_old', 'member_tombstone')
+    with op.batch_alter_table('member_tombstone', schema=None) as batch_op:
+        batch_op.create_index('ix_member_tombstone_tree_id_change_seq', ['tree_id', 'change_seq', 'member_id'], unique=False)
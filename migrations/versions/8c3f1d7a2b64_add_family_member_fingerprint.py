@@ -0,0 +1,94 @@
+"""Add family member fingerprint
+
+Revision ID: 8c3f1d7a2b64
+Revises: 5e2b8f41c7a9
+Create Date: 2026-10-18 15:02:41.774310
+
+"""
+import hashlib
+import logging
+import unicodedata
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8c3f1d7a2b64'
+down_revision = '5e2b8f41c7a9'
+branch_labels = None
+depends_on = None
+
+logger = logging.getLogger('alembic.runtime.migration')
+
+# Members backfilled per executemany update
+BACKFILL_BATCH_SIZE = 1000
+
+
+# The fingerprint as the application computed it when this revision was
+# written, copied so that later changes to app.utils.search do not change
+# what this migration backfills.
+def normalize_name(name):
+    decomposed = unicodedata.normalize('NFKD', name or '')
+    stripped = ''.join(char for char in decomposed if not unicodedata.combining(char))
+    return ' '.join(stripped.casefold().split())
+
+
+def member_fingerprint(name, gender, date_of_birth):
+    birth = date_of_birth.isoformat() if hasattr(date_of_birth, 'isoformat') else str(date_of_birth)
+    key = '\x1f'.join((normalize_name(name), ' '.join((gender or '').casefold().split()), birth))
+    return hashlib.sha256(key.encode('utf-8')).hexdigest()
+
+
+def upgrade():
+    with op.batch_alter_table('family_member', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('fingerprint', sa.String(length=64), nullable=True))
+
+    # Backfill one tree at a time, in member ID order. Rows duplicating an
+    # earlier member of their tree keep a NULL fingerprint, which the unique
+    # index allows, and are logged for review.
+    bind = op.get_bind()
+    member = sa.table(
+        'family_member',
+        sa.column('id'), sa.column('tree_id'), sa.column('name'), sa.column('gender'),
+        sa.column('date_of_birth', sa.Date()), sa.column('fingerprint'),
+    )
+    update = member.update().where(member.c.id == sa.bindparam('member_id')).values(
+        fingerprint=sa.bindparam('member_fingerprint')
+    )
+    tree_ids = bind.execute(sa.select(member.c.tree_id).distinct().order_by(member.c.tree_id)).scalars().all()
+    for tree_id in tree_ids:
+        seen = set()
+        after_id = 0
+        while True:
+            rows = bind.execute(
+                sa.select(member.c.id, member.c.name, member.c.gender, member.c.date_of_birth)
+                .where(member.c.tree_id == tree_id, member.c.id > after_id)
+                .order_by(member.c.id).limit(BACKFILL_BATCH_SIZE)
+            ).all()
+            if not rows:
+                break
+            values = []
+            for row in rows:
+                fingerprint = member_fingerprint(row.name, row.gender, row.date_of_birth)
+                if fingerprint in seen:
+                    logger.warning('family_member %s duplicates an earlier member of tree %s; '
+                                   'its fingerprint is left empty', row.id, tree_id)
+                    continue
+                seen.add(fingerprint)
+                values.append({'member_id': row.id, 'member_fingerprint': fingerprint})
+            if values:
+                bind.execute(update, values)
+            after_id = rows[-1].id
+
+    with op.batch_alter_table('family_member', schema=None) as batch_op:
+        batch_op.create_index('uq_family_member_tree_id_fingerprint', ['tree_id', 'fingerprint'], unique=True)
+
+
+def downgrade():
+    # ### commands auto generated by Alembic - please adjust! ###
+    with op.batch_alter_table('family_member', schema=None) as batch_op:
+        batch_op.drop_index('uq_family_member_tree_id_fingerprint')
+        batch_op.drop_column('fingerprint')
+
+    # ### end Alembic commands ###
@@ -0,0 +1,127 @@
+import tempfile
+import time
+import unittest
+from app import create_app, db
+from app.models import User, FamilyTree, FamilyMember
+
+
+class JobRoutesTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up the test environment.
+        - Create a test Flask app with a temporary job results directory.
+        - Create tables in the test database.
+        - Register and log in a user owning a family tree of three members.
+        """
+        self.app = create_app()
+        self.app.config.from_object('config.TestConfig')
+        self.results_dir = tempfile.TemporaryDirectory()
+        self.app.config['JOB_RESULTS_DIR'] = self.results_dir.name
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+
+            self.client.post('/api/register', json={'email': 'test5@example.com', 'password': 'password'})
+            user = User.query.filter_by(email='test5@example.com').first()
+
+            family_tree = FamilyTree(name='Test Tree', description='Test Description', user_id=user.id)
+            db.session.add(family_tree)
+            db.session.commit()
+            self.tree_id = family_tree.id
+
+        self.client.post('/api/login', json={'email': 'test5@example.com', 'password': 'password'})
+        self.client.post(f'/api/family-trees/{self.tree_id}/members/bulk', json={'members': [
+            {'ref': 'father', 'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01'},
+            {'ref': 'mother', 'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1962-05-15'},
+            {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '1990-02-01',
+             'father_ref': 'father', 'mother_ref': 'mother'},
+        ]})
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+        - Remove the database session.
+        - Drop all tables after each test.
+        - Delete the job results directory.
+        """
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+        self.results_dir.cleanup()
+
+    def wait_for_job(self, response):
+        """ Poll the job of a 202 response until it finishes """
+        self.assertEqual(response.status_code, 202)
+        status_url = response.headers['Location']
+        for _ in range(100):
+            job = self.client.get(status_url).json['job']
+            if job['status'] in ('succeeded', 'failed'):
+                return job
+            time.sleep(0.05)
+        self.fail('Job did not finish')
+
+    def test_delete_family_tree_job(self):
+        """
+        Test deleting a family tree in a background job.
+        """
+        response = self.client.delete(f'/api/family-trees/{self.tree_id}', headers={'Prefer': 'respond-async'})
+        self.assertEqual(response.json['job']['status_url'], response.headers['Location'])
+        self.assertEqual(self.client.get(f'/api/family-trees/{self.tree_id}').status_code, 404)
+
+        job = self.wait_for_job(response)
+        self.assertEqual((job['kind'], job['status'], job['progress']), ('delete_tree', 'succeeded', 100))
+        self.assertEqual(job['result'], {'members': 3})
+        self.assertIsNone(job['result_url'])
+
+        with self.app.app_context():
+            self.assertIsNone(db.session.get(FamilyTree, self.tree_id))
+            self.assertEqual(FamilyMember.query.count(), 0)
+
+    def test_gedcom_export_and_import_jobs(self):
+        """
+        Test exporting a family tree to a file and importing it in background jobs.
+        """
+        exported = self.client.get(f'/api/family-trees/{self.tree_id}/gedcom').get_data()
+
+        job = self.wait_for_job(self.client.get(
+            f'/api/family-trees/{self.tree_id}/gedcom', headers={'Prefer': 'respond-async'}
+        ))
+        self.assertEqual((job['status'], job['result']), ('succeeded', {'members': 3}))
+
+        response = self.client.get(job['result_url'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_data(), exported)
+        response.close()
+
+        self.client.post('/api/family-trees', json={'name': 'Copy', 'description': 'Imported'})
+        with self.app.app_context():
+            copy_id = FamilyTree.query.filter_by(name='Copy').first().id
+
+        job = self.wait_for_job(self.client.post(
+            f'/api/family-trees/{copy_id}/gedcom', data=exported, headers={'Prefer': 'respond-async'}
+        ))
+        self.assertEqual(job['status'], 'succeeded')
+        self.assertEqual(job['result'], {'imported': 3, 'merged': 0, 'skipped': 0, 'linked': 1})
+
+        with self.app.app_context():
+            jim = FamilyMember.query.filter_by(tree_id=copy_id, name='Jim Doe').first()
+            self.assertEqual(db.session.get(FamilyMember, jim.father_id).name, 'John Doe')
+
+    def test_get_job_of_another_user(self):
+        """
+        Test that users cannot see each other's jobs.
+        """
+        job = self.wait_for_job(self.client.get(
+            f'/api/family-trees/{self.tree_id}/gedcom', headers={'Prefer': 'respond-async'}
+        ))
+
+        other = self.app.test_client()
+        other.post('/api/register', json={'email': 'other@example.com', 'password': 'password'})
+        other.post('/api/login', json={'email': 'other@example.com', 'password': 'password'})
+        self.assertEqual(other.get(f"/api/jobs/{job['id']}").status_code, 404)
+        self.assertEqual(other.get(f"/api/jobs/{job['id']}/result").status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,8 @@
 import unittest
+from datetime import date
 from flask import session
 from app import create_app, db
-from app.models import User, FamilyTree, FamilyMember
+from app.models import User, FamilyTree, FamilyMember, TreeNotFoundError
 
 class FamilyMemberRoutesTestCase(unittest.TestCase):
     """
@@ -92,6 +93,90 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             response = self.client.post('/api/family-trees/1/members', json=data)
             self.assertEqual(response.status_code, 400)
 
+    def test_duplicate_members_rejected_by_fingerprint(self):
+        """
+        Test that duplicates differing only in case and spacing are rejected by the fingerprint index.
+        """
+        response = self.client.post('/api/family-trees/1/members', json={
+            'name': ' john  DOE', 'gender': 'male', 'date_of_birth': '1990-01-01'
+        })
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json['error'], 'Member already exists in the family tree.')
+
+        response = self.client.post('/api/family-trees/2/members', json={
+            'name': 'JOHN DOE', 'gender': 'Male', 'date_of_birth': '1990-01-01'
+        })
+        self.assertEqual(response.status_code, 400)
+
+        with self.app.app_context():
+            jane_id = FamilyMember.query.filter_by(name='Jane Doe', tree_id=1).first().id
+        response = self.client.patch(f'/api/family-trees/1/members/{jane_id}', json={
+            'name': 'John Doe', 'gender': 'MALE', 'date_of_birth': '1990-01-01'
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+            {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '2015-06-01'},
+            {'name': 'JIM DOE', 'gender': 'Male', 'date_of_birth': '2015-06-01'},
+        ]})
+        self.assertEqual(response.status_code, 400)
+
+        with self.app.app_context():
+            self.assertEqual(FamilyMember.query.filter_by(tree_id=1).count(), 2)
+            self.assertEqual(db.session.get(FamilyMember, jane_id).name, 'Jane Doe')
+
+    def test_add_family_members_bulk(self):
+        """
+        Test adding several family members at once, with parents in the payload and in the tree.
+        """
+        with self.app.test_request_context():
+            john_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+            response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                {'ref': 'child', 'name': 'Kid Doe', 'gender': 'Male', 'date_of_birth': '2040-01-01',
+                 'father_ref': 'father', 'mother_ref': 'mother'},
+                {'ref': 'father', 'name': 'Jack Doe', 'gender': 'Male', 'date_of_birth': '2015-01-01',
+                 'father_id': john_id},
+                {'ref': 'mother', 'name': 'Mary Roe', 'gender': 'Female', 'date_of_birth': '2016-01-01'},
+            ]})
+            self.assertEqual(response.status_code, 201)
+
+            child_id, father_id, mother_id = response.json.get('member_ids')
+            child = FamilyMember.query.filter_by(id=child_id, tree_id=1).first()
+            self.assertEqual(child.father_id, father_id)
+            self.assertEqual(child.mother_id, mother_id)
+            self.assertEqual(FamilyMember.query.get(father_id).father_id, john_id)
+
+    def test_add_family_members_bulk_invalid(self):
+        """
+        Test bulk adding members with bad references or duplicates, expecting nothing to be added.
+        """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                {'name': 'Kid Doe', 'gender': 'Male', 'date_of_birth': '2040-01-01', 'father_ref': 'nobody'},
+            ]})
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                {'name': 'Kid Doe', 'gender': 'Male', 'date_of_birth': '2040-01-01'},
+                {'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1990-01-01'},
+            ]})
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                {'name': 'Kid Doe', 'gender': 'Male', 'date_of_birth': '2040-01-01', 'mother_id': 999},
+            ]})
+            self.assertEqual(response.status_code, 400)
+
+            for member in ({'father_id': [1]}, {'mother_id': '1'}, {'father_id': True},
+                           {'ref': ['kid']}, {'father_ref': {'ref': 'kid'}}):
+                with self.subTest(member=member):
+                    response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                        {'name': 'Kid Doe', 'gender': 'Male', 'date_of_birth': '2040-01-01', **member},
+                    ]})
+                    self.assertEqual(response.status_code, 400)
+
+            self.assertIsNone(FamilyMember.query.filter_by(name='Kid Doe').first())
+
     def test_update_family_member(self):
         """
         Test updating an existing family member in a family tree.
@@ -148,6 +233,77 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             self.assertEqual(updated_member.name, 'John Doe Jr.')
             self.assertEqual(updated_member.biography, 'Initial biography')
 
+    def test_patch_family_member(self):
+        """
+        Test updating only the supplied fields of a family member, at a cost independent of the tree size.
+        """
+        with self.app.app_context():
+            member_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+
+        response = self.client.patch(f'/api/family-trees/1/members/{member_id}', json={'biography': 'First'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['family_member']['biography'], 'First')
+        self.assertEqual(response.json['family_member']['date_of_birth'], '1990-01-01')
+        query_count = response.headers['X-DB-Query-Count']
+
+        response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+            {'name': f'Member {index}', 'gender': 'Female', 'date_of_birth': '2000-01-01'} for index in range(200)
+        ]})
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.patch(f'/api/family-trees/1/members/{member_id}', json={'biography': 'Second'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['X-DB-Query-Count'], query_count)
+
+        with self.app.app_context():
+            member = db.session.get(FamilyMember, member_id)
+            self.assertEqual((member.name, member.biography), ('John Doe', 'Second'))
+
+        response = self.client.patch(f'/api/family-trees/1/members/{member_id}', json={
+            'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1992-05-15'
+        })
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/family-trees/1/members/{member_id}', json={'date_of_birth': 'yesterday'})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch(f'/api/family-trees/1/members/{member_id}', json={'tree_id': 2})
+        self.assertEqual(response.status_code, 400)
+        response = self.client.patch('/api/family-trees/1/members/999', json={'biography': 'Missing'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_patch_family_member_parents(self):
+        """
+        Test setting and removing the parents of a family member by ID and by name.
+        """
+        with self.app.test_request_context():
+            john_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+            jane_id = FamilyMember.query.filter_by(name='Jane Doe', tree_id=1).first().id
+            response = self.client.post('/api/family-trees/1/members', json={
+                'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '2015-06-01'
+            })
+            jim_id = response.json['member_id']
+
+            response = self.client.patch(f'/api/family-trees/1/members/{jim_id}', json={
+                'father_id': john_id, 'mother_name': 'Jane Doe'
+            })
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual((response.json['family_member']['father_id'], response.json['family_member']['mother_id']),
+                             (john_id, jane_id))
+
+            response = self.client.patch(f'/api/family-trees/1/members/{john_id}', json={'father_id': jim_id})
+            self.assertEqual(response.status_code, 400)
+            response = self.client.patch(f'/api/family-trees/1/members/{jim_id}', json={'mother_name': 'John Doe'})
+            self.assertEqual(response.status_code, 400)
+            other_tree_member_id = FamilyMember.query.filter_by(name='Bob Smith').first().id
+            response = self.client.patch(f'/api/family-trees/1/members/{jim_id}', json={'father_id': other_tree_member_id})
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.patch(f'/api/family-trees/1/members/{jim_id}', json={'mother_id': None})
+            self.assertEqual(response.status_code, 200)
+            member = db.session.get(FamilyMember, jim_id)
+            self.assertEqual((member.father_id, member.mother_id), (john_id, None))
+            self.assertEqual([ancestor['id'] for ancestor in self.client.get(
+                f'/api/family-trees/1/members/{jim_id}/ancestors').json['ancestors']], [john_id])
+
     def test_get_parents(self):
         """
         Test retrieving the parents of a family member.
@@ -205,6 +361,47 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             self.assertEqual(mother_data['name'], 'Jane Doe')
             self.assertEqual(mother_data['gender'], 'Female')
 
+    def test_get_parents_after_update(self):
+        """
+        Test that the parents of a family member reflect an update made after they were first retrieved.
+        """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees/1/members', json={
+                'name': 'Grandpa Doe',
+                'gender': 'Male',
+                'date_of_birth': '1950-01-01',
+                'father_name': None,
+                'mother_name': None
+            })
+            self.assertEqual(response.status_code, 201)
+
+            member_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/parents')
+            self.assertEqual(response.status_code, 200)
+            self.assertIsNone(response.json['parents']['father'])
+
+            response = self.client.put(f'/api/family-trees/1/members/{member_id}', json={
+                'name': 'John Doe',
+                'gender': 'Male',
+                'date_of_birth': '1990-01-01',
+                'father_name': 'Grandpa Doe',
+                'mother_name': None
+            })
+            self.assertEqual(response.status_code, 200)
+
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/parents')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['parents']['father']['name'], 'Grandpa Doe')
+            self.assertIsNone(response.json['parents']['mother'])
+
+    def test_get_siblings_not_found(self):
+        """
+        Test retrieving the siblings of a non-existent family member, expecting a failure.
+        """
+        with self.app.test_request_context():
+            response = self.client.get('/api/family-trees/1/members/999/siblings')
+            self.assertEqual(response.status_code, 404)
+
     def test_get_siblings(self):
         """
         Test retrieving the siblings of a family member.
@@ -266,6 +463,254 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             self.assertIn('Jane Doe', sibling_names)
             self.assertIn('Jane Doe Jr.', sibling_names)
 
+    def test_kinship_index_follows_other_processes(self):
+        """
+        Test that a cached kinship index is rebuilt after a write made by another process.
+        """
+        other_app = create_app()
+        other_app.config.from_object('config.TestConfig')
+        other_client = other_app.test_client()
+        response = other_client.post('/api/login', json={'email': 'test5@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+        with self.app.app_context():
+            john_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+            jim_id = FamilyMember.add_member(1, 'Jim Doe', 'Male', date(2015, 2, 1), None, None, None, None).id
+
+        response = other_client.get(f'/api/family-trees/1/members/{jim_id}/parents')
+        self.assertIsNone(response.json['parents']['father'])
+        etag = response.headers['ETag']
+
+        response = self.client.patch(f'/api/family-trees/1/members/{jim_id}', json={'father_id': john_id})
+        self.assertEqual(response.status_code, 200)
+
+        response = other_client.get(f'/api/family-trees/1/members/{jim_id}/parents', headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['parents']['father']['id'], john_id)
+
+        response = other_client.get('/api/family-trees/1/relationship', query_string={'a': john_id, 'b': jim_id})
+        self.assertEqual(response.json['relationship'], 'son')
+
+        """ Trees that do not exist or belong to someone else are never indexed """
+        indexes, _ = other_app.extensions['kinship_index']
+        cached = len(indexes)
+        for tree_id in range(100, 110):
+            response = other_client.get(f'/api/family-trees/{tree_id}/members/{jim_id}/parents')
+            self.assertEqual(response.status_code, 404)
+        self.assertEqual(len(indexes), cached)
+
+    def test_soft_deleted_tree_rejects_member_routes(self):
+        """
+        Test that the member, kinship and write routes of a soft-deleted tree answer 404 and write nothing.
+        """
+        with self.app.app_context():
+            john_id, jane_id = [
+                member.id for member in FamilyMember.query.filter_by(tree_id=1).order_by(FamilyMember.id)
+            ]
+            family_tree = db.session.get(FamilyTree, 1)
+            family_tree.soft_delete()
+            version = db.session.get(FamilyTree, 1).version
+
+        member_url = f'/api/family-trees/1/members/{john_id}'
+        requests = [
+            ('get', member_url, None),
+            ('get', f'{member_url}/parents', None),
+            ('get', f'{member_url}/siblings', None),
+            ('get', f'{member_url}/ancestors', None),
+            ('get', f'{member_url}/descendants', None),
+            ('get', f'/api/family-trees/1/relationship?a={john_id}&b={jane_id}', None),
+            ('post', '/api/family-trees/1/members', {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '2015-02-01'}),
+            ('post', '/api/family-trees/1/members/bulk', {'members': [
+                {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '2015-02-01'}
+            ]}),
+            ('put', member_url, {'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1990-01-01'}),
+            ('patch', member_url, {'biography': 'Updated'}),
+            ('delete', member_url, None),
+        ]
+        for method, url, data in requests:
+            with self.subTest(method=method, url=url):
+                response = getattr(self.client, method)(url, json=data)
+                self.assertEqual(response.status_code, 404)
+
+        """ Writes that got past the route checks are refused by the version bump """
+        with self.app.app_context():
+            with self.assertRaises(TreeNotFoundError):
+                FamilyMember.add_member(1, 'Jim Doe', 'Male', date(2015, 2, 1), None, None, None, None)
+            with self.assertRaises(TreeNotFoundError):
+                db.session.get(FamilyMember, jane_id).patch_member({'biography': 'Updated'})
+            self.assertEqual(FamilyMember.query.filter_by(tree_id=1).count(), 2)
+            self.assertEqual(db.session.query(FamilyTree.version).filter(FamilyTree.id == 1).execution_options(
+                include_deleted=True
+            ).scalar(), version)
+
+    def add_three_generations(self):
+        """
+        Add a child of John Doe and Jane Doe, and a grandchild through that child.
+        """
+        response = self.client.post('/api/family-trees/1/members', json={
+            'name': 'Jim Doe',
+            'gender': 'Male',
+            'date_of_birth': '2015-02-01',
+            'father_name': 'John Doe',
+            'mother_name': 'Jane Doe'
+        })
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.post('/api/family-trees/1/members', json={
+            'name': 'Jill Doe',
+            'gender': 'Female',
+            'date_of_birth': '2040-06-01',
+            'father_name': 'Jim Doe',
+            'mother_name': None
+        })
+        self.assertEqual(response.status_code, 201)
+
+    def test_get_ancestors(self):
+        """
+        Test retrieving the ancestors of a family member across generations.
+        """
+        with self.app.test_request_context():
+            self.add_three_generations()
+            member_id = FamilyMember.query.filter_by(name='Jill Doe', tree_id=1).first().id
+
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/ancestors')
+            self.assertEqual(response.status_code, 200)
+
+            ancestors = response.json.get('ancestors')
+            self.assertEqual([(a['name'], a['generation']) for a in ancestors],
+                             [('Jim Doe', 1), ('John Doe', 2), ('Jane Doe', 2)])
+
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/ancestors?depth=1')
+            self.assertEqual([a['name'] for a in response.json.get('ancestors')], ['Jim Doe'])
+
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/ancestors?limit=2')
+            self.assertEqual(len(response.json.get('ancestors')), 2)
+
+    def test_get_descendants(self):
+        """
+        Test retrieving the descendants of a family member across generations.
+        """
+        with self.app.test_request_context():
+            self.add_three_generations()
+            member_id = FamilyMember.query.filter_by(name='Jane Doe', tree_id=1).first().id
+
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/descendants')
+            self.assertEqual(response.status_code, 200)
+
+            descendants = response.json.get('descendants')
+            self.assertEqual([(d['name'], d['generation']) for d in descendants],
+                             [('Jim Doe', 1), ('Jill Doe', 2)])
+
+    def test_ancestry_follows_parent_changes(self):
+        """
+        Test that ancestors and descendants follow parent updates and deletions.
+        """
+        with self.app.test_request_context():
+            self.add_three_generations()
+            jim_id = FamilyMember.query.filter_by(name='Jim Doe', tree_id=1).first().id
+            jill_id = FamilyMember.query.filter_by(name='Jill Doe', tree_id=1).first().id
+
+            response = self.client.put(f'/api/family-trees/1/members/{jim_id}', json={
+                'name': 'Jim Doe',
+                'gender': 'Male',
+                'date_of_birth': '2015-02-01',
+                'father_name': None,
+                'mother_name': 'Jane Doe'
+            })
+            self.assertEqual(response.status_code, 200)
+
+            response = self.client.get(f'/api/family-trees/1/members/{jill_id}/ancestors')
+            self.assertEqual([(a['name'], a['generation']) for a in response.json.get('ancestors')],
+                             [('Jim Doe', 1), ('Jane Doe', 2)])
+
+            response = self.client.delete(f'/api/family-trees/1/members/{jim_id}')
+            self.assertEqual(response.status_code, 200)
+
+            jane_id = FamilyMember.query.filter_by(name='Jane Doe', tree_id=1).first().id
+            response = self.client.get(f'/api/family-trees/1/members/{jane_id}/descendants')
+            self.assertEqual(response.json.get('descendants'), [])
+
+    def test_update_family_member_cycle(self):
+        """
+        Test making a family member the parent of their own ancestor, expecting a failure.
+        """
+        with self.app.test_request_context():
+            self.add_three_generations()
+            john_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+
+            response = self.client.put(f'/api/family-trees/1/members/{john_id}', json={
+                'name': 'John Doe',
+                'gender': 'Male',
+                'date_of_birth': '1990-01-01',
+                'father_name': 'Jim Doe',
+                'mother_name': None
+            })
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                {'ref': 'a', 'name': 'Ann Loop', 'gender': 'Female', 'date_of_birth': '1900-01-01', 'mother_ref': 'b'},
+                {'ref': 'b', 'name': 'Bea Loop', 'gender': 'Female', 'date_of_birth': '1901-01-01', 'mother_ref': 'a'},
+            ]})
+            self.assertEqual(response.status_code, 400)
+
+    def test_get_ancestors_invalid_depth(self):
+        """
+        Test retrieving ancestors with an out-of-range depth, expecting a failure.
+        """
+        with self.app.test_request_context():
+            member_id = FamilyMember.query.filter_by(name='John Doe', tree_id=1).first().id
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}/ancestors?depth=0')
+            self.assertEqual(response.status_code, 400)
+
+            response = self.client.get('/api/family-trees/1/members/999/ancestors')
+            self.assertEqual(response.status_code, 404)
+
+    def test_get_relationship(self):
+        """
+        Test naming the relationship between two family members.
+        """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees/1/members/bulk', json={'members': [
+                {'ref': 'grandpa', 'name': 'Old Doe', 'gender': 'Male', 'date_of_birth': '1930-01-01'},
+                {'ref': 'grandma', 'name': 'Old Roe', 'gender': 'Female', 'date_of_birth': '1932-01-01'},
+                {'ref': 'other', 'name': 'Other Woman', 'gender': 'Female', 'date_of_birth': '1935-01-01'},
+                {'ref': 'dad', 'name': 'Dad Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01',
+                 'father_ref': 'grandpa', 'mother_ref': 'grandma'},
+                {'ref': 'aunt', 'name': 'Aunt Doe', 'gender': 'Female', 'date_of_birth': '1962-01-01',
+                 'father_ref': 'grandpa', 'mother_ref': 'grandma'},
+                {'ref': 'half', 'name': 'Half Doe', 'gender': 'Male', 'date_of_birth': '1965-01-01',
+                 'father_ref': 'grandpa', 'mother_ref': 'other'},
+                {'ref': 'kid', 'name': 'Kid Doe', 'gender': 'Male', 'date_of_birth': '1990-01-01', 'father_ref': 'dad'},
+                {'ref': 'cousin', 'name': 'Cousin Doe', 'gender': 'Female', 'date_of_birth': '1991-01-01',
+                 'mother_ref': 'aunt'},
+                {'ref': 'cousin_kid', 'name': 'Cousin Kid', 'gender': 'Male', 'date_of_birth': '2020-01-01',
+                 'mother_ref': 'cousin'},
+            ]})
+            self.assertEqual(response.status_code, 201)
+            ids = dict(zip(['grandpa', 'grandma', 'other', 'dad', 'aunt', 'half', 'kid', 'cousin', 'cousin_kid'],
+                           response.json['member_ids']))
+
+            def relationship(a, b):
+                response = self.client.get(f'/api/family-trees/1/relationship?a={ids[a]}&b={ids[b]}')
+                self.assertEqual(response.status_code, 200)
+                return response.json
+
+            self.assertEqual(relationship('kid', 'grandpa')['relationship'], 'grandfather')
+            self.assertEqual(relationship('grandma', 'kid')['relationship'], 'grandson')
+            self.assertEqual(relationship('kid', 'aunt')['relationship'], 'aunt')
+            self.assertEqual(relationship('dad', 'half')['relationship'], 'half-brother')
+            self.assertEqual(relationship('kid', 'cousin_kid')['relationship'], 'first cousin once removed')
+
+            result = relationship('kid', 'cousin')
+            self.assertEqual(result['relationship'], 'first cousin')
+            self.assertEqual([a['id'] for a in result['lowest_common_ancestors']], [ids['grandpa'], ids['grandma']])
+
+            result = relationship('kid', 'other')
+            self.assertIsNone(result['relationship'])
+            self.assertEqual(result['lowest_common_ancestors'], [])
+
+            response = self.client.get(f"/api/family-trees/1/relationship?a={ids['kid']}&b=999")
+            self.assertEqual(response.status_code, 404)
 
     def test_get_all_members_in_tree(self):
         """
@@ -279,6 +724,44 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             self.assertIsNotNone(members)
             self.assertEqual(len(members), 2)
 
+    def test_get_all_members_in_tree_paginated(self):
+        """
+        Test paging through the family members of a tree with a cursor and a sparse fieldset.
+        """
+        with self.app.test_request_context():
+            response = self.client.get('/api/family-trees/1/members?limit=1&fields=name,father_id')
+            self.assertEqual(response.status_code, 200)
+
+            members = response.json.get('family_members')
+            self.assertEqual(members, [{'id': 1, 'name': 'John Doe', 'father_id': None}])
+            cursor = response.json.get('next_cursor')
+            self.assertEqual(cursor, 1)
+
+            response = self.client.get(f'/api/family-trees/1/members?limit=1&fields=name&cursor={cursor}')
+            self.assertEqual(response.json.get('family_members'), [{'id': 2, 'name': 'Jane Doe'}])
+            self.assertIsNone(response.json.get('next_cursor'))
+
+            response = self.client.get('/api/family-trees/1/members?fields=name,password')
+            self.assertEqual(response.status_code, 400)
+
+    def test_get_all_members_in_tree_default_fields(self):
+        """
+        Test that the member listing leaves biographies out unless they are requested.
+        """
+        with self.app.test_request_context():
+            response = self.client.get('/api/family-trees/1/members')
+            self.assertEqual(response.status_code, 200)
+            members = response.json.get('family_members')
+            self.assertTrue(members)
+            for member in members:
+                self.assertNotIn('biography', member)
+                self.assertEqual(set(member), {'id', 'name', 'gender', 'date_of_birth', 'picture_url'})
+
+            response = self.client.get('/api/family-trees/1/members?fields=name,biography')
+            self.assertEqual(response.status_code, 200)
+            for member in response.json.get('family_members'):
+                self.assertIn('biography', member)
+
     def test_get_family_member(self):
         """
         Test retrieving information about a specific family member.
@@ -292,6 +775,25 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             self.assertIsNotNone(family_member)
             self.assertEqual(family_member['name'], 'John Doe')
 
+    def test_get_family_member_serialization(self):
+        """
+        Test that family members are serialized with every field and ISO 8601 dates.
+        """
+        with self.app.test_request_context():
+            member_id = FamilyMember.query.filter_by(name='Jane Doe', tree_id=1).first().id
+            response = self.client.get(f'/api/family-trees/1/members/{member_id}')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json['family_member'], {
+                'id': member_id,
+                'name': 'Jane Doe',
+                'gender': 'Female',
+                'date_of_birth': '1992-05-15',
+                'biography': None,
+                'picture_url': None,
+                'father_id': None,
+                'mother_id': None,
+            })
+
     def test_get_family_member_not_found(self):
         """
         Test retrieving a non-existent family member, expecting a failure.
@@ -344,6 +846,36 @@ class FamilyMemberRoutesTestCase(unittest.TestCase):
             result_test_tree_2 = search_results['Test Tree 2']
             self.assertEqual(len(result_test_tree_2), 0)
 
+    def test_search_family_members_ranking(self):
+        """
+        Test that search results are ranked and that renamed members are found by their new name.
+        """
+        with self.app.test_request_context():
+            for name, date_of_birth in [('Johnny Doe', '2010-01-01'), ('Big John', '2011-01-01'), ('Ajohn', '2012-01-01')]:
+                response = self.client.post('/api/family-trees/1/members', json={
+                    'name': name, 'gender': 'Male', 'date_of_birth': date_of_birth
+                })
+                self.assertEqual(response.status_code, 201)
+
+            response = self.client.get('/api/family-trees/members/search?q=john')
+            names = [member['name'] for member in response.json['search_results']['Test Tree']]
+            self.assertEqual(names, ['John Doe', 'Johnny Doe', 'Big John', 'Ajohn'])
+
+            response = self.client.get('/api/family-trees/members/search?q=john&limit=2')
+            self.assertEqual(response.json['next_offset'], 2)
+
+            member_id = FamilyMember.query.filter_by(name='Ajohn', tree_id=1).first().id
+            response = self.client.put(f'/api/family-trees/1/members/{member_id}', json={
+                'name': 'Zed Roe', 'gender': 'Male', 'date_of_birth': '2012-01-01'
+            })
+            self.assertEqual(response.status_code, 200)
+
+            response = self.client.get('/api/family-trees/members/search?q=zed r')
+            self.assertEqual([m['id'] for m in response.json['search_results']['Test Tree']], [member_id])
+
+            response = self.client.get('/api/family-trees/members/search?q=aj')
+            self.assertEqual(response.json['search_results']['Test Tree'], [])
+
     def test_search_family_members_all_trees_no_query(self):
         """
         Test searching for family members across all family trees without providing a query, expecting a failure.
@@ -0,0 +1,134 @@
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import unittest
+from app import create_app, db
+from app.utils.metrics import EXITED_FILE, write_snapshot
+
+
+class MetricsRoutesTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up the test environment.
+        - Create a test Flask app.
+        - Set configurations from the TestConfig class.
+        - Create a test client.
+        - Create tables in the test database.
+        """
+        self.app = create_app()
+        self.app.config.from_object('config.TestConfig')
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+        - Remove the database session.
+        - Drop all tables after each test.
+        """
+        with self.app.app_context():
+            db.session.remove()
+            db.drop_all()
+
+    def test_metrics(self):
+        """
+        Test that requests are counted and timed per route in the Prometheus text format.
+        """
+        self.client.post('/api/register', json={'email': 'test5@example.com', 'password': 'password'})
+        self.client.get('/api/family-trees')
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.content_type.startswith('text/plain'))
+
+        body = response.get_data(as_text=True)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', body)
+        self.assertIn(
+            'http_requests_total{blueprint="user",endpoint="user.register_user",method="POST",status="201"} 1', body
+        )
+        self.assertIn(
+            'http_requests_total{blueprint="family_tree",endpoint="family_tree.get_family_trees",method="GET",status="401"} 1',
+            body
+        )
+        self.assertIn(
+            'http_request_duration_seconds_count{blueprint="user",endpoint="user.register_user",method="POST"} 1', body
+        )
+        self.assertIn('http_requests_in_flight{blueprint="metrics",endpoint="metrics.get_metrics"} 1', body)
+
+    def test_metrics_dir(self):
+        """
+        Test that snapshots are only written when changed and that those of exited processes are folded and removed.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            self.app.config['METRICS_DIR'] = directory
+            self.app.config['METRICS_FLUSH_INTERVAL'] = 3600
+            own_path = os.path.join(directory, f'metrics-{os.getpid()}.json')
+
+            self.assertTrue(write_snapshot(self.app))
+            os.remove(own_path)
+            self.assertFalse(write_snapshot(self.app))
+            self.assertFalse(os.path.exists(own_path))
+            self.client.post('/api/register', json={'email': 'test6@example.com', 'password': 'password'})
+            self.assertTrue(write_snapshot(self.app))
+            self.assertTrue(os.path.exists(own_path))
+
+            exited = subprocess.Popen([sys.executable, '-c', ''])
+            exited.wait()
+            labels = [['blueprint', 'user'], ['endpoint', 'user.login_user'], ['method', 'POST'], ['status', '200']]
+            with open(os.path.join(directory, f'metrics-{exited.pid}.json'), 'w') as snapshot_file:
+                json.dump({
+                    'pid': exited.pid,
+                    'counters': [['http_requests_total', labels, 7]],
+                    'gauges': [['http_requests_in_flight', [['blueprint', 'user'], ['endpoint', 'user.login_user']], 2]],
+                    'histograms': [],
+                }, snapshot_file)
+
+            for _ in range(2):
+                body = self.client.get('/metrics').get_data(as_text=True)
+                self.assertIn(
+                    'http_requests_total{blueprint="user",endpoint="user.login_user",method="POST",status="200"} 7', body
+                )
+                self.assertNotIn('http_requests_in_flight{blueprint="user",endpoint="user.login_user"}', body)
+                self.assertFalse(os.path.exists(os.path.join(directory, f'metrics-{exited.pid}.json')))
+                self.assertTrue(os.path.exists(os.path.join(directory, EXITED_FILE)))
+
+
+    def test_pool_metrics_across_processes(self):
+        """
+        Test that pool gauges are written to the snapshots and added up, and that waits are timed after a dispose.
+        """
+        with tempfile.TemporaryDirectory() as directory:
+            self.app.config['METRICS_DIR'] = directory
+            self.app.config['METRICS_FLUSH_INTERVAL'] = 3600
+            with self.app.app_context():
+                db.engine.dispose()
+            self.client.post('/api/register', json={'email': 'test7@example.com', 'password': 'password'})
+
+            self.assertTrue(write_snapshot(self.app))
+            with open(os.path.join(directory, f'metrics-{os.getpid()}.json')) as snapshot_file:
+                gauges = {name: value for name, labels, value in json.load(snapshot_file)['gauges']}
+            self.assertEqual(gauges['db_pool_checked_out'], 0)
+            pool_size = gauges['db_pool_size']
+
+            labels = [['engine', 'default']]
+            with open(os.path.join(directory, f'metrics-{os.getppid()}.json'), 'w') as snapshot_file:
+                json.dump({
+                    'pid': os.getppid(),
+                    'counters': [],
+                    'gauges': [['db_pool_checked_out', labels, 3], ['db_pool_size', labels, 5]],
+                    'histograms': [],
+                }, snapshot_file)
+
+            body = self.client.get('/metrics').get_data(as_text=True)
+            self.assertIn('db_pool_checked_out{engine="default"} 3', body)
+            self.assertIn(f'db_pool_size{{engine="default"}} {pool_size + 5}', body)
+            self.assertIn('db_pool_wait_seconds_count{engine="default"}', body)
+
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import os
+import shutil
+import tempfile
+import unittest
+from datetime import date
+from sqlalchemy import text
+from app import create_app, db
+from app.models import User, FamilyTree, FamilyMember
+from app.utils.replica import REPLICA_BIND_KEY, get_engines
+
+
+class ReplicaRoutingTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up the test environment.
+        - Create a test Flask app on a primary and a replica SQLite database.
+        - Fill the primary with a user, a family tree and a member.
+        - Copy the primary to the replica, as replication would.
+        - Log in.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        self.primary_path = os.path.join(self.directory.name, 'primary.db')
+        self.replica_path = os.path.join(self.directory.name, 'replica.db')
+        config = type('ReplicaConfig', (), {
+            'SECRET_KEY': 'passkey',
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{self.primary_path}',
+            'SQLALCHEMY_REPLICA_URI': f'sqlite:///{self.replica_path}',
+        })
+        self.app = create_app(config)
+        self.client = self.app.test_client()
+
+        with self.app.app_context():
+            db.create_all()
+            self.client.post('/api/register', json={'email': 'test5@example.com', 'password': 'password'})
+            user = User.query.filter_by(email='test5@example.com').first()
+
+            family_tree = FamilyTree(name='Test Tree', description='Test Description', user_id=user.id)
+            db.session.add(family_tree)
+            db.session.commit()
+
+            member = FamilyMember(name='John Doe', gender='Male', date_of_birth=date(1990, 1, 1), tree_id=family_tree.id)
+            db.session.add(member)
+            db.session.commit()
+            self.member_id = member.id
+
+            db.session.remove()
+            for engine in get_engines().values():
+                engine.dispose()
+        shutil.copyfile(self.primary_path, self.replica_path)
+
+        response = self.client.post('/api/login', json={'email': 'test5@example.com', 'password': 'password'})
+        self.assertEqual(response.status_code, 200)
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+        - Remove the database session and dispose of the engines.
+        - Delete the temporary databases.
+        """
+        with self.app.app_context():
+            db.session.remove()
+            for engine in get_engines().values():
+                engine.dispose()
+        self.directory.cleanup()
+
+    def rename_on_replica(self, name):
+        """ Change the member's name on the replica only """
+        with self.app.app_context():
+            with get_engines()[REPLICA_BIND_KEY].begin() as connection:
+                connection.execute(text('UPDATE family_member SET name = :name WHERE id = :id'),
+                                   {'name': name, 'id': self.member_id})
+
+    def test_replica_stays_out_of_binds(self):
+        """
+        Test that the replica is not a bind, so apps without a replica can still create and drop all tables.
+        """
+        self.assertNotIn(REPLICA_BIND_KEY, db.metadatas)
+
+        other = create_app(type('PrimaryOnlyConfig', (), {
+            'SECRET_KEY': 'passkey',
+            'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(self.directory.name, 'other.db')}",
+        }))
+        with other.app_context():
+            db.create_all()
+            db.drop_all()
+            db.engine.dispose()
+
+    def test_get_reads_from_replica(self):
+        """
+        Test that GET routes read from the replica.
+        """
+        self.rename_on_replica('Replica Doe')
+
+        response = self.client.get(f'/api/family-trees/1/members/{self.member_id}')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json['family_member']['name'], 'Replica Doe')
+
+    def test_writes_and_read_after_write_use_primary(self):
+        """
+        Test that writes go to the primary and that a request reads its own writes.
+        """
+        response = self.client.post('/api/family-trees/1/members', json={
+            'name': 'New Member',
+            'gender': 'Female',
+            'date_of_birth': '1995-03-20',
+            'father_name': 'John Doe'
+        })
+        self.assertEqual(response.status_code, 201)
+        new_member_id = response.json['member_id']
+
+        with self.app.app_context():
+            with db.engines[None].connect() as connection:
+                row = connection.execute(text('SELECT name, father_id FROM family_member WHERE id = :id'),
+                                         {'id': new_member_id}).one()
+            self.assertEqual(tuple(row), ('New Member', self.member_id))
+
+            with get_engines()[REPLICA_BIND_KEY].connect() as connection:
+                count = connection.execute(text('SELECT COUNT(*) FROM family_member')).scalar()
+            self.assertEqual(count, 1)
+
+    def test_static_readers_use_replica(self):
+        """
+        Test that the model readers use the replica outside GET requests, and the primary after a write.
+        """
+        self.rename_on_replica('Replica Doe')
+
+        with self.app.test_request_context(method='POST'):
+            self.assertEqual(FamilyMember.get_member_by_id(1, self.member_id).name, 'Replica Doe')
+            self.assertEqual([member.name for member in FamilyMember.get_all_members_in_tree(1)], ['Replica Doe'])
+            self.assertEqual(FamilyMember.get_members_by_name(1, 'John Doe'), [])
+
+            db.session.remove()
+            self.assertEqual(FamilyMember.query.filter_by(id=self.member_id).one().name, 'John Doe')
+
+            db.session.remove()
+            FamilyTree.bump_version(1)
+            self.assertEqual(FamilyMember.get_member_by_id(1, self.member_id).name, 'John Doe')
+
+if __name__ == '__main__':
+    unittest.main()
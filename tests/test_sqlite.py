@@ -0,0 +1,101 @@
+import os
+import sqlite3
+import tempfile
+import unittest
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy import text
+from app import create_app, db
+from app.models import User
+from app.utils.sqlite import read_only_transactions
+from config import SqliteConfig
+
+
+class SqliteConfigTestCase(unittest.TestCase):
+    def setUp(self):
+        """
+        Set up the test environment.
+        - Create a test Flask app on a temporary SQLite database with SqliteConfig.
+        - Create tables in the test database.
+        """
+        self.directory = tempfile.TemporaryDirectory()
+        database_uri = f"sqlite:///{os.path.join(self.directory.name, 'dzinza.db')}"
+        self.app = create_app(type('TestSqliteConfig', (SqliteConfig,), {'SQLALCHEMY_DATABASE_URI': database_uri}))
+
+        with self.app.app_context():
+            db.create_all()
+
+    def tearDown(self):
+        """
+        Tear down the test environment.
+        - Remove the database session and dispose of the engine.
+        - Delete the temporary database.
+        """
+        with self.app.app_context():
+            db.session.remove()
+            db.engine.dispose()
+        self.directory.cleanup()
+
+    def test_pragmas(self):
+        """
+        Test that every connection gets the configured pragmas.
+        """
+        with self.app.app_context():
+            pragma = lambda name: db.session.execute(text(f'PRAGMA {name}')).scalar()
+            self.assertEqual(pragma('journal_mode'), 'wal')
+            self.assertEqual(pragma('synchronous'), 1)
+            self.assertEqual(pragma('foreign_keys'), 1)
+            self.assertEqual(pragma('cache_size'), SqliteConfig.SQLITE_PRAGMAS['cache_size'])
+
+    def test_concurrent_writes(self):
+        """
+        Test that requests writing from many threads at once all succeed.
+        """
+        def register(number):
+            client = self.app.test_client()
+            return client.post('/api/register', json={'email': f'user{number}@example.com', 'password': 'password'})
+
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            responses = list(executor.map(register, range(16)))
+
+        self.assertEqual([response.status_code for response in responses], [201] * 16)
+        with self.app.app_context():
+            self.assertEqual(User.query.count(), 16)
+
+    def write_locked(self):
+        """ Check whether another connection would have to wait for the write lock """
+        other = sqlite3.connect(os.path.join(self.directory.name, 'dzinza.db'), timeout=0, isolation_level=None)
+        try:
+            other.execute('BEGIN IMMEDIATE')
+            other.execute('ROLLBACK')
+            return False
+        except sqlite3.OperationalError:
+            return True
+        finally:
+            other.close()
+
+    def test_async_get_takes_write_lock(self):
+        """
+        Test that a GET asking for a background job begins with the write lock, as it queues a job row.
+        """
+        for headers, locked in (({}, False), ({'Prefer': 'respond-async'}, True)):
+            with self.subTest(headers=headers):
+                with self.app.test_request_context('/', method='GET', headers=headers):
+                    db.session.execute(text('SELECT 1'))
+                    self.assertEqual(self.write_locked(), locked)
+                    db.session.rollback()
+
+    def test_read_only_transactions(self):
+        """
+        Test that work outside requests takes the write lock unless it runs in read_only_transactions.
+        """
+        for read_only, locked in ((False, True), (True, False)):
+            with self.subTest(read_only=read_only):
+                with self.app.app_context(), (read_only_transactions() if read_only else nullcontext()):
+                    db.session.execute(text('SELECT 1'))
+                    self.assertEqual(self.write_locked(), locked)
+                    db.session.rollback()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,7 +1,9 @@
+import json
 import unittest
+from unittest import mock
 from flask import session
 from app import create_app, db
-from app.models import User, FamilyTree, FamilyMember
+from app.models import User, FamilyTree, FamilyMember, AncestryClosure, MemberNameToken
 
 class FamilyTreeRoutesTestCase(unittest.TestCase):
     def setUp(self):
@@ -37,6 +39,212 @@ class FamilyTreeRoutesTestCase(unittest.TestCase):
             self.assertIsNotNone(family_trees)
             self.assertEqual(len(family_trees), 0)
 
+    def test_get_family_tree_summaries(self):
+        """ Test listing the family trees with their aggregates in a single query """
+        for name in ('Doe Tree', 'Empty Tree'):
+            response = self.client.post('/api/family-trees', json={'name': name, 'description': 'Test Description'})
+            self.assertEqual(response.status_code, 201)
+
+        with self.app.app_context():
+            tree_id = FamilyTree.query.filter_by(name='Doe Tree').first().id
+        response = self.client.post(f'/api/family-trees/{tree_id}/members/bulk', json={'members': [
+            {'ref': 'grandfather', 'name': 'Joe Doe', 'gender': 'Male', 'date_of_birth': '1930-01-01'},
+            {'ref': 'father', 'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01',
+             'father_ref': 'grandfather'},
+            {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '1990-02-01', 'father_ref': 'father'},
+            {'name': 'Jane Roe', 'gender': 'Female', 'date_of_birth': '1962-05-15'},
+        ]})
+        self.assertEqual(response.status_code, 201)
+
+        response = self.client.get('/api/family-trees/summary')
+        self.assertEqual(response.status_code, 200)
+        doe_tree, empty_tree = response.json['family_trees']
+        self.assertEqual(
+            {field: doe_tree[field] for field in ('name', 'member_count', 'generations', 'earliest_birth', 'latest_birth')},
+            {'name': 'Doe Tree', 'member_count': 4, 'generations': 3,
+             'earliest_birth': '1930-01-01', 'latest_birth': '1990-02-01'}
+        )
+        self.assertIsNotNone(doe_tree['updated_at'])
+        self.assertEqual(
+            (empty_tree['name'], empty_tree['member_count'], empty_tree['generations'], empty_tree['earliest_birth']),
+            ('Empty Tree', 0, 0, None)
+        )
+
+        for index in range(3):
+            self.client.post('/api/family-trees', json={'name': f'Tree {index}', 'description': 'Test Description'})
+        more_trees = self.client.get('/api/family-trees/summary')
+        self.assertEqual(len(more_trees.json['family_trees']), 5)
+        self.assertEqual(more_trees.headers['X-DB-Query-Count'], response.headers['X-DB-Query-Count'])
+
+    def test_get_family_tree_stats(self):
+        """ Test the tree statistics and their caching by tree version """
+        self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+        with self.app.app_context():
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+        self.client.post(f'/api/family-trees/{tree_id}/members/bulk', json={'members': [
+            {'ref': 'grandfather', 'name': 'Joe Doe', 'gender': 'Male', 'date_of_birth': '1930-01-01'},
+            {'ref': 'father', 'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01',
+             'father_ref': 'grandfather'},
+            {'ref': 'mother', 'name': 'Jane Roe', 'gender': 'Female', 'date_of_birth': '1962-05-15'},
+            {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '1990-02-01',
+             'father_ref': 'father', 'mother_ref': 'mother'},
+            {'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1993-07-09',
+             'father_ref': 'father', 'mother_ref': 'mother'},
+        ]})
+
+        response = self.client.get(f'/api/family-trees/{tree_id}/stats')
+        self.assertEqual(response.status_code, 200)
+        stats = response.json['stats']
+        self.assertEqual(stats['member_count'], 5)
+        self.assertEqual(stats['members_per_generation'], [
+            {'generation': 1, 'members': 2}, {'generation': 2, 'members': 1}, {'generation': 3, 'members': 2}
+        ])
+        self.assertEqual(stats['gender_split'], {'Female': 2, 'Male': 3})
+        self.assertEqual(stats['births_per_decade'], [
+            {'decade': 1930, 'births': 1}, {'decade': 1960, 'births': 2}, {'decade': 1990, 'births': 2}
+        ])
+        self.assertEqual((stats['families'], stats['average_family_size']), (2, 1.5))
+        self.assertEqual(stats['most_common_given_names'][0], {'name': 'Jane', 'count': 2})
+        self.assertEqual(stats['most_common_surnames'], [{'name': 'Doe', 'count': 4}, {'name': 'Roe', 'count': 1}])
+
+        cached = self.client.get(f'/api/family-trees/{tree_id}/stats')
+        self.assertLess(int(cached.headers['X-DB-Query-Count']), int(response.headers['X-DB-Query-Count']))
+
+        self.client.post(f'/api/family-trees/{tree_id}/members', json={
+            'name': 'Ann Roe', 'gender': 'Female', 'date_of_birth': '2001-03-03'
+        })
+        stats = self.client.get(f'/api/family-trees/{tree_id}/stats').json['stats']
+        self.assertEqual(stats['member_count'], 6)
+        self.assertEqual(stats['births_per_decade'][-1], {'decade': 2000, 'births': 1})
+
+        self.assertEqual(self.client.get('/api/family-trees/999/stats').status_code, 404)
+
+    def test_get_family_tree_changes(self):
+        """ Test syncing a family tree through its change feed """
+        self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+        with self.app.app_context():
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+        john_id, jane_id, jim_id = self.client.post(f'/api/family-trees/{tree_id}/members/bulk', json={'members': [
+            {'ref': 'father', 'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01'},
+            {'ref': 'mother', 'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1962-05-15'},
+            {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '1990-02-01',
+             'father_ref': 'father', 'mother_ref': 'mother'},
+        ]}).json['member_ids']
+
+        """ Initial sync, in pages of two """
+        members = []
+        since = '0'
+        while True:
+            response = self.client.get(f'/api/family-trees/{tree_id}/changes', query_string={'since': since, 'limit': 2})
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(any(change['deleted'] for change in response.json['changes']))
+            members.extend(change['member'] for change in response.json['changes'])
+            since = response.json['next_since']
+            if not response.json['has_more']:
+                break
+        self.assertEqual(sorted(member['id'] for member in members), [john_id, jane_id, jim_id])
+
+        response = self.client.get(f'/api/family-trees/{tree_id}/changes', query_string={'since': since})
+        self.assertEqual((response.json['changes'], response.json['next_since']), ([], since))
+
+        """ Only the changes after the cursor come back, including children unlinked from a deleted parent """
+        self.client.patch(f'/api/family-trees/{tree_id}/members/{jane_id}', json={'biography': 'Updated'})
+        self.client.delete(f'/api/family-trees/{tree_id}/members/{john_id}')
+
+        response = self.client.get(f'/api/family-trees/{tree_id}/changes', query_string={'since': since})
+        changes = response.json['changes']
+        self.assertEqual([change['change_seq'] for change in changes], sorted(change['change_seq'] for change in changes))
+        changed = {change['member_id']: change for change in changes}
+        self.assertEqual(sorted(changed), sorted([john_id, jane_id, jim_id]))
+        self.assertEqual(changed[jane_id]['member']['biography'], 'Updated')
+        self.assertIsNone(changed[jim_id]['member']['father_id'])
+        self.assertEqual(changed[john_id], {'change_seq': changed[john_id]['change_seq'], 'member_id': john_id, 'deleted': True})
+        self.assertFalse(response.json['has_more'])
+        since = response.json['next_since']
+
+        """ Member IDs are never reused, so the newest member can be deleted and another one deleted after it """
+        self.assertEqual(self.client.delete(f'/api/family-trees/{tree_id}/members/{jim_id}').status_code, 200)
+        response = self.client.post(f'/api/family-trees/{tree_id}/members', json={
+            'name': 'Joe Doe', 'gender': 'Male', 'date_of_birth': '1993-03-01'
+        })
+        joe_id = response.json['member_id']
+        self.assertGreater(joe_id, jim_id)
+        self.assertEqual(self.client.delete(f'/api/family-trees/{tree_id}/members/{joe_id}').status_code, 200)
+        response = self.client.get(f'/api/family-trees/{tree_id}/changes', query_string={'since': since})
+        self.assertEqual(
+            [(change['member_id'], change['deleted']) for change in response.json['changes']],
+            [(jim_id, True), (joe_id, True)]
+        )
+
+        self.assertEqual(self.client.get(f'/api/family-trees/{tree_id}/changes?since=x').status_code, 400)
+        with self.app.app_context():
+            db.session.get(FamilyTree, tree_id).soft_delete()
+        self.assertEqual(self.client.get(f'/api/family-trees/{tree_id}/changes').status_code, 410)
+
+    def test_stream_family_tree_events(self):
+        """ Test streaming the member changes of a family tree and resuming after a reconnect """
+        self.app.config['EVENTS_HEARTBEAT_SECONDS'] = 0.05
+        self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+        with self.app.app_context():
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+        john_id = self.client.post(f'/api/family-trees/{tree_id}/members', json={
+            'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01'
+        }).json['member_id']
+
+        def read_events(stream, count):
+            events = []
+            while len(events) < count:
+                chunk = next(stream).decode()
+                if chunk.startswith(('retry:', ':')):
+                    continue
+                fields = dict(line.split(': ', 1) for line in chunk.strip().split('\n'))
+                events.append((fields.get('id'), fields['event'], json.loads(fields['data'])))
+            return events
+
+        response = self.client.get(f'/api/family-trees/{tree_id}/events', buffered=False)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        stream = iter(response.response)
+        self.assertTrue(next(stream).startswith(b'retry:'))
+        self.assertEqual(next(stream), b': heartbeat\n\n')
+
+        """ Members written before the stream opened are not sent again """
+        jane_id = self.client.post(f'/api/family-trees/{tree_id}/members', json={
+            'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1962-05-15'
+        }).json['member_id']
+        added = read_events(stream, 1)
+        self.assertEqual([(event, data['id']) for _, event, data in added], [('member_added', jane_id)])
+
+        self.client.patch(f'/api/family-trees/{tree_id}/members/{jane_id}', json={'biography': 'Updated'})
+        self.client.delete(f'/api/family-trees/{tree_id}/members/{john_id}')
+        changes = read_events(stream, 2)
+        self.assertEqual(changes[0][1:], ('member_updated', changes[0][2]))
+        self.assertEqual(changes[0][2]['biography'], 'Updated')
+        self.assertEqual(changes[1][1:], ('member_deleted', {'id': john_id}))
+        response.close()
+
+        response = self.client.get(f'/api/family-trees/{tree_id}/events', headers={'Last-Event-ID': 'x'})
+        self.assertEqual(response.status_code, 400)
+
+        """ A reconnecting client gets the events after its Last-Event-ID again, one batch at a time """
+        get_changes = mock.Mock(wraps=FamilyMember.get_changes)
+        with mock.patch('app.utils.events.EVENT_BATCH_SIZE', 1), \
+                mock.patch.object(FamilyMember, 'get_changes', get_changes):
+            response = self.client.get(f'/api/family-trees/{tree_id}/events', buffered=False,
+                                       headers={'Last-Event-ID': added[0][0]})
+            stream = iter(response.response)
+            self.assertEqual(read_events(stream, 1), changes[:1])
+            self.assertEqual(get_changes.call_count, 1)
+            self.assertEqual(read_events(stream, 1), changes[1:])
+
+        with self.app.app_context():
+            db.session.get(FamilyTree, tree_id).soft_delete()
+        self.assertEqual(read_events(stream, 1), [(None, 'tree_deleted', {'id': tree_id})])
+        self.assertRaises(StopIteration, next, stream)
+        response.close()
+
+        self.assertEqual(self.client.get(f'/api/family-trees/{tree_id}/events').status_code, 410)
+
     def test_create_family_tree(self):
         """ Test creating a new family tree """
         with self.app.test_request_context():
@@ -97,6 +305,139 @@ class FamilyTreeRoutesTestCase(unittest.TestCase):
             self.assertIsNotNone(family_members)
             self.assertEqual(len(family_members), 0)
 
+    def test_get_family_tree_graph(self):
+        """ Test retrieving a family tree as column-oriented nodes and edges """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+            self.assertEqual(response.status_code, 201)
+
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+            for member in [
+                {'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01'},
+                {'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1962-01-01'},
+                {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '1990-03-05',
+                 'father_name': 'John Doe', 'mother_name': 'Jane Doe'},
+            ]:
+                response = self.client.post(f'/api/family-trees/{tree_id}/members', json=member)
+                self.assertEqual(response.status_code, 201)
+
+            response = self.client.get(f'/api/family-trees/{tree_id}/graph')
+            self.assertEqual(response.status_code, 200)
+
+            nodes = response.json['nodes']
+            self.assertEqual(nodes['name'], ['John Doe', 'Jane Doe', 'Jim Doe'])
+            self.assertEqual(nodes['date_of_birth'], ['1960-01-01', '1962-01-01', '1990-03-05'])
+
+            john_id, jane_id, jim_id = nodes['id']
+            edges = response.json['edges']
+            self.assertEqual(list(zip(edges['parent'], edges['child'], edges['relation'])),
+                             [(john_id, jim_id, 'father'), (jane_id, jim_id, 'mother')])
+
+            response = self.client.get('/api/family-trees/999/graph')
+            self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_family_tree(self):
+        """ Test that tree reads answer If-None-Match with 304 until the tree is written """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+            self.assertEqual(response.status_code, 201)
+
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+            response = self.client.get(f'/api/family-trees/{tree_id}/members')
+            self.assertEqual(response.status_code, 200)
+            etag = response.headers['ETag']
+            self.assertIsNotNone(response.headers.get('Last-Modified'))
+
+            response = self.client.get(f'/api/family-trees/{tree_id}/members', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(response.data, b'')
+
+            response = self.client.post(f'/api/family-trees/{tree_id}/members', json={
+                'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01'
+            })
+            self.assertEqual(response.status_code, 201)
+
+            response = self.client.get(f'/api/family-trees/{tree_id}/members', headers={'If-None-Match': etag})
+            self.assertEqual(response.status_code, 200)
+            self.assertNotEqual(response.headers['ETag'], etag)
+            self.assertEqual(len(response.json['family_members']), 1)
+
+    def test_sql_instrumentation(self):
+        """ Test the per-request query headers and the slow query log """
+        with self.app.test_request_context():
+            response = self.client.get('/api/family-trees')
+            self.assertEqual(response.status_code, 200)
+            self.assertGreater(int(response.headers['X-DB-Query-Count']), 0)
+            self.assertGreaterEqual(float(response.headers['X-DB-Time-Ms']), 0)
+
+            self.app.config['SLOW_QUERY_THRESHOLD_MS'] = 0
+            with self.assertLogs('app.sql.slow', level='WARNING') as logs:
+                self.client.get('/api/family-trees')
+            entry = json.loads(logs.records[0].getMessage())
+            self.assertEqual(entry['route'], 'family_tree.get_family_trees')
+            self.assertNotIn('test5@example.com', logs.output[0])
+
+            self.app.config['SQL_INSTRUMENTATION_HEADERS'] = False
+            response = self.client.get('/api/family-trees')
+            self.assertNotIn('X-DB-Query-Count', response.headers)
+
+    def test_import_and_export_gedcom(self):
+        """ Test importing a GEDCOM file into a family tree and exporting it back """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+            self.assertEqual(response.status_code, 201)
+
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+            gedcom = '\n'.join([
+                '0 HEAD',
+                '1 CHAR UTF-8',
+                '0 @F1@ FAM',
+                '1 HUSB @I1@',
+                '1 WIFE @I2@',
+                '1 CHIL @I3@',
+                '0 @I1@ INDI',
+                '1 NAME John /Doe/',
+                '1 SEX M',
+                '1 BIRT',
+                '2 DATE 1 JAN 1960',
+                '0 @I2@ INDI',
+                '1 NAME Jane /Doe/',
+                '1 SEX F',
+                '1 BIRT',
+                '2 DATE ABT 1962',
+                '0 @I3@ INDI',
+                '1 NAME Jim /Doe/',
+                '1 SEX M',
+                '1 BIRT',
+                '2 DATE 5 MAR 1990',
+                '1 NOTE First line',
+                '2 CONT Second line',
+                '0 @I4@ INDI',
+                '1 NAME Undated /Doe/',
+                '0 TRLR',
+            ])
+            response = self.client.post(f'/api/family-trees/{tree_id}/gedcom', data=gedcom, content_type='text/plain')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual(response.json['imported'], 3)
+            self.assertEqual(response.json['skipped'], 1)
+            self.assertEqual(response.json['linked'], 1)
+
+            child = FamilyMember.query.filter_by(name='Jim Doe', tree_id=tree_id).first()
+            self.assertEqual(child.biography, 'First line\nSecond line')
+            self.assertEqual(FamilyMember.query.get(child.father_id).name, 'John Doe')
+            self.assertEqual(FamilyMember.query.get(child.mother_id).date_of_birth.isoformat(), '1962-01-01')
+
+            response = self.client.get(f'/api/family-trees/{tree_id}/gedcom')
+            self.assertEqual(response.status_code, 200)
+
+            exported = response.get_data(as_text=True).splitlines()
+            self.assertEqual(exported[0], '0 HEAD')
+            self.assertEqual(exported[-1], '0 TRLR')
+            self.assertIn(f'0 @I{child.id}@ INDI', exported)
+            self.assertIn('1 NAME Jim /Doe/', exported)
+            self.assertIn('2 DATE 5 MAR 1990', exported)
+            self.assertIn(f'1 CHIL @I{child.id}@', exported)
+
     def test_update_family_tree(self):
         """ Test updating details of a specific family tree """
         with self.app.test_request_context():
@@ -118,6 +459,24 @@ class FamilyTreeRoutesTestCase(unittest.TestCase):
             response = self.client.put('/api/family-trees/999', json={'name': 'Updated Tree', 'description': 'Updated Description'})
             self.assertEqual(response.status_code, 404)
 
+    def test_update_family_tree_of_another_user(self):
+        """ Test that users cannot update each other's family trees """
+        response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+        self.assertEqual(response.status_code, 201)
+        with self.app.app_context():
+            family_tree = FamilyTree.query.filter_by(name='Test Tree').first()
+            tree_id, version = family_tree.id, family_tree.version
+
+        other = self.app.test_client()
+        other.post('/api/register', json={'email': 'other@example.com', 'password': 'password'})
+        other.post('/api/login', json={'email': 'other@example.com', 'password': 'password'})
+        response = other.put(f'/api/family-trees/{tree_id}', json={'name': 'Taken Tree', 'description': 'Taken'})
+        self.assertEqual(response.status_code, 404)
+
+        with self.app.app_context():
+            family_tree = db.session.get(FamilyTree, tree_id)
+            self.assertEqual((family_tree.name, family_tree.version), ('Test Tree', version))
+
     def test_delete_family_tree(self):
         """ Test deleting a specific family tree """
         with self.app.test_request_context():
@@ -131,6 +490,60 @@ class FamilyTreeRoutesTestCase(unittest.TestCase):
             deleted_tree = FamilyTree.query.filter_by(id=tree_id).first()
             self.assertIsNone(deleted_tree)
 
+    def test_soft_delete_and_purge_family_tree(self):
+        """ Test that a soft-deleted family tree is hidden at once and purged in batches """
+        with self.app.test_request_context():
+            response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+            self.assertEqual(response.status_code, 201)
+
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+            response = self.client.post(f'/api/family-trees/{tree_id}/members/bulk', json={'members': [
+                {'ref': 'grandfather', 'name': 'Joe Doe', 'gender': 'Male', 'date_of_birth': '1930-01-01'},
+                {'ref': 'father', 'name': 'John Doe', 'gender': 'Male', 'date_of_birth': '1960-01-01',
+                 'father_ref': 'grandfather'},
+                {'ref': 'mother', 'name': 'Jane Doe', 'gender': 'Female', 'date_of_birth': '1962-05-15'},
+                {'name': 'Jim Doe', 'gender': 'Male', 'date_of_birth': '1990-02-01',
+                 'father_ref': 'father', 'mother_ref': 'mother'},
+                {'name': 'Jill Doe', 'gender': 'Female', 'date_of_birth': '1992-07-09',
+                 'father_ref': 'father', 'mother_ref': 'mother'},
+            ]})
+            self.assertEqual(response.status_code, 201)
+
+            db.session.get(FamilyTree, tree_id).soft_delete()
+
+            self.assertEqual(self.client.get(f'/api/family-trees/{tree_id}').status_code, 404)
+            self.assertEqual(self.client.get('/api/family-trees').json['family_trees'], [])
+            response = self.client.get('/api/family-trees/members/search?q=Doe')
+            self.assertEqual(response.json['search_results'], {})
+            response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Recreated'})
+            self.assertEqual(response.status_code, 201)
+
+            progress = []
+            self.assertEqual(FamilyTree.purge_tree(tree_id, lambda done, total: progress.append((done, total)), 2), 5)
+            self.assertEqual(progress, [(2, 10), (4, 10), (5, 10), (7, 10), (9, 10), (10, 10)])
+
+            self.assertEqual(FamilyMember.query.filter_by(tree_id=tree_id).count(), 0)
+            self.assertEqual(AncestryClosure.query.count(), 0)
+            self.assertEqual(MemberNameToken.query.count(), 0)
+            self.assertEqual(FamilyTree.purge_deleted_trees(), 0)
+            self.assertEqual(FamilyTree.query.filter_by(name='Test Tree').one().description, 'Recreated')
+
+    def test_delete_family_tree_of_another_user(self):
+        """ Test that users cannot delete each other's family trees """
+        response = self.client.post('/api/family-trees', json={'name': 'Test Tree', 'description': 'Test Description'})
+        self.assertEqual(response.status_code, 201)
+        with self.app.app_context():
+            tree_id = FamilyTree.query.filter_by(name='Test Tree').first().id
+
+        other = self.app.test_client()
+        other.post('/api/register', json={'email': 'other@example.com', 'password': 'password'})
+        other.post('/api/login', json={'email': 'other@example.com', 'password': 'password'})
+        for headers in ({}, {'Prefer': 'respond-async'}):
+            response = other.delete(f'/api/family-trees/{tree_id}', headers=headers)
+            self.assertEqual(response.status_code, 404)
+
+        self.assertEqual(self.client.get(f'/api/family-trees/{tree_id}').status_code, 200)
+
     def test_delete_family_tree_not_found(self):
         """ Test deleting a non-existent family tree """
         with self.app.test_request_context():